@@ -0,0 +1,143 @@
+"""Measures how much memory the message hot path allocates per
+message and how many times messages get copied along the way.
+
+Each measurement is taken for the current implementation and for the
+one it replaced, which is kept around here so the two can be compared.
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from functools import partial
+from unittest.mock import patch
+
+from dramatiq import Message, MessageProxy
+from dramatiq.brokers.redis import RedisBroker
+
+
+class LegacyMessageProxy:
+    """The MessageProxy that forwarded every message attribute
+    through __getattr__ and kept its state in an instance dict.
+    """
+
+    def __init__(self, message):
+        self.failed = False
+        self._message = message
+        self._exception = None
+        self.timestamps = {"fetched": time.time() * 1000}
+
+    def __getattr__(self, name):
+        return getattr(self._message, name)
+
+
+class LegacyRedisBroker(RedisBroker):
+    """The RedisBroker whose enqueue copied messages once to add a
+    message id and then again to add an eta.
+    """
+
+    def enqueue(self, message, *, delay=None):
+        message = message.copy(options={"redis_message_id": "id"})
+        if delay is not None:
+            message = message.copy(queue_name=message.queue_name + ".DQ", options={"eta": delay})
+
+        self.do_enqueue(message.queue_name, message.options["redis_message_id"], message.encode(), 0)
+        return message
+
+
+def make_message():
+    return Message(
+        queue_name="default",
+        actor_name="noop",
+        args=(1, "two", [3.0]),
+        kwargs={"four": {"five": 6}},
+        options={"retries": 1, "max_retries": 20},
+    )
+
+
+def retained_bytes(fn, number):
+    """Call fn ``number`` times, holding on to its results, and return
+    the number of bytes that stay allocated per call.
+    """
+    tracemalloc.start()
+    try:
+        results = [fn() for _ in range(number)]
+        current, _ = tracemalloc.get_traced_memory()
+        del results
+        return current / number
+    finally:
+        tracemalloc.stop()
+
+
+def peak_bytes(fn):
+    """Return the peak number of bytes allocated while calling fn.
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        return peak
+    finally:
+        tracemalloc.stop()
+
+
+def count_copies(fn):
+    """Return the number of times fn copies messages.
+    """
+    calls = []
+    copy = Message.copy
+
+    def counting_copy(self, **attributes):
+        calls.append(1)
+        return copy(self, **attributes)
+
+    with patch.object(Message, "copy", counting_copy):
+        fn()
+
+    return len(calls)
+
+
+def measure_proxies(args):
+    message = make_message()
+    for name, proxy_class in [("legacy", LegacyMessageProxy), ("current", MessageProxy)]:
+        yield "proxy_bytes", name, retained_bytes(lambda: proxy_class(message), args.number)
+
+
+def measure_enqueue(args):
+    message = make_message()
+    for name, broker_class in [("legacy", LegacyRedisBroker), ("current", RedisBroker)]:
+        broker = broker_class(middleware=[])
+        broker.do_enqueue = lambda *args: None
+        for delay in [None, 1000]:
+            suffix = "" if delay is None else "_delayed"
+            enqueue = partial(broker.enqueue, message, delay=delay)
+            yield "enqueue_copies" + suffix, name, count_copies(enqueue)
+            yield "enqueue_peak_bytes" + suffix, name, peak_bytes(enqueue)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure per-message allocations.")
+    parser.add_argument(
+        "--number", type=int, default=10000,
+        help="the number of messages to average over (default: 10000)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = {}
+    for measure in [measure_proxies, measure_enqueue]:
+        for metric, name, value in measure(args):
+            results.setdefault(metric, {})[name] = value
+
+    print("%-28s %12s %12s %12s" % ("", "legacy", "current", "saved"))
+    for metric, values in results.items():
+        legacy, current = values["legacy"], values["current"]
+        print("%-28s %12.1f %12.1f %12.1f" % (metric, legacy, current, legacy - current))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
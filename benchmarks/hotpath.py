@@ -0,0 +1,376 @@
+"""Micro-benchmarks for the message hot path.
+
+These run against the StubBroker and, when a redis-server binary is
+available, against a throwaway Redis server so they don't depend on
+any running services.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import dramatiq
+from dramatiq import Message, MessageProxy, Worker
+from dramatiq.brokers.stub import StubBroker
+from dramatiq.common import WorkQueue
+from dramatiq.worker import _WorkerThread
+
+#: The size, in bytes, from which the lazy decoding benchmarks decode
+#: messages lazily.
+LAZY_DECODE_THRESHOLD = 4096
+
+#: The benchmarks that can be run, in the order they are run in.
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def decorator(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return decorator
+
+
+def measure(fn, *, number, rounds):
+    """Call fn ``number`` times per round and return the fastest
+    round's rate in operations per second.
+    """
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return number / best
+
+
+def make_message(queue_name="default", actor_name="noop"):
+    return Message(
+        queue_name=queue_name,
+        actor_name=actor_name,
+        args=(1, "two", [3.0]),
+        kwargs={"four": {"five": 6}},
+        options={},
+    )
+
+
+def make_large_message():
+    """Make a message large enough to be decoded lazily.
+    """
+    return Message(
+        queue_name="default",
+        actor_name="noop",
+        args=([{"id": i, "name": "item %d" % i, "price": i * 1.5} for i in range(LAZY_DECODE_THRESHOLD // 32)],),
+        kwargs={"four": {"five": 6}},
+        options={},
+    )
+
+
+@contextmanager
+def lazy_decoding():
+    """Turn on lazy decoding, which is off by default.
+    """
+    dramatiq.message.LAZY_DECODE_THRESHOLD = LAZY_DECODE_THRESHOLD
+    try:
+        yield
+    finally:
+        dramatiq.message.LAZY_DECODE_THRESHOLD = 0
+
+
+def make_stub_broker():
+    broker = StubBroker()
+    broker.emit_after("process_boot")
+    dramatiq.set_broker(broker)
+
+    @dramatiq.actor(broker=broker, queue_name="default")
+    def noop(*args, **kwargs):
+        pass
+
+    return broker, noop
+
+
+@benchmark("message_encode")
+def bench_message_encode(args):
+    message = make_message()
+    return measure(message.encode, number=args.number, rounds=args.rounds)
+
+
+@benchmark("message_decode")
+def bench_message_decode(args):
+    data = make_message().encode()
+    return measure(lambda: Message.decode(data), number=args.number, rounds=args.rounds)
+
+
+@benchmark("message_decode_large")
+def bench_message_decode_large(args):
+    data = make_large_message().encode()
+    return measure(lambda: Message.decode(data), number=args.number, rounds=args.rounds)
+
+
+@benchmark("message_decode_lazily")
+def bench_message_decode_lazily(args):
+    data = make_large_message().encode()
+    with lazy_decoding():
+        return measure(lambda: Message.decode_lazily(data), number=args.number, rounds=args.rounds)
+
+
+@benchmark("message_decode_lazily_args")
+def bench_message_decode_lazily_args(args):
+    data = make_large_message().encode()
+    with lazy_decoding():
+        return measure(lambda: Message.decode_lazily(data).args, number=args.number, rounds=args.rounds)
+
+
+@benchmark("emit_before")
+def bench_emit_before(args):
+    broker, _ = make_stub_broker()
+    message = make_message()
+    return measure(lambda: broker.emit_before("enqueue", message, None), number=args.number, rounds=args.rounds)
+
+
+@benchmark("emit_after")
+def bench_emit_after(args):
+    broker, _ = make_stub_broker()
+    message = make_message()
+    return measure(lambda: broker.emit_after("enqueue", message, None), number=args.number, rounds=args.rounds)
+
+
+@benchmark("process_message")
+def bench_process_message(args):
+    broker, _ = make_stub_broker()
+
+    class Consumer:
+        def post_process_message(self, message):
+            pass
+
+    work_queue = WorkQueue()
+    thread = _WorkerThread(
+        broker=broker,
+        consumers={"default": Consumer()},
+        work_queue=work_queue,
+        worker_timeout=1000,
+    )
+
+    message = make_message()
+
+    def process_message():
+        # Every processed message is marked as done on the work queue.
+        work_queue.put((0, None))
+        work_queue.get()
+        thread.process_message(MessageProxy(message))
+
+    return measure(process_message, number=args.number, rounds=args.rounds)
+
+
+def bench_worker_throughput(args, threads):
+    broker, noop = make_stub_broker()
+
+    best = 0
+    for _ in range(args.rounds):
+        for _ in range(args.number):
+            noop.send()
+
+        start = time.perf_counter()
+        worker = Worker(broker, worker_threads=threads, worker_timeout=100)
+        worker.start()
+        try:
+            broker.join(noop.queue_name)
+            worker.join()
+            best = max(best, args.number / (time.perf_counter() - start))
+        finally:
+            worker.stop()
+
+    return best
+
+
+def spawn_redis_server(executable):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    directory = tempfile.mkdtemp(prefix="dramatiq-bench-")
+    proc = subprocess.Popen(
+        [executable, "--port", str(port), "--save", "", "--appendonly", "no", "--dir", directory],
+        stdout=subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    else:  # pragma: no cover
+        proc.terminate()
+        raise RuntimeError("redis-server failed to start.")
+
+    def stop():
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return "redis://127.0.0.1:%d/0" % port, stop
+
+
+def bench_redis(args, url):
+    from dramatiq.brokers.redis import RedisBroker
+
+    broker = RedisBroker(url=url, middleware=[])
+    broker.client.flushdb()
+    broker.declare_queue("default")
+    message = make_message()
+    results = {}
+
+    # The maintenance chance is zeroed so that every dispatch does the
+    # same amount of work.
+    broker.maintenance_chance = 0
+    results["redis_enqueue"] = measure(lambda: broker.enqueue(message), number=args.number, rounds=1)
+
+    fetched = []
+    batch = 100
+
+    def fetch():
+        fetched.extend(broker.do_fetch("default", batch))
+
+    results["redis_fetch"] = measure(fetch, number=args.number // batch, rounds=1) * batch
+
+    message_ids = [Message.decode(data).options["redis_message_id"] for data in fetched]
+    message_ids.reverse()
+    results["redis_ack"] = measure(lambda: broker.do_ack("default", message_ids.pop()), number=len(message_ids), rounds=1)
+    broker.client.flushdb()
+    return results
+
+
+def run(args):
+    results = {}
+    for name, fn in BENCHMARKS.items():
+        if args.only and name not in args.only:
+            continue
+
+        print("Running %s..." % name, file=sys.stderr)
+        results[name] = fn(args)
+
+    for threads in args.threads:
+        name = "worker_throughput_%d_threads" % threads
+        if args.only and name not in args.only:
+            continue
+
+        print("Running %s..." % name, file=sys.stderr)
+        results[name] = bench_worker_throughput(args, threads)
+
+    if args.only and not any(name.startswith("redis_") for name in args.only):
+        return results
+
+    url, stop = args.redis_url, None
+    if url is None and args.redis_server:
+        url, stop = spawn_redis_server(args.redis_server)
+
+    if url is None:
+        print("Skipping Redis benchmarks: no redis-server found.", file=sys.stderr)
+    else:
+        try:
+            print("Running redis benchmarks...", file=sys.stderr)
+            results.update(bench_redis(args, url))
+        finally:
+            if stop is not None:
+                stop()
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print how results compare to a baseline and return the names
+    of the benchmarks that regressed by more than threshold percent.
+    """
+    regressions = []
+    for name, ops in sorted(results.items()):
+        old_ops = baseline.get(name)
+        if old_ops is None:
+            print("%-32s %14.1f ops/s" % (name, ops))
+            continue
+
+        change = (ops - old_ops) / old_ops * 100
+        print("%-32s %14.1f ops/s %+8.1f%%" % (name, ops, change))
+        if change < -threshold:
+            regressions.append(name)
+
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the message hot path.")
+    parser.add_argument(
+        "--number", type=int, default=10000,
+        help="the number of operations per round (default: 10000)",
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=5,
+        help="the number of rounds to keep the fastest of (default: 5)",
+    )
+    parser.add_argument(
+        "--threads", type=int, nargs="*", default=[1, 8, 32],
+        help="the worker thread counts to measure throughput with (default: 1 8 32)",
+    )
+    parser.add_argument(
+        "--only", nargs="*",
+        help="only run the given benchmarks",
+    )
+    parser.add_argument(
+        "--redis-server", default=shutil.which("redis-server"),
+        help="the redis-server binary to spawn (default: the one on PATH)",
+    )
+    parser.add_argument(
+        "--redis-url",
+        help="benchmark an existing Redis server instead of spawning one",
+    )
+    parser.add_argument(
+        "--output",
+        help="write the results to a JSON file",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="compare the results to those in a JSON file",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=10,
+        help="the slowdown, in percent, past which a benchmark counts as a regression (default: 10)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = run(args)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    regressions = compare(results, baseline, args.threshold)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "dramatiq": dramatiq.__version__,
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+
+    if regressions:
+        print("Regressed: %s" % ", ".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
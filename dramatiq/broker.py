@@ -14,6 +14,10 @@
 #
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+from collections import namedtuple
+from operator import attrgetter
+
 from dramatiq.middleware.middleware import RestartWorker
 from .errors import ActorNotFound
 from .logging import get_logger
@@ -22,6 +26,27 @@ from .middleware import MiddlewareError, default_middleware
 #: The global broker instance.
 global_broker = None
 
+#: Statistics about a queue as returned by ``Broker.get_queue_stats``.
+#: ``oldest_message_age`` is the age, in milliseconds, of the message
+#: at the head of the queue or None when the queue is empty or the
+#: broker can't tell.
+QueueStats = namedtuple("QueueStats", (
+    "messages", "delayed_messages", "dead_messages", "oldest_message_age",
+))
+
+#: The stages a message goes through on its way from the broker to
+#: being acknowledged, in order.  Each stage is delimited by a pair of
+#: timestamps recorded on the message proxy.
+MESSAGE_STAGES = (
+    ("broker", "enqueued", "fetched"),
+    ("prefetch", "fetched", "queued"),
+    ("work_queue", "queued", "dequeued"),
+    ("before_process", "dequeued", "started"),
+    ("actor", "started", "finished"),
+    ("after_process", "finished", "processed"),
+    ("ack", "processed", "acked"),
+)
+
 
 def get_broker() -> "Broker":
     """Get the global broker instance.  If no global broker is set,
@@ -245,6 +270,19 @@ class Broker:
         """
         return self.delay_queues.copy()
 
+    def get_queue_stats(self, queue_name):  # pragma: no cover
+        """Get the number of messages on a queue, its delay queue and
+        its dead letter queue as well as the age of its next message.
+        This is meant to be cheap enough to be called periodically.
+
+        Parameters:
+          queue_name(str): The name of the queue.
+
+        Returns:
+          QueueStats: The queue's statistics.
+        """
+        raise NotImplementedError()
+
     def flush(self, queue_name):  # pragma: no cover
         """Drop all the messages from a queue.
 
@@ -301,6 +339,14 @@ class Consumer:
           messages(list[MessageProxy]): The messages to requeue.
         """
 
+    def set_prefetch(self, prefetch):
+        """Change the number of messages this consumer may prefetch.
+        The default implementation does nothing.
+
+        Parameters:
+          prefetch(int): The new prefetch.
+        """
+
     def __next__(self):  # pragma: no cover
         """Retrieve the next message off of the queue.  This method
         blocks until a message becomes available.
@@ -317,14 +363,71 @@ class Consumer:
         """
 
 
+def _forward(name):
+    return property(attrgetter("_message." + name), doc="See :class:`Message<dramatiq.Message>`.")
+
+
 class MessageProxy:
     """Base class for messages returned by :meth:`Broker.consume`.
+
+    Message fields are forwarded to the underlying message through
+    properties.  Other message attributes are forwarded on demand.
+
+    Parameters:
+      message(Message): The message being proxied.
+      fetched(float): The UNIX timestamp, in milliseconds, at which
+        the consumer fetched the message from the broker.  Defaults
+        to the current time.
+
+    Attributes:
+      timestamps(dict[str, float]): The UNIX timestamps, in
+        milliseconds, at which the message reached each stage of
+        processing.  See :meth:`get_timings`.
     """
 
-    def __init__(self, message):
+    __slots__ = ("failed", "_message", "_exception", "timestamps")
+
+    queue_name = _forward("queue_name")
+    actor_name = _forward("actor_name")
+    args = _forward("args")
+    kwargs = _forward("kwargs")
+    options = _forward("options")
+    message_id = _forward("message_id")
+    message_timestamp = _forward("message_timestamp")
+    asdict = _forward("asdict")
+    copy = _forward("copy")
+    encode = _forward("encode")
+
+    def __init__(self, message, *, fetched=None):
         self.failed = False
         self._message = message
         self._exception = None
+        self.timestamps = {"fetched": fetched or time.time() * 1000}
+
+    def stamp(self, name):
+        """Record the current time under the given timestamp name.
+        """
+        self.timestamps[name] = time.time() * 1000
+
+    def get_timings(self):
+        """Compute how long this message spent in each stage of
+        processing that it went through.  The ``broker`` stage is
+        measured from the time the message was last enqueued, which
+        for delayed and retried messages is when their delay ran
+        out, so it's only accurate if the clocks of the enqueueing
+        and the consuming hosts are in sync.
+
+        Returns:
+          dict[str, float]: A map from stage names to durations, in
+          milliseconds.
+        """
+        enqueued = self.options.get("enqueued_at", self.message_timestamp)
+        timestamps = dict(self.timestamps, enqueued=enqueued)
+        return {
+            stage: timestamps[end] - timestamps[start]
+            for stage, start, end in MESSAGE_STAGES
+            if start in timestamps and end in timestamps
+        }
 
     def stuff_exception(self, exception):
         """Stuff an exception into this message.  Currently, this is
@@ -339,6 +442,11 @@ class MessageProxy:
         self.failed = True
 
     def __getattr__(self, name):
+        # This object's own attributes are never forwarded so that
+        # objects that haven't been fully initialized (eg. while being
+        # unpickled) don't recurse forever.
+        if name in ("_message", "_exception"):
+            raise AttributeError(name)
         return getattr(self._message, name)
 
     def __str__(self):
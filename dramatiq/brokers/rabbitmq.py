@@ -18,13 +18,14 @@
 import logging
 import time
 import warnings
+from collections import deque
 from functools import partial
 from itertools import chain
 from threading import Event, local
 
 import pika
 
-from ..broker import Broker, Consumer, MessageProxy
+from ..broker import Broker, Consumer, MessageProxy, QueueStats
 from ..common import current_millis, dq_name, xq_name
 from ..errors import ConnectionClosed, QueueJoinTimeout
 from ..logging import get_logger
@@ -174,6 +175,12 @@ class RabbitmqBroker(Broker):
 
             except Exception:  # pragma: no cover
                 self.logger.debug("Encountered an error while closing %r.", channel_or_conn, exc_info=True)
+
+        # Forget the closed connections so that new ones get opened
+        # if the broker is used again after being closed.
+        self.channels.clear()
+        self.connections.clear()
+        self.state = local()
         self.logger.debug("Channels and connections closed.")
 
     def consume(self, queue_name, prefetch=1, timeout=5000):
@@ -344,6 +351,25 @@ class RabbitmqBroker(Broker):
             xq_queue_response.method.message_count,
         )
 
+    def get_queue_stats(self, queue_name):
+        """Get statistics about a queue.  The counts come from passive
+        declarations, so they don't include messages that consumers
+        have fetched but not yet acknowledged.  RabbitMQ doesn't
+        expose message ages so ``oldest_message_age`` is always None.
+
+        Parameters:
+          queue_name(str): The name of the queue.
+
+        Returns:
+          QueueStats: The queue's statistics.
+        """
+        counts = []
+        for name in (queue_name, dq_name(queue_name), xq_name(queue_name)):
+            response = self.channel.queue_declare(queue=name, passive=True)
+            counts.append(response.method.message_count)
+
+        return QueueStats(*counts, oldest_message_age=None)
+
     def flush(self, queue_name):
         """Drop all the messages from a queue.
 
@@ -421,7 +447,13 @@ class _RabbitmqConsumer(Consumer):
             self.connection = pika.BlockingConnection(parameters=parameters)
             self.channel = self.connection.channel()
             self.channel.basic_qos(prefetch_count=prefetch)
-            self.iterator = self.channel.consume(queue_name, inactivity_timeout=timeout / 1000)
+            self.channel.basic_consume(queue_name, self._on_message)
+            self.timeout = timeout
+
+            # Deliveries are buffered here along with the time they
+            # were received at, rather than in pika, so that time can
+            # be recorded on the messages.
+            self.deliveries = deque()
 
             # We need to keep track of known delivery tags so that
             # when connection errors occur and the consumer is reset,
@@ -460,20 +492,32 @@ class _RabbitmqConsumer(Consumer):
         except Exception:  # pragma: no cover
             self.logger.warning("Failed to nack message.", exc_info=True)
 
+    def set_prefetch(self, prefetch):
+        try:
+            self.channel.basic_qos(prefetch_count=prefetch)
+        except (pika.exceptions.AMQPConnectionError,
+                pika.exceptions.AMQPChannelError) as e:
+            raise ConnectionClosed(e) from None
+
     def requeue(self, messages):
         """RabbitMQ automatically re-enqueues unacked messages when
         consumers disconnect so this is a no-op.
         """
 
+    def _on_message(self, channel, method, properties, body):
+        self.deliveries.append((method.delivery_tag, body, time.time() * 1000))
+
     def __next__(self):
         try:
-            method, properties, body = next(self.iterator)
-            if method is None:
-                return None
-
-            message = Message.decode(body)
-            self.known_tags.add(method.delivery_tag)
-            return _RabbitmqMessage(method.delivery_tag, message)
+            if not self.deliveries:
+                self.connection.process_data_events(time_limit=self.timeout / 1000)
+                if not self.deliveries:
+                    return None
+
+            tag, body, fetched = self.deliveries.popleft()
+            message = Message.decode_lazily(body)
+            self.known_tags.add(tag)
+            return _RabbitmqMessage(tag, message, fetched)
         except (AssertionError,
                 pika.exceptions.AMQPConnectionError,
                 pika.exceptions.AMQPChannelError) as e:
@@ -506,7 +550,9 @@ class _RabbitmqConsumer(Consumer):
 
 
 class _RabbitmqMessage(MessageProxy):
-    def __init__(self, tag, message):
-        super().__init__(message)
+    __slots__ = ("_tag",)
+
+    def __init__(self, tag, message, fetched):
+        super().__init__(message, fetched=fetched)
 
         self._tag = tag
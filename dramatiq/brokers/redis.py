@@ -25,7 +25,7 @@ from uuid import uuid4
 import redis
 
 from dramatiq.actor import ACTOR_PRIORITY
-from ..broker import Broker, Consumer, MessageProxy
+from ..broker import Broker, Consumer, MessageProxy, QueueStats
 from ..common import compute_backoff, current_millis, dq_name
 from ..errors import ConnectionClosed, QueueJoinTimeout
 from ..logging import get_logger
@@ -161,19 +161,12 @@ class RedisBroker(Broker):
         # Each enqueued message must have a unique id in Redis so
         # using the Message's id isn't safe because messages may be
         # retried.
-        message = message.copy(options={
-            "redis_message_id": str(uuid4()),
-        })
-
+        options = {"redis_message_id": str(uuid4())}
         if delay is not None:
             queue_name = dq_name(queue_name)
-            message_eta = current_millis() + delay
-            message = message.copy(
-                queue_name=queue_name,
-                options={
-                    "eta": message_eta,
-                },
-            )
+            options["eta"] = current_millis() + delay
+
+        message = message.copy(queue_name=queue_name, options=options)
 
         self.logger.debug("Enqueueing message %r on queue %r.", message.message_id, queue_name)
         self.emit_before("enqueue", message, delay)
@@ -190,6 +183,28 @@ class RedisBroker(Broker):
         """
         return self.queues.copy()
 
+    def get_queue_stats(self, queue_name):
+        """Get statistics about a queue.  This costs a single round
+        trip to Redis regardless of the size of the queue.
+
+        Parameters:
+          queue_name(str): The name of the queue.
+
+        Returns:
+          QueueStats: The queue's statistics.
+        """
+        messages, delayed_messages, dead_messages, head = self.scripts["queue_stats"](
+            keys=[self.namespace], args=[queue_name],
+        )
+
+        # Queues are sorted by priority rather than by enqueue time so
+        # the head of the queue is the message that's next in line.
+        oldest_message_age = None
+        if head is not None:
+            oldest_message_age = current_millis() - Message.decode_lazily(head).message_timestamp
+
+        return QueueStats(messages, delayed_messages, dead_messages, oldest_message_age)
+
     def flush(self, queue_name):
         """Drop all the messages from a queue.
 
@@ -282,6 +297,7 @@ class _RedisConsumer(Consumer):
         self.timeout = timeout
 
         self.message_cache = []
+        self.message_cache_fetched = None
         self.queued_message_ids = set()
         self.misses = 0
 
@@ -311,6 +327,9 @@ class _RedisConsumer(Consumer):
             if message.message_id in self.queued_message_ids:
                 self.queued_message_ids.remove(message.message_id)
 
+    def set_prefetch(self, prefetch):
+        self.prefetch = prefetch
+
     def requeue(self, messages):
         if not messages:
             return
@@ -343,9 +362,9 @@ class _RedisConsumer(Consumer):
                         continue
                     self.misses = 0
 
-                    message = Message.decode(data)
+                    message = Message.decode_lazily(data)
                     self.queued_message_ids.add(message.message_id)
-                    return MessageProxy(message)
+                    return MessageProxy(message, fetched=self.message_cache_fetched)
                 except IndexError:
                     # If there are fewer messages currently being
                     # processed than we're allowed to prefetch,
@@ -356,6 +375,9 @@ class _RedisConsumer(Consumer):
                             self.queue_name,
                             self.prefetch - self.outstanding_message_count,
                         )
+                        # The cache is only ever refilled as a whole so
+                        # every message in it was fetched at this time.
+                        self.message_cache_fetched = time.time() * 1000
 
                     if any(x is None for x in messages):
                         # Seems after network connectivity issues message queue can get messages without data
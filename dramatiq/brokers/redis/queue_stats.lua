@@ -0,0 +1,46 @@
+-- This file is a part of Dramatiq.
+--
+-- Copyright (C) 2017,2018 CLEARTYPE SRL <bogdan@cleartype.io>
+--
+-- Dramatiq is free software; you can redistribute it and/or modify it
+-- under the terms of the GNU Lesser General Public License as published by
+-- the Free Software Foundation, either version 3 of the License, or (at
+-- your option) any later version.
+--
+-- Dramatiq is distributed in the hope that it will be useful, but WITHOUT
+-- ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+-- FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+-- License for more details.
+--
+-- You should have received a copy of the GNU Lesser General Public License
+-- along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+-- luacheck: globals ARGV KEYS redis
+-- queue_stats(keys=[namespace], args=[queue_name])
+--
+-- Returns the number of messages waiting on $queue_name, on its delay
+-- queue and on its dead letter queue, followed by the data of the
+-- message at the head of the queue or nil if the queue is empty.
+-- Delayed messages are counted via their hash since workers hold on
+-- to them until their eta.
+
+local namespace = KEYS[1]
+local queue_name = ARGV[1]
+
+local queue_full_name = namespace .. ":" .. queue_name
+local queue_messages = queue_full_name .. ".msgs"
+local dqueue_messages = queue_full_name .. ".DQ.msgs"
+local xqueue_full_name = queue_full_name .. ".XQ"
+
+local head = false
+local head_ids = redis.call("zrange", queue_full_name, 0, 0)
+if next(head_ids) then
+    head = redis.call("hget", queue_messages, head_ids[1])
+end
+
+return {
+    redis.call("zcard", queue_full_name),
+    redis.call("hlen", dqueue_messages),
+    redis.call("zcard", xqueue_full_name),
+    head,
+}
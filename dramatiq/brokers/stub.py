@@ -19,7 +19,7 @@ from collections import defaultdict
 from itertools import chain
 from queue import Empty, Queue
 
-from ..broker import Broker, Consumer, MessageProxy
+from ..broker import Broker, Consumer, MessageProxy, QueueStats
 from ..common import current_millis, dq_name, iter_queue, join_queue
 from ..errors import QueueNotFound
 from ..message import Message
@@ -27,11 +27,38 @@ from ..message import Message
 
 class StubBroker(Broker):
     """A broker that can be used within unit tests.
+
+    By default, messages are encoded when they're enqueued and decoded
+    when they're consumed, just like they would be with a real broker.
+    Test suites that send lots of messages can turn this off via
+    ``encode_messages`` in which case copies of the messages
+    themselves are put on the queues.  Messages are still checked to
+    be encodable when they're first enqueued unless
+    ``validate_messages`` is also turned off.  Messages that are
+    enqueued again after having been consumed (eg. retries, rate
+    limited messages and delayed messages whose eta has passed)
+    were checked when they were first sent so they aren't checked
+    again.
+
+    Warning:
+      When messages aren't encoded, actors receive their arguments
+      as-is (eg. tuples aren't turned into lists) and arguments are
+      shared between the sender and the actor.
+
+    Parameters:
+      middleware(list[Middleware]): The set of middleware that apply
+        to this broker.
+      encode_messages(bool): Whether or not to encode and decode
+        messages as they go through the queues.
+      validate_messages(bool): Whether or not to check that messages
+        can be encoded when ``encode_messages`` is False.
     """
 
-    def __init__(self, middleware=None):
+    def __init__(self, middleware=None, *, encode_messages=True, validate_messages=True):
         super().__init__(middleware)
 
+        self.encode_messages = encode_messages
+        self.validate_messages = validate_messages
         self.dead_letters_by_queue = defaultdict(list)
 
     @property
@@ -92,6 +119,14 @@ class StubBroker(Broker):
           QueueNotFound: If the queue the message is being enqueued on
             doesn't exist.
         """
+        # Consumed messages and the copies the worker makes of
+        # delayed messages when moving them to their queue were
+        # validated when they were first sent.
+        validate = (
+            not self.encode_messages and self.validate_messages and
+            not isinstance(message, MessageProxy) and "enqueued_at" not in message.options
+        )
+
         queue_name = message.queue_name
         if delay is not None:
             queue_name = dq_name(queue_name)
@@ -107,10 +142,50 @@ class StubBroker(Broker):
             raise QueueNotFound(queue_name)
 
         self.emit_before("enqueue", message, delay)
-        self.queues[queue_name].put(message.encode())
+        if self.encode_messages:
+            data = message.encode()
+        else:
+            if validate:
+                message.encode()
+
+            # The options are copied so that changes middleware make
+            # to them while processing don't leak back to the sender.
+            data = message.copy()
+
+        self.queues[queue_name].put(data)
         self.emit_after("enqueue", message, delay)
         return message
 
+    def get_queue_stats(self, queue_name):
+        """Get statistics about a queue.
+
+        Parameters:
+          queue_name(str): The name of the queue.
+
+        Raises:
+          QueueNotFound: If the queue hasn't been declared.
+
+        Returns:
+          QueueStats: The queue's statistics.
+        """
+        try:
+            queue, delay_queue = self.queues[queue_name], self.queues[dq_name(queue_name)]
+        except KeyError:
+            raise QueueNotFound(queue_name) from None
+
+        oldest_message_age = None
+        with queue.mutex:
+            if queue.queue:
+                message = _decode(queue.queue[0])
+                oldest_message_age = current_millis() - message.message_timestamp
+
+        return QueueStats(
+            messages=queue.qsize(),
+            delayed_messages=delay_queue.qsize(),
+            dead_messages=len(self.dead_letters_by_queue[queue_name]),
+            oldest_message_age=oldest_message_age,
+        )
+
     def flush(self, queue_name):
         """Drop all the messages from a queue.
 
@@ -189,7 +264,12 @@ class _StubConsumer(Consumer):
     def __next__(self):
         try:
             data = self.queue.get(timeout=self.timeout / 1000)
-            message = Message.decode(data)
-            return MessageProxy(message)
+            return MessageProxy(_decode(data))
         except Empty:
             return None
+
+
+def _decode(data):
+    if isinstance(data, Message):
+        return data
+    return Message.decode_lazily(data)
@@ -21,6 +21,7 @@
 import argparse
 import atexit
 import functools
+import glob
 import importlib
 import logging
 import multiprocessing
@@ -32,8 +33,9 @@ import time
 from itertools import chain
 from threading import Event, Thread
 
-from dramatiq import Broker, ConnectionError, Worker, __version__, get_broker, get_logger
+from dramatiq import Broker, ConnectionError, Worker, __version__, get_broker, get_logger, set_broker
 from dramatiq.canteen import Canteen, canteen_add, canteen_get
+from dramatiq.common import format_cpu_list, parse_cpu_list
 from dramatiq.compat import StreamablePipe, file_or_stderr
 
 try:
@@ -57,6 +59,12 @@ BUFSIZE = 65536
 #: The number of available cpus.
 CPUS = multiprocessing.cpu_count()
 
+#: The strategies worker processes can be pinned to CPUs with.
+CPU_AFFINITY_STRATEGIES = ("round-robin", "numa")
+
+#: The path under which Linux describes NUMA nodes.
+NUMA_NODES_PATH = "/sys/devices/system/node"
+
 #: The logging format.
 LOGFORMAT = "[%(asctime)s] [PID %(process)d] [%(threadName)s] [%(name)s] [%(levelname)s] %(message)s"
 
@@ -99,6 +107,14 @@ examples:
 
   # Write logs to a file.
   $ dramatiq some_module --log-file /tmp/dramatiq.log
+
+  # Import modules once in the main process and fork workers from it.
+  $ dramatiq --preload some_module
+
+  # Allow scaling between 2 and 16 worker processes at runtime.  Send
+  # SIGTTIN to the main process to add a worker process and SIGTTOU to
+  # remove one.
+  $ dramatiq some_module --processes 4 --min-processes 2 --max-processes 16
 """
 
 
@@ -152,10 +168,30 @@ def make_argument_parser():
         "--processes", "-p", default=CPUS, type=int,
         help="the number of worker processes to run (default: %s)" % CPUS,
     )
+    parser.add_argument(
+        "--min-processes", type=int,
+        help="the minimum number of worker processes to scale down to (default: 1)",
+    )
+    parser.add_argument(
+        "--max-processes", type=int,
+        help="the maximum number of worker processes to scale up to (default: --processes)",
+    )
     parser.add_argument(
         "--threads", "-t", default=8, type=int,
         help="the number of worker threads per process (default: 8)",
     )
+    parser.add_argument(
+        "--adaptive-prefetch", action="store_true",
+        help="resize each queue's prefetch based on how quickly its messages are processed",
+    )
+    parser.add_argument(
+        "--min-prefetch", type=int,
+        help="the smallest prefetch adaptive prefetch may use (default: --threads)",
+    )
+    parser.add_argument(
+        "--max-prefetch", type=int,
+        help="the largest prefetch adaptive prefetch may use (default: 100 * --threads)",
+    )
     parser.add_argument(
         "--path", "-P", default=".", nargs="*", type=str,
         help="the module import path (default: .)"
@@ -176,6 +212,19 @@ def make_argument_parser():
         "--use-spawn", action="store_true",
         help="start processes by spawning (default: fork on unix, spawn on windows)"
     )
+    if hasattr(os, "sched_setaffinity"):
+        parser.add_argument(
+            "--cpu-affinity", choices=CPU_AFFINITY_STRATEGIES,
+            help=(
+                "pin each worker process to a single CPU (round-robin) or to "
+                "the CPUs of a NUMA node (numa) (default: no pinning)"
+            )
+        )
+
+    parser.add_argument(
+        "--preload", action="store_true",
+        help="import the broker and modules in the main process before forking worker processes (unix only)"
+    )
     parser.add_argument(
         "--fork-function", "-f", action="append", dest="forks", default=[],
         help="fork a subprocess to run the given function"
@@ -203,6 +252,45 @@ def make_argument_parser():
     return parser
 
 
+def get_numa_nodes(cpus):
+    """Get the CPUs of every NUMA node that has any of the given CPUs.
+    Hosts without NUMA information are treated as a single node.
+
+    Returns:
+      list[set[int]]: The CPUs of each node, ordered by node id.
+    """
+    nodes = []
+    filenames = glob.glob(os.path.join(NUMA_NODES_PATH, "node[0-9]*", "cpulist"))
+    for filename in sorted(filenames, key=lambda f: int(os.path.basename(os.path.dirname(f))[4:])):
+        with open(filename) as f:
+            node_cpus = parse_cpu_list(f.read()) & cpus
+
+        if node_cpus:
+            nodes.append(node_cpus)
+
+    return nodes or [set(cpus)]
+
+
+def get_cpu_affinity(strategy, worker_id):
+    """Get the CPUs a worker process should be pinned to.  Only the
+    CPUs the main process is allowed to run on are considered.
+
+    Parameters:
+      strategy(str): One of ``CPU_AFFINITY_STRATEGIES``.
+      worker_id(int): The worker process' id.
+
+    Returns:
+      set[int]: The CPUs to pin the worker process to.
+    """
+    cpus = os.sched_getaffinity(0)
+    if strategy == "numa":
+        nodes = get_numa_nodes(cpus)
+        return nodes[worker_id % len(nodes)]
+
+    cpus = sorted(cpus)
+    return {cpus[worker_id % len(cpus)]}
+
+
 def setup_pidfile(filename):
     try:
         pid = os.getpid()
@@ -275,28 +363,31 @@ setup_fork_logging = make_logging_setup("ForkProcess")
 
 def watch_logs(log_filename, pipes, stop):
     with file_or_stderr(log_filename, mode="a", encoding="utf-8") as log_file:
-        while pipes and not stop.is_set():
+        while pipes:
+            # Once stopped, drain whatever is left in the pipes and exit.
+            stopping = stop.is_set()
+            lines = []
             try:
-                events = multiprocessing.connection.wait(pipes, timeout=1)
+                events = multiprocessing.connection.wait(pipes, timeout=0 if stopping else 1)
                 for event in events:
                     try:
                         while event.poll():
-                            # StreamHandler writes newlines into the pipe separately
-                            # from the actual log entry; to avoid back-to-back newlines
-                            # in the events pipe (causing multiple entries on a single
-                            # line), discard newline-only data from the pipe
                             try:
                                 data = event.recv_bytes()
                             except EOFError:
                                 event.close()
                                 raise
 
+                            # Child processes send batches of writes at a
+                            # time.  When they don't, StreamHandler may
+                            # send newlines separately from the actual
+                            # log entries so trailing newlines are
+                            # collapsed into one to avoid back-to-back
+                            # newlines in the log.  Blank lines within a
+                            # batch (eg. in tracebacks) are kept.
                             data = data.decode("utf-8", errors="replace").rstrip("\n")
-                            if not data:
-                                continue
-
-                            log_file.write(data + "\n")
-                            log_file.flush()
+                            if data:
+                                lines.append(data + "\n")
                     except BrokenPipeError:
                         event.close()
                         raise
@@ -309,8 +400,24 @@ def watch_logs(log_filename, pipes, stop):
             except (BrokenPipeError, EOFError, OSError):
                 pipes = [p for p in pipes if not p.closed]
 
+            # Everything that was received from all the pipes is
+            # written and flushed in one go.
+            if lines:
+                log_file.writelines(lines)
+                log_file.flush()
+            elif stopping:
+                break
+
 
 def worker_process(args, worker_id, logging_pipe, canteen, event):
+    try:
+        return _worker_process(args, worker_id, logging_pipe, canteen, event)
+    finally:
+        # Send any buffered logs regardless of how the process exits.
+        logging_pipe.close()
+
+
+def _worker_process(args, worker_id, logging_pipe, canteen, event):
     try:
         # Re-seed the random number generator from urandom on
         # supported platforms.  This should make it so that worker
@@ -318,6 +425,11 @@ def worker_process(args, worker_id, logging_pipe, canteen, event):
         random.seed()
 
         logger = setup_worker_logging(args, worker_id, logging_pipe)
+        if getattr(args, "cpu_affinity", None):
+            cpus = get_cpu_affinity(args.cpu_affinity, worker_id)
+            os.sched_setaffinity(0, cpus)
+            logger.info("Pinned worker process to CPUs %s.", format_cpu_list(cpus))
+
         logger.debug("Loading broker...")
         module, broker = import_broker(args.broker)
         broker.emit_after("process_boot")
@@ -336,7 +448,12 @@ def worker_process(args, worker_id, logging_pipe, canteen, event):
                             canteen_add(canteen, fork_path)
 
         logger.debug("Starting worker threads...")
-        worker = Worker(broker, queues=args.queues, worker_threads=args.threads)
+        worker = Worker(
+            broker, queues=args.queues, worker_threads=args.threads,
+            adaptive_prefetch=args.adaptive_prefetch,
+            min_prefetch=args.min_prefetch,
+            max_prefetch=args.max_prefetch,
+        )
         worker.start()
     except ImportError:
         logger.exception("Failed to import module.")
@@ -377,12 +494,19 @@ def worker_process(args, worker_id, logging_pipe, canteen, event):
     logger.info("Worker stopped.")
     broker.close()
 
-    logging_pipe.close()
     if worker.restart_requested:
         sys.exit(RET_RESTART)
 
 
 def fork_process(args, fork_id, fork_path, logging_pipe):
+    try:
+        return _fork_process(args, fork_id, fork_path, logging_pipe)
+    finally:
+        # Send any buffered logs regardless of how the process exits.
+        logging_pipe.close()
+
+
+def _fork_process(args, fork_id, fork_path, logging_pipe):
     try:
         # Re-seed the random number generator from urandom on
         # supported platforms.  This should make it so that worker
@@ -390,9 +514,20 @@ def fork_process(args, fork_id, fork_path, logging_pipe):
         random.seed()
 
         logger = setup_fork_logging(args, fork_id, logging_pipe)
-        logger.debug("Loading fork function...")
 
+        logger.debug("Loading fork function...")
         _, func = import_object(fork_path)
+
+        # Fork functions that need to inspect the broker and its
+        # actors via get_broker() opt into loading them.
+        if getattr(func, "load_broker", False):
+            logger.debug("Loading broker...")
+            _, broker = import_broker(args.broker)
+            set_broker(broker)
+
+            logger.debug("Loading modules...")
+            for module in args.modules:
+                importlib.import_module(module)
     except ImportError:
         logger.exception("Failed to import module.")
         return sys.exit(RET_IMPORT)
@@ -420,6 +555,21 @@ def fork_process(args, fork_id, fork_path, logging_pipe):
     return sys.exit(func())
 
 
+def preload_modules(args):
+    """Import the broker and modules in the main process so that
+    worker processes can share them rather than import them again.
+    """
+    _, broker = import_broker(args.broker)
+    set_broker(broker)
+
+    for module in args.modules:
+        importlib.import_module(module)
+
+    # Don't let worker processes inherit any of the broker's open
+    # connections.  They'll open their own on demand.
+    broker.close()
+
+
 def main(args=None):  # noqa
     args = args or make_argument_parser().parse_args()
     for path in args.path:
@@ -428,6 +578,34 @@ def main(args=None):  # noqa
     if args.use_spawn:
         multiprocessing.set_start_method("spawn")
 
+    context = multiprocessing
+    if args.preload:
+        try:
+            if args.use_spawn or "fork" not in multiprocessing.get_all_start_methods():
+                raise RuntimeError("--preload requires processes to be forked.")
+
+            context = multiprocessing.get_context("fork")
+            preload_modules(args)
+        except (ImportError, RuntimeError) as e:
+            with file_or_stderr(args.log_file) as stream:
+                logger = setup_parent_logging(args, stream=stream)
+                logger.critical(e, exc_info=isinstance(e, ImportError))
+                return RET_IMPORT
+
+    min_processes = args.min_processes or 1
+    max_processes = args.max_processes or args.processes
+    if not 1 <= min_processes <= args.processes <= max_processes:
+        with file_or_stderr(args.log_file) as stream:
+            logger = setup_parent_logging(args, stream=stream)
+            logger.critical("--processes must be between --min-processes and --max-processes.")
+            return RET_IMPORT
+
+    if args.min_prefetch is not None and not 1 <= args.min_prefetch <= (args.max_prefetch or args.min_prefetch):
+        with file_or_stderr(args.log_file) as stream:
+            logger = setup_parent_logging(args, stream=stream)
+            logger.critical("--min-prefetch must be at least 1 and at most --max-prefetch.")
+            return RET_IMPORT
+
     try:
         if args.pid_file:
             setup_pidfile(args.pid_file)
@@ -437,36 +615,47 @@ def main(args=None):  # noqa
             logger.critical(e)
             return RET_PIDFILE
 
-    canteen = multiprocessing.Value(Canteen)
+    canteen = context.Value(Canteen)
     worker_pipes = []
     worker_write_pipes = []
-    worker_processes = []
+    worker_processes = {}
     worker_process_events = []
-    pid_to_worker_id = {}
+
+    # The set of PIDs of worker processes that are being stopped in
+    # order to scale down.
+    retiring_pids = set()
+
+    # The number of worker processes the main process should be
+    # running.  This is changed by scaling signals.
+    target_processes = args.processes
 
     def create_worker_proc(worker_id, write_pipe, event):
-        proc = multiprocessing.Process(
+        proc = context.Process(
             target=worker_process,
-            args=(args, worker_id, StreamablePipe(write_pipe), canteen, event),
+            args=(args, worker_id, StreamablePipe(write_pipe, buffer_size=BUFSIZE), canteen, event),
             daemon=False,
         )
         return proc
 
-    for worker_id in range(args.processes):
-        read_pipe, write_pipe = multiprocessing.Pipe()
-        event = multiprocessing.Event()
-        proc = create_worker_proc(worker_id, write_pipe, event)
-        proc.start()
+    # Logging pipes are set up for as many worker processes as there
+    # may ever be so the log watcher doesn't need to be told about
+    # new ones when scaling up.
+    for worker_id in range(max_processes):
+        read_pipe, write_pipe = context.Pipe()
         worker_pipes.append(read_pipe)
         worker_write_pipes.append(write_pipe)
-        worker_processes.append(proc)
+
+    for worker_id in range(args.processes):
+        event = context.Event()
+        proc = create_worker_proc(worker_id, worker_write_pipes[worker_id], event)
+        proc.start()
+        worker_processes[worker_id] = proc
         worker_process_events.append(event)
-        pid_to_worker_id[proc.pid] = worker_id
 
     # Wait for all worker processes to come online before starting the
     # fork processes.  This is required to avoid race conditions like
     # in #297.
-    for event, proc in zip(worker_process_events, worker_processes):
+    for event, proc in zip(worker_process_events, worker_processes.values()):
         if proc.is_alive():
             if not event.wait(timeout=30):
                 break
@@ -474,17 +663,17 @@ def main(args=None):  # noqa
     fork_pipes = []
     fork_processes = []
     for fork_id, fork_path in enumerate(chain(args.forks, canteen_get(canteen))):
-        read_pipe, write_pipe = multiprocessing.Pipe()
-        proc = multiprocessing.Process(
+        read_pipe, write_pipe = context.Pipe()
+        proc = context.Process(
             target=fork_process,
-            args=(args, fork_id, fork_path, StreamablePipe(write_pipe)),
+            args=(args, fork_id, fork_path, StreamablePipe(write_pipe, buffer_size=BUFSIZE)),
             daemon=True,
         )
         proc.start()
         fork_pipes.append(read_pipe)
         fork_processes.append(proc)
 
-    parent_read_pipe, parent_write_pipe = multiprocessing.Pipe()
+    parent_read_pipe, parent_write_pipe = context.Pipe()
     logger = setup_parent_logging(args, stream=StreamablePipe(parent_write_pipe))
     logger.info("Dramatiq %r is booting up." % __version__)
     if args.pid_file:
@@ -518,7 +707,12 @@ def main(args=None):  # noqa
         nonlocal running
         running = False
 
-        for proc in chain(worker_processes, fork_processes):
+        for proc in chain(worker_processes.values(), fork_processes):
+            # Worker processes that are being scaled down have already
+            # been asked to stop and a second signal would kill them.
+            if proc.pid in retiring_pids:
+                continue
+
             try:
                 os.kill(proc.pid, signum)
             except OSError:  # pragma: no cover
@@ -534,6 +728,34 @@ def main(args=None):  # noqa
         logger.info("Sending signal %r to subprocesses...", getattr(signum, "name", signum))
         stop_subprocesses(signum)
 
+    def scale(signum, frame):
+        nonlocal target_processes
+        if signum == signal.SIGTTIN:
+            target_processes = min(target_processes + 1, max_processes)
+        else:
+            target_processes = max(target_processes - 1, min_processes)
+
+        logger.info("Scaling to %d worker processes...", target_processes)
+
+    def scale_up():
+        worker_id = min(set(range(max_processes)) - set(worker_processes))
+        proc = create_worker_proc(worker_id, worker_write_pipes[worker_id], context.Event())
+        proc.start()
+        worker_processes[worker_id] = proc
+        logger.info("Spawned new worker with PID %r.", proc.pid)
+
+    def scale_down():
+        # Stop the most recently added worker process.  SIGTERM makes
+        # it go through the regular graceful shutdown sequence.
+        worker_id = max(worker_id for worker_id, proc in worker_processes.items() if proc.pid not in retiring_pids)
+        proc = worker_processes[worker_id]
+        retiring_pids.add(proc.pid)
+        logger.info("Stopping worker with PID %r...", proc.pid)
+        try:
+            os.kill(proc.pid, signal.SIGTERM)
+        except OSError:  # pragma: no cover
+            logger.warning("Failed to send %r to PID %d.", signal.SIGTERM, proc.pid)
+
     # Now that the watcher threads have been started, it should be
     # safe to unblock the signals that were previously blocked.
     if hasattr(signal, "pthread_sigmask"):
@@ -549,6 +771,9 @@ def main(args=None):  # noqa
         signal.signal(signal.SIGHUP, sighandler)
     if hasattr(signal, "SIGBREAK"):
         signal.signal(signal.SIGBREAK, sighandler)
+    if hasattr(signal, "SIGTTIN"):
+        signal.signal(signal.SIGTTIN, scale)
+        signal.signal(signal.SIGTTOU, scale)
 
     # Wait for all workers to terminate.  If any of the processes
     # terminates unexpectedly, then shut down the rest as well.  The
@@ -556,23 +781,39 @@ def main(args=None):  # noqa
     # could potentially exit before we even get a chance to wait on
     # them.
     waited = False
-    while not waited or any(p.exitcode is None or (p.exitcode == RET_RESTART and running) for p in worker_processes):
+    while not waited or any(p.exitcode is None or (p.exitcode == RET_RESTART and running) for p in worker_processes.values()):
         waited = True
-        for proc in list(worker_processes):
+        if running:
+            active_processes = len(worker_processes) - len(retiring_pids)
+            for _ in range(target_processes - active_processes):
+                # Retiring worker processes hold on to their slots
+                # until they exit.
+                if len(worker_processes) >= max_processes:
+                    break
+
+                scale_up()
+            for _ in range(active_processes - target_processes):
+                scale_down()
+
+        for worker_id, proc in list(worker_processes.items()):
             proc.join(timeout=1)
             if proc.exitcode is None:
                 continue
 
+            if proc.pid in retiring_pids:
+                logger.info("Worker with PID %r stopped (code %r).", proc.pid, proc.exitcode)
+                retiring_pids.remove(proc.pid)
+                del worker_processes[worker_id]
+                continue
+
             if proc.exitcode == RET_RESTART and running:
                 logger.debug("Worker with PID %r asking for restart (code %r).", proc.pid, proc.exitcode)
                 prev_worker_pid = proc.pid
-                worker_id = pid_to_worker_id[proc.pid]
                 write_pipe = worker_write_pipes[worker_id]
 
-                proc = create_worker_proc(worker_id, write_pipe, multiprocessing.Event())
+                proc = create_worker_proc(worker_id, write_pipe, context.Event())
                 proc.start()
                 worker_processes[worker_id] = proc
-                pid_to_worker_id[proc.pid] = worker_id
                 logger.debug("Spawned new worker with PID %r (replacing PID %r).", proc.pid, prev_worker_pid)
                 continue
 
@@ -14,7 +14,9 @@
 #
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
-from queue import Empty
+from bisect import insort
+from collections import deque
+from queue import Empty, Queue
 from random import uniform
 from time import time
 
@@ -64,6 +66,42 @@ def iter_queue(queue):
             break
 
 
+class WorkQueue(Queue):
+    """A queue of ``(priority, item)`` pairs that keeps a FIFO deque
+    per priority.  Like :class:`queue.PriorityQueue`, items with lower
+    priorities come out first, but putting and getting items are O(1)
+    in the number of items and items with equal priorities come out
+    in the order they were put in.
+    """
+
+    def _init(self, maxsize):
+        self.queues = {}
+        self.priorities = []
+        self.size = 0
+
+    def _qsize(self):
+        return self.size
+
+    def _put(self, item):
+        priority = item[0]
+        try:
+            self.queues[priority].append(item)
+        except KeyError:
+            self.queues[priority] = deque([item])
+            insort(self.priorities, priority)
+
+        self.size += 1
+
+    def _get(self):
+        # There are typically only a handful of distinct priorities so
+        # a linear scan over them is cheaper than maintaining a heap.
+        for priority in self.priorities:
+            queue = self.queues[priority]
+            if queue:
+                self.size -= 1
+                return queue.popleft()
+
+
 def join_queue(queue, timeout=None):
     """The join() method of standard queues in Python doesn't support
     timeouts.  This implements the same functionality as that method,
@@ -130,3 +168,35 @@ def xq_name(queue_name):
     if queue_name.endswith(".DQ"):
         queue_name = queue_name[:-3]
     return queue_name + ".XQ"
+
+
+def parse_cpu_list(value):
+    """Parse a Linux-style CPU list (eg. ``"0-3,8,10-11"``).
+
+    Returns:
+      set[int]: The CPUs in the list.
+    """
+    cpus = set()
+    for part in value.strip().split(","):
+        if not part:
+            continue
+
+        start, _, end = part.partition("-")
+        cpus.update(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def format_cpu_list(cpus):
+    """Format a set of CPUs as a Linux-style CPU list.
+
+    Returns:
+      str: The CPUs, with consecutive CPUs collapsed into ranges.
+    """
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+
+    return ",".join(str(start) if start == end else "%d-%d" % (start, end) for start, end in ranges)
@@ -19,6 +19,8 @@
 # module can and *will* change without notice.
 
 import sys
+import threading
+import time
 from contextlib import contextmanager
 
 
@@ -26,27 +28,135 @@ class StreamablePipe:
     """Wrap a multiprocessing.connection.Connection so it can be used
     with logging's StreamHandler.
 
+    When ``buffer_size`` is set, writes are coalesced in memory and
+    sent over the pipe in batches by a background thread, either once
+    ``buffer_size`` bytes have accumulated or every
+    ``flush_interval`` milliseconds.  Writers never block on the pipe
+    in that mode: if more than ``max_buffer_size`` bytes are waiting
+    to be sent, new writes are dropped and counted instead.  Buffered
+    pipes must be closed in order for pending writes to be sent.
+
     Parameters:
       pipe(multiprocessing.connection.Connection): writable end of the
         pipe to be used for transmitting child worker logging data to
         parent.
+      buffer_size(int): The number of bytes to accumulate before
+        sending them.  Defaults to None, meaning every write is sent
+        immediately.
+      flush_interval(int): The maximum amount of time, in
+        milliseconds, buffered writes are held for.
+      max_buffer_size(int): The number of buffered bytes past which
+        writes are dropped.  Defaults to 16 times ``buffer_size``.
+
+    Attributes:
+      dropped(int): The number of writes that were dropped.
     """
 
-    def __init__(self, pipe, *, encoding="utf-8"):
+    def __init__(self, pipe, *, encoding="utf-8", buffer_size=None, flush_interval=100, max_buffer_size=None):
         self.encoding = encoding
         self.pipe = pipe
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.max_buffer_size = max_buffer_size or (buffer_size or 0) * 16
+        self._reset()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ("buffer", "buffered", "dropped", "cond", "flusher", "closed"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def _reset(self):
+        self.buffer = []
+        self.buffered = 0
+        self.dropped = 0
+        self.cond = threading.Condition()
+        self.flusher = None
+        self.closed = False
 
     def flush(self):
+        # StreamHandler flushes after every record so this is a no-op
+        # in order to let buffered writes accumulate.
         pass
 
     def close(self):
+        if self.buffer_size and not self.closed:
+            with self.cond:
+                self.closed = True
+                self.cond.notify()
+
+            if self.flusher is not None:
+                self.flusher.join()
+            self._send_buffer()
+
         self.pipe.close()
 
     def read(self):  # pragma: no cover
         raise NotImplementedError("StreamablePipes cannot be read from!")
 
     def write(self, s):
-        self.pipe.send_bytes(s.encode(self.encoding, errors="replace"))
+        data = s.encode(self.encoding, errors="replace")
+        if not self.buffer_size:
+            self.pipe.send_bytes(data)
+            return
+
+        with self.cond:
+            if self.buffered + len(data) > self.max_buffer_size:
+                self.dropped += 1
+                return
+
+            self.buffer.append(data)
+            self.buffered += len(data)
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flush_buffer, name="StreamablePipeFlusher", daemon=True)
+                self.flusher.start()
+
+            if self.buffered >= self.buffer_size:
+                self.cond.notify()
+
+    def _take_buffer(self):
+        buffer, self.buffer, self.buffered = self.buffer, [], 0
+        if self.dropped:
+            buffer.append(("Dropped %d log messages because the log pipe was full.\n" % self.dropped).encode(self.encoding))
+            self.dropped = 0
+        return buffer
+
+    def _send_buffer(self):
+        with self.cond:
+            buffer = self._take_buffer()
+
+        if buffer:
+            self.pipe.send_bytes(b"".join(buffer))
+
+    def _flush_buffer(self):
+        interval = self.flush_interval / 1000
+        while True:
+            with self.cond:
+                deadline = time.monotonic() + interval
+                while not self.closed and self.buffered < self.buffer_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+
+                    self.cond.wait(timeout)
+
+                if self.closed:
+                    return
+
+                buffer = self._take_buffer()
+
+            # The pipe may be full so the data is sent outside of the
+            # lock in order to let writers keep buffering (or
+            # dropping) writes while this blocks.
+            if buffer:
+                try:
+                    self.pipe.send_bytes(b"".join(buffer))
+                except OSError:
+                    return
 
 
 def file_or_stderr(filename, *, mode="a", encoding="utf-8"):
@@ -19,6 +19,7 @@ import abc
 import json
 import pickle
 import typing
+from json.decoder import WHITESPACE, scanstring
 
 #: Represents the contents of a Message object as a dict.
 MessageData = typing.Dict[str, typing.Any]
@@ -40,6 +41,27 @@ class Encoder(abc.ABC):
         """
         raise NotImplementedError
 
+    def decode_partially(self, data: bytes, keys: typing.Iterable[str]) -> typing.Tuple[MessageData, typing.Any]:
+        """Convert a bytestring into message metadata, stopping as
+        soon as all of the given keys have been decoded.  Encoders
+        that can't stop early decode the whole bytestring.
+
+        Encoders that do stop early must still reject malformed data
+        up front rather than when the rest of it is decoded.
+
+        Returns:
+          tuple[dict, object]: The decoded metadata and whatever
+          :meth:`decode_remainder` needs to decode the rest of it, or
+          None if all of it was decoded.
+        """
+        return self.decode(data), None
+
+    def decode_remainder(self, remainder: typing.Any) -> MessageData:  # pragma: no cover
+        """Decode the metadata that a call to :meth:`decode_partially`
+        left undecoded.
+        """
+        raise NotImplementedError
+
 
 class JSONEncoder(Encoder):
     """Encodes messages as JSON.  This is the default encoder.
@@ -51,6 +73,26 @@ class JSONEncoder(Encoder):
     def decode(self, data: bytes) -> MessageData:
         return json.loads(data.decode("utf-8"))
 
+    def decode_partially(self, data: bytes, keys: typing.Iterable[str]) -> typing.Tuple[MessageData, typing.Any]:
+        text = data.decode("utf-8")
+        try:
+            data, idx = _scan_object(text, set(keys))
+            if idx is None:
+                return data, None
+
+            _check_structure(text, idx)
+            return data, (text, idx)
+        except (IndexError, StopIteration, ValueError):
+            # Leave it up to the full decoder to raise an appropriate
+            # error for malformed data.
+            return json.loads(text), None
+
+    def decode_remainder(self, remainder: typing.Any) -> MessageData:
+        # The remaining members are decoded as an object of their own
+        # so that the C decoder does all of the work.
+        text, idx = remainder
+        return json.loads("{" + text[idx:])
+
 
 class PickleEncoder(Encoder):
     """Pickles messages.
@@ -62,3 +104,82 @@ class PickleEncoder(Encoder):
 
     encode = pickle.dumps
     decode = pickle.loads
+
+
+_scan_value = json.JSONDecoder().scan_once
+
+
+def _skip_whitespace(text, idx):
+    # Messages are encoded without any whitespace so the regular
+    # expression is only ever needed for data encoded elsewhere.
+    if text[idx] in " \t\n\r":
+        return WHITESPACE.match(text, idx).end()
+    return idx
+
+
+def _scan_object(text, keys):
+    """Decode the members of the JSON object in text, one at a time,
+    until all of the given keys have been seen.
+    """
+    idx = _skip_whitespace(text, 0)
+    if text[idx] != "{":
+        raise ValueError("expected an object")
+
+    idx = _skip_whitespace(text, idx + 1)
+    if text[idx] == "}":
+        return _check_end(text, idx, {})
+
+    return _scan_members(text, idx, {}, keys)
+
+
+def _scan_members(text, idx, data, keys=None):
+    """Decode the members of a JSON object starting at idx until all
+    of the given keys, or all of the members if there are no keys,
+    have been seen.  Returns the index of the next member or None if
+    the object was decoded in full.
+    """
+    while keys is None or keys:
+        if text[idx] != '"':
+            raise ValueError("expected a key")
+
+        key, idx = scanstring(text, idx + 1)
+        if text[idx] != ":":
+            idx = _skip_whitespace(text, idx)
+            if text[idx] != ":":
+                raise ValueError("expected a colon")
+
+        data[key], idx = _scan_value(text, _skip_whitespace(text, idx + 1))
+        if keys is not None:
+            keys.discard(key)
+        if text[idx] != ",":
+            idx = _skip_whitespace(text, idx)
+            if text[idx] == "}":
+                return _check_end(text, idx, data)
+
+            if text[idx] != ",":
+                raise ValueError("expected a comma")
+
+        idx = _skip_whitespace(text, idx + 1)
+
+    return data, idx
+
+
+def _check_end(text, idx, data):
+    if idx + 1 < len(text) and _skip_whitespace(text, idx + 1) != len(text):
+        raise ValueError("extra data")
+
+    return data, None
+
+
+def _check_structure(text, idx):
+    """Check that the members from idx onward can be decoded later:
+    that their strings are terminated and that they close the object.
+    This catches truncated data, but checking any more than that costs
+    about as much as decoding the members.
+    """
+    quotes = text.count('"', idx)
+    if "\\" in text:
+        quotes -= text[idx:].replace("\\\\", "").count('\\"')
+
+    if quotes % 2 or text.rstrip()[-1:] != "}":
+        raise ValueError("malformed data")
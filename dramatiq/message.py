@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
 import time
 import uuid
 from collections import namedtuple
@@ -27,6 +28,18 @@ from .results import Results
 #: The global encoder instance.
 global_encoder = JSONEncoder()
 
+#: The message fields that lazily-decoded messages decode up front.
+#: Messages are encoded with these fields first so decoders can stop
+#: before they get to the arguments.
+ROUTING_FIELDS = ("queue_name", "actor_name", "message_id", "message_timestamp", "options")
+
+#: The size, in bytes, from which consumers decode messages lazily.
+#: Decoding a message lazily and then accessing its arguments costs
+#: more than decoding it in one go, so this is off (0) by default and
+#: is only worth turning on when many large messages are fetched but
+#: never processed (eg. because they get rate limited or skipped).
+LAZY_DECODE_THRESHOLD = int(os.getenv("dramatiq_lazy_decode_threshold", 0))
+
 
 def get_encoder() -> Encoder:
     """Get the global encoder object.
@@ -95,17 +108,49 @@ class Message(namedtuple("Message", (
         """
         return cls(**global_encoder.decode(data))
 
+    @classmethod
+    def decode_lazily(cls, data):
+        """Convert a bytestring to a message, leaving the message's
+        arguments to be decoded when they're first accessed.  Only
+        bytestrings of at least ``LAZY_DECODE_THRESHOLD`` bytes are
+        decoded lazily and nothing is if the threshold is 0.
+
+        Raises:
+          ValueError: If the data is malformed.
+
+        Returns:
+          Message or LazyMessage: A plain message if the data was
+          small or if the encoder had to decode all of it anyway.
+        """
+        if not LAZY_DECODE_THRESHOLD or len(data) < LAZY_DECODE_THRESHOLD:
+            return cls.decode(data)
+
+        message_data, remainder = global_encoder.decode_partially(data, ROUTING_FIELDS)
+        if remainder is None:
+            return cls(**message_data)
+        return LazyMessage(remainder, message_data)
+
     def encode(self):
         """Convert this message to a bytestring.
         """
-        return global_encoder.encode(self._asdict())
+        return global_encoder.encode({
+            "queue_name": self.queue_name,
+            "actor_name": self.actor_name,
+            "message_id": self.message_id,
+            "message_timestamp": self.message_timestamp,
+            "options": self.options,
+            "args": self.args,
+            "kwargs": self.kwargs,
+        })
 
     def copy(self, **attributes):
         """Create a copy of this message.
         """
-        updated_options = attributes.pop("options", {})
-        options = self.options.copy()
-        options.update(updated_options)
+        updated_options = attributes.pop("options", None)
+        if updated_options:
+            options = {**self.options, **updated_options}
+        else:
+            options = self.options.copy()
         return self._replace(**attributes, options=options)
 
     def get_result(self, *, backend=None, block=False, timeout=None):
@@ -153,3 +198,81 @@ class Message(namedtuple("Message", (
             params += ", ".join("%s=%r" % (name, value) for name, value in self.kwargs.items())
 
         return "%s(%s)" % (self.actor_name, params)
+
+
+class LazyMessage:
+    """A message whose routing fields have been decoded but whose
+    arguments haven't.  Accessing any other attribute decodes the
+    rest of the message and forwards the access to it.
+
+    Parameters:
+      remainder(object): The part of the encoded message that has yet
+        to be decoded, as returned by the encoder.
+      message_data(dict): The fields decoded off of the message.  It
+        must contain every routing field and it may contain others if
+        they were encoded before the routing fields.
+    """
+
+    __slots__ = ROUTING_FIELDS + ("_data", "_remainder", "_message")
+
+    def __init__(self, remainder, message_data):
+        self._data = message_data
+        self._remainder = remainder
+        self._message = None
+        for name in ROUTING_FIELDS:
+            setattr(self, name, message_data[name])
+
+    @property
+    def is_decoded(self):
+        """bool: Whether or not the rest of the message has been
+        decoded.
+        """
+        return self._message is not None
+
+    @property
+    def message(self):
+        """Message: The fully-decoded message.
+        """
+        if self._message is None:
+            # The routing fields are taken from this object so changes
+            # made to the options before the message was decoded
+            # aren't lost.
+            message_data = self._data
+            message_data.update(global_encoder.decode_remainder(self._remainder))
+            message_data.update({name: getattr(self, name) for name in ROUTING_FIELDS})
+            self._message = Message(**message_data)
+            self._data = self._remainder = None
+
+        return self._message
+
+    def __getattr__(self, name):
+        # This object's own attributes are never forwarded so that
+        # objects that haven't been fully initialized (eg. while being
+        # unpickled) don't recurse forever.
+        if name in ("_data", "_remainder", "_message"):
+            raise AttributeError(name)
+        return getattr(self.message, name)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyMessage):
+            other = other.message
+        return self.message == other
+
+    def __lt__(self, other):
+        if isinstance(other, LazyMessage):
+            other = other.message
+        return self.message < other
+
+    def __gt__(self, other):
+        if isinstance(other, LazyMessage):
+            other = other.message
+        return self.message > other
+
+    def __or__(self, other) -> pipeline:
+        return self.message | other
+
+    def __str__(self):
+        return str(self.message)
+
+    def __repr__(self):
+        return repr(self.message)
@@ -20,7 +20,9 @@ from .callbacks import Callbacks
 from .current_message import CurrentMessage
 from .middleware import Middleware, MiddlewareError, SkipMessage
 from .pipelines import Pipelines
+from .profiler import Profiler
 from .prometheus import Prometheus
+from .rate_limits import RateLimits
 from .retries import Retries
 from .shutdown import Shutdown, ShutdownNotifications
 from .threading import Interrupt, raise_thread_exception
@@ -38,7 +40,8 @@ __all__ = [
     # Middlewares
     "AgeLimit", "Callbacks", "CurrentMessage", "Pipelines", "Retries",
     "Shutdown", "ShutdownNotifications", "TimeLimit", "TimeLimitExceeded",
-    "Prometheus", "MaxTasksPerChild", "MaxMemoryPerChild"
+    "Prometheus", "MaxTasksPerChild", "MaxMemoryPerChild", "RateLimits",
+    "Profiler",
 ]
 
 
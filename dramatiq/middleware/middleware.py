@@ -47,7 +47,8 @@ class Middleware:
     @property
     def forks(self):
         """A list of functions to run in separate forks of the main
-        process.
+        process.  Fork processes only load the broker and its actors
+        for functions whose ``load_broker`` attribute is true.
         """
         return []
 
@@ -117,6 +118,15 @@ class Middleware:
         has been skippped.
         """
 
+    def after_post_process_message(self, broker, message, *, timings):
+        """Called after a message has been acknowledged or rejected.
+
+        Parameters:
+          timings(dict[str, float]): How long, in milliseconds, the
+            message spent in each stage of processing.  See
+            :meth:`MessageProxy.get_timings<dramatiq.MessageProxy.get_timings>`.
+        """
+
     def after_process_boot(self, broker):
         """Called immediately after subprocess start up.
         """
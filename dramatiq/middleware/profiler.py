@@ -0,0 +1,222 @@
+# This file is a part of Dramatiq.
+#
+# Copyright (C) 2017,2018,2019 CLEARTYPE SRL <bogdan@cleartype.io>
+#
+# Dramatiq is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+#
+# Dramatiq is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import glob
+import os
+import signal
+import sys
+import tempfile
+import threading
+from collections import defaultdict
+
+from ..logging import get_logger
+from .middleware import Middleware
+
+#: The directory worker processes dump their profiles to.
+PROFILES_PATH = os.getenv("dramatiq_profiles_dir", "%s/dramatiq-profiles" % tempfile.gettempdir())
+
+#: The default interval, in milliseconds, at which worker threads
+#: are sampled.
+DEFAULT_SAMPLE_INTERVAL = 100
+
+#: The default interval, in milliseconds, at which profiles are
+#: dumped to disk.
+DEFAULT_DUMP_INTERVAL = 60000
+
+
+class Profiler(Middleware):
+    """A middleware that periodically samples the stacks of worker
+    threads while they process messages.
+
+    Samples are aggregated per actor and dumped to a file per worker
+    process in the collapsed stack format understood by
+    flamegraph.pl_ and speedscope_.  Profiles are dumped every
+    ``dump_interval`` milliseconds, on shutdown and whenever a worker
+    process receives ``SIGUSR1``.  When the |Prometheus| middleware
+    is also in use, the profiles of all the running worker processes
+    are merged and served at the exposition server's ``/profile``
+    path.
+
+    Stacks start at the frame that runs ``before_process_message``
+    hooks so the worker's own frames are left out.
+
+    Warning:
+      Profile files aren't removed when worker processes exit.
+
+    Parameters:
+      interval(int): The interval, in milliseconds, at which worker
+        threads are sampled.
+      dump_interval(int): The interval, in milliseconds, at which
+        profiles are dumped to disk.  Set this to None to only dump
+        profiles on demand.
+      path(str): The directory to dump profiles to.
+
+    .. _flamegraph.pl: https://github.com/brendangregg/FlameGraph
+    .. _speedscope: https://www.speedscope.app
+    """
+
+    def __init__(self, *, interval=DEFAULT_SAMPLE_INTERVAL, dump_interval=DEFAULT_DUMP_INTERVAL, path=PROFILES_PATH):
+        self.logger = get_logger(__name__, type(self))
+        self.interval = interval / 1000
+        self.dump_interval = dump_interval and dump_interval / 1000
+        self.path = path
+        self.lock = threading.Lock()
+        self.actors = {}
+        self.stacks = defaultdict(int)
+        self.labels = {}
+        self.root_code = None
+        self.previous_handler = None
+        self.stopped = threading.Event()
+
+    @property
+    def filename(self):
+        return os.path.join(self.path, "%d.collapsed" % os.getpid())
+
+    def after_worker_boot(self, broker, worker):
+        # This import must happen at runtime to avoid a circular
+        # import between the worker and the middleware modules.
+        from ..worker import _WorkerThread
+        self.root_code = _WorkerThread.process_message.__code__
+
+        os.makedirs(self.path, exist_ok=True)
+        if self._can_handle_signals():
+            self.previous_handler = signal.signal(signal.SIGUSR1, self._dump_on_signal)
+
+        self.stopped.clear()
+        thread = threading.Thread(target=self._sampler, name="ProfilerSampler", daemon=True)
+        thread.start()
+
+    def before_worker_shutdown(self, broker, worker):
+        self.stopped.set()
+        self.dump()
+
+    def after_worker_shutdown(self, broker, worker):
+        if self.previous_handler is not None and self._can_handle_signals():
+            signal.signal(signal.SIGUSR1, self.previous_handler)
+            self.previous_handler = None
+
+    def before_process_message(self, broker, message):
+        self.actors[threading.get_ident()] = message.actor_name
+
+    def after_process_message(self, broker, message, *, result=None, exception=None):
+        self.actors.pop(threading.get_ident(), None)
+
+    after_skip_message = after_process_message
+
+    def sample(self):
+        """Record the current stack of every worker thread that's
+        processing a message.
+        """
+        frames = sys._current_frames()
+        with self.lock:
+            for thread_id, actor_name in list(self.actors.items()):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.stacks[actor_name, self._collapse(frame)] += 1
+
+    def get_collapsed_stacks(self):
+        """Get the stacks sampled so far.
+
+        Returns:
+          list[str]: One line per distinct stack, made up of the name
+          of the actor and of each frame, from the outermost to the
+          innermost, separated by semicolons and followed by the
+          number of times the stack was sampled.
+        """
+        with self.lock:
+            stacks = list(self.stacks.items())
+
+        return [
+            "%s %d" % (";".join(filter(None, (actor_name, stack))), count)
+            for (actor_name, stack), count in stacks
+        ]
+
+    def dump(self):
+        """Write the stacks sampled so far to this process' profile
+        file.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(fd, "w") as f:
+            for line in self.get_collapsed_stacks():
+                f.write(line + "\n")
+
+        os.replace(temp_path, self.filename)
+
+    def _collapse(self, frame):
+        stack = []
+        while frame is not None and frame.f_code is not self.root_code:
+            code = frame.f_code
+            try:
+                label = self.labels[code]
+            except KeyError:
+                label = self.labels[code] = "%s (%s:%d)" % (code.co_name, code.co_filename, code.co_firstlineno)
+
+            stack.append(label)
+            frame = frame.f_back
+
+        return ";".join(reversed(stack))
+
+    def _sampler(self):
+        dump_countdown = self.dump_interval
+        while not self.stopped.wait(self.interval):
+            try:
+                self.sample()
+                if dump_countdown:
+                    dump_countdown -= self.interval
+                    if dump_countdown <= 0:
+                        dump_countdown = self.dump_interval
+                        self.dump()
+            except Exception:  # pragma: no cover
+                self.logger.exception("Failed to sample worker threads.")
+
+    def _can_handle_signals(self):
+        # Signal handlers can only be changed from the main thread.
+        return hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread()
+
+    def _dump_on_signal(self, signum, frame):
+        self.logger.info("Dumping profile to %r...", self.filename)
+        self.dump()
+
+
+def collect_profiles(path=PROFILES_PATH):
+    """Merge the profiles of all the running worker processes.
+
+    Parameters:
+      path(str): The directory profiles are dumped to.
+
+    Returns:
+      list[str]: The merged collapsed stacks.
+    """
+    stacks = defaultdict(int)
+    for filename in glob.glob(os.path.join(path, "*.collapsed")):
+        pid = int(os.path.basename(filename).split(".")[0])
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            continue
+        except PermissionError:  # pragma: no cover
+            pass
+
+        try:
+            with open(filename) as f:
+                for line in f:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    stacks[stack] += int(count)
+        except FileNotFoundError:  # pragma: no cover
+            continue
+
+    return ["%s %d" % item for item in stacks.items()]
@@ -15,11 +15,15 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import bisect
 import os
 import tempfile
+import threading
+import time
+from collections import defaultdict
 from http.server import BaseHTTPRequestHandler, HTTPServer
 
-from ..common import current_millis
+from ..common import current_millis, format_cpu_list
 from ..logging import get_logger
 from .middleware import Middleware
 
@@ -39,17 +43,56 @@ HTTP_HOST = os.getenv("dramatiq_prom_host", "0.0.0.0")
 #: The HTTP port the exposition server should listen on.
 HTTP_PORT = int(os.getenv("dramatiq_prom_port", "9191"))
 
+#: The interval, in milliseconds, at which the exposition server
+#: samples queue statistics from the broker.  Set this to 0 to turn
+#: queue statistics off.
+QUEUE_STATS_INTERVAL = int(os.getenv("dramatiq_prom_queue_stats_interval", "5000"))
+
+#: The default interval, in milliseconds, at which buffered metrics
+#: are written to the database.
+DEFAULT_FLUSH_INTERVAL = 1000
+
+#: The buckets message durations are grouped into.
+DURATION_BUCKETS = (
+    5, 10, 25, 50, 75, 100, 250, 500, 750, 1000, 2500, 5000,
+    7500, 10000, 30000, 60000, 600000, 900000, float("inf"),
+)
+
+#: The buckets the durations of the individual stages of message
+#: processing are grouped into.
+STAGE_DURATION_BUCKETS = (
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000,
+    2500, 5000, 10000, 30000, 60000, 600000, float("inf"),
+)
+
 
 class Prometheus(Middleware):
     """A middleware that exports stats via Prometheus_.
 
+    Metrics are aggregated in memory and written to the multiprocess
+    database in batches by a background thread in every worker
+    process, so processing a message never touches the database
+    files.  Scraped metrics may lag behind by up to ``flush_interval``.
+
+    Parameters:
+      flush_interval(int): The interval, in milliseconds, at which
+        buffered metrics are written to the database.
+      stage_durations(bool): Whether or not to export the time
+        messages spend in each stage of processing.  This records an
+        observation for every stage of every message so it's off by
+        default.
+
     .. _Prometheus: https://prometheus.io
     """
 
-    def __init__(self):
+    def __init__(self, *, flush_interval=DEFAULT_FLUSH_INTERVAL, stage_durations=False):
         self.logger = get_logger(__name__, type(self))
+        self.flush_interval = flush_interval / 1000
+        self.stage_durations = stage_durations
         self.delayed_messages = set()
         self.message_start_times = {}
+        self.buffer = _MetricsBuffer()
+        self.stopped = threading.Event()
 
     @property
     def forks(self):
@@ -105,55 +148,225 @@ class Prometheus(Middleware):
             "dramatiq_message_duration_milliseconds",
             "The time spent processing messages.",
             ["queue_name", "actor_name"],
-            buckets=(5, 10, 25, 50, 75, 100, 250, 500, 750, 1000, 2500, 5000,
-                     7500, 10000, 30000, 60000, 600000, 900000, float("inf")),
+            buckets=DURATION_BUCKETS,
             registry=registry,
         )
+        if self.stage_durations:
+            self.message_stage_durations = prom.Histogram(
+                "dramatiq_message_stage_duration_milliseconds",
+                "The time messages spend in each stage of processing.",
+                ["queue_name", "actor_name", "stage"],
+                buckets=STAGE_DURATION_BUCKETS,
+                registry=registry,
+            )
+
+        if hasattr(os, "sched_getaffinity"):
+            self.cpu_affinity = prom.Gauge(
+                "dramatiq_worker_cpu_affinity",
+                "The CPUs each worker process may run on.",
+                ["cpus"],
+                registry=registry,
+                multiprocess_mode="liveall",
+            )
+            self.cpu_affinity.labels(format_cpu_list(os.sched_getaffinity(0))).set(1)
+
+        self.stopped.clear()
+        thread = threading.Thread(target=self._flusher, name="PrometheusFlusher", daemon=True)
+        thread.start()
 
     def after_worker_shutdown(self, broker, worker):
         from prometheus_client import multiprocess
 
+        self.stopped.set()
+        self.flush()
+
         self.logger.debug("Marking process dead...")
         multiprocess.mark_process_dead(os.getpid(), DB_PATH)
 
+    def flush(self):
+        """Write all the buffered metrics to the database.
+        """
+        counts, observations = self.buffer.swap()
+        for (metric, labels), amount in counts.items():
+            if amount:
+                metric.labels(*labels).inc(amount)
+
+        for (metric, labels), (buckets, total) in observations.items():
+            # The histogram's public API only records one observation
+            # at a time and every one of them is a write to the
+            # database in multiprocess mode, so the aggregated bucket
+            # counts and sum are written to its values directly.
+            child = metric.labels(*labels)
+            child._sum.inc(total)
+            for value, count in zip(child._buckets, buckets):
+                if count:
+                    value.inc(count)
+
+    def _flusher(self):
+        while not self.stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:  # pragma: no cover
+                self.logger.exception("Failed to flush metrics.")
+
     def after_nack(self, broker, message):
         labels = (message.queue_name, message.actor_name)
-        self.total_rejected_messages.labels(*labels).inc()
+        self.buffer.inc(self.total_rejected_messages, labels)
 
     def after_enqueue(self, broker, message, delay):
         if "retries" in message.options:
             labels = (message.queue_name, message.actor_name)
-            self.total_retried_messages.labels(*labels).inc()
+            self.buffer.inc(self.total_retried_messages, labels)
 
     def before_delay_message(self, broker, message):
         labels = (message.queue_name, message.actor_name)
         self.delayed_messages.add(message.message_id)
-        self.inprogress_delayed_messages.labels(*labels).inc()
+        self.buffer.inc(self.inprogress_delayed_messages, labels)
 
     def before_process_message(self, broker, message):
         labels = (message.queue_name, message.actor_name)
         if message.message_id in self.delayed_messages:
             self.delayed_messages.remove(message.message_id)
-            self.inprogress_delayed_messages.labels(*labels).dec()
+            self.buffer.inc(self.inprogress_delayed_messages, labels, -1)
 
-        self.inprogress_messages.labels(*labels).inc()
+        self.buffer.inc(self.inprogress_messages, labels)
         self.message_start_times[message.message_id] = current_millis()
 
     def after_process_message(self, broker, message, *, result=None, exception=None):
         labels = (message.queue_name, message.actor_name)
         message_start_time = self.message_start_times.pop(message.message_id, current_millis())
         message_duration = current_millis() - message_start_time
-        self.message_durations.labels(*labels).observe(message_duration)
-        self.inprogress_messages.labels(*labels).dec()
-        self.total_messages.labels(*labels).inc()
+        self.buffer.observe(self.message_durations, labels, message_duration, DURATION_BUCKETS)
+        self.buffer.inc(self.inprogress_messages, labels, -1)
+        self.buffer.inc(self.total_messages, labels)
         if exception is not None:
-            self.total_errored_messages.labels(*labels).inc()
+            self.buffer.inc(self.total_errored_messages, labels)
 
     after_skip_message = after_process_message
 
+    def after_post_process_message(self, broker, message, *, timings):
+        if not self.stage_durations:
+            return
+
+        for stage, duration in timings.items():
+            labels = (message.queue_name, message.actor_name, stage)
+            self.buffer.observe(self.message_stage_durations, labels, duration, STAGE_DURATION_BUCKETS)
+
+
+class _MetricsBuffer:
+    """Accumulates metric updates in memory until they're flushed.
+    Histogram observations are aggregated into per-bucket counts and
+    a sum so the buffer's size doesn't grow with the number of
+    observations.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = defaultdict(int)
+        self.observations = {}
+
+    def inc(self, metric, labels, amount=1):
+        with self.lock:
+            self.counts[metric, labels] += amount
+
+    def observe(self, metric, labels, amount, buckets):
+        # Histograms count an observation against the first bucket
+        # whose upper bound is greater than or equal to it.
+        index = bisect.bisect_left(buckets, amount)
+        with self.lock:
+            try:
+                counts, total = self.observations[metric, labels]
+            except KeyError:
+                counts, total = [0] * len(buckets), 0
+
+            counts[index] += 1
+            self.observations[metric, labels] = counts, total + amount
+
+    def swap(self):
+        """Take all the pending updates out of the buffer.
+
+        Returns:
+          tuple: The pending counter and gauge updates and the pending
+          histogram bucket counts and sums.
+        """
+        with self.lock:
+            counts, self.counts = self.counts, defaultdict(int)
+            observations, self.observations = self.observations, {}
+            return counts, observations
+
+
+class _QueueStatsCollector:
+    """Periodically samples statistics about every declared queue
+    from the broker and exposes the latest sample as gauges.
+    """
+
+    def __init__(self, broker, interval):
+        self.logger = get_logger(__name__, type(self))
+        self.broker = broker
+        self.interval = interval / 1000
+        self.stats = {}
+
+    def start(self):
+        thread = threading.Thread(target=self._sample, name="QueueStatsSampler", daemon=True)
+        thread.start()
+
+    def _sample(self):
+        while True:
+            stats = {}
+            delay_queues = self.broker.get_declared_delay_queues()
+            for queue_name in self.broker.get_declared_queues() - delay_queues:
+                try:
+                    stats[queue_name] = self.broker.get_queue_stats(queue_name)
+                except NotImplementedError:
+                    self.logger.warning("Broker %r doesn't support queue statistics.", type(self.broker).__name__)
+                    return
+                except Exception:
+                    self.logger.exception("Failed to get statistics for queue %r.", queue_name)
+
+            self.stats = stats
+            time.sleep(self.interval)
+
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+
+        families = [
+            GaugeMetricFamily(
+                "dramatiq_queue_messages",
+                "The number of messages waiting on each queue.",
+                labels=["queue_name"],
+            ),
+            GaugeMetricFamily(
+                "dramatiq_queue_delayed_messages",
+                "The number of messages on each delay queue.",
+                labels=["queue_name"],
+            ),
+            GaugeMetricFamily(
+                "dramatiq_queue_dead_messages",
+                "The number of messages on each dead letter queue.",
+                labels=["queue_name"],
+            ),
+            GaugeMetricFamily(
+                "dramatiq_queue_oldest_message_age_milliseconds",
+                "The age of the message at the head of each queue.",
+                labels=["queue_name"],
+            ),
+        ]
+        for queue_name, stats in self.stats.items():
+            for family, value in zip(families, stats):
+                if value is not None:
+                    family.add_metric([queue_name], value)
+
+        return families
+
 
 class _metrics_handler(BaseHTTPRequestHandler):
+    collectors = []
+    profiles_path = None
+
     def do_GET(self):
+        if self.path == "/profile":
+            return self.send_profile()
+
         os.environ["prometheus_multiproc_dir"] = DB_PATH
 
         # These imports must happen at runtime.  See above.
@@ -162,21 +375,58 @@ class _metrics_handler(BaseHTTPRequestHandler):
 
         registry = prom.CollectorRegistry()
         prom_mp.MultiProcessCollector(registry)
+        for collector in self.collectors:
+            registry.register(collector)
+
         output = prom.generate_latest(registry)
         self.send_response(200)
         self.send_header("content-type", prom.CONTENT_TYPE_LATEST)
         self.end_headers()
         self.wfile.write(output)
 
+    def send_profile(self):
+        from .profiler import PROFILES_PATH, collect_profiles
+
+        profiles = collect_profiles(self.profiles_path or PROFILES_PATH)
+        output = "".join(line + "\n" for line in profiles).encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", "text/plain; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(output)
+
     def log_message(self, fmt, *args):
         logger = get_logger(__name__, type(self))
         logger.debug(fmt, *args)
 
 
+def _configure_metrics_handler(broker):
+    """Set the metrics handler up to sample the broker's queues and
+    to serve profiles from wherever the broker's profiler dumps them.
+    """
+    from .profiler import Profiler
+
+    if QUEUE_STATS_INTERVAL:
+        collector = _QueueStatsCollector(broker, QUEUE_STATS_INTERVAL)
+        collector.start()
+        _metrics_handler.collectors = [collector]
+
+    for middleware in broker.middleware:
+        if isinstance(middleware, Profiler):
+            _metrics_handler.profiles_path = middleware.path
+            break
+
+
 def _run_exposition_server():
     logger = get_logger(__name__, "_run_exposition_server")
     logger.debug("Starting exposition server...")
 
+    # Fork processes load the broker for fork functions that set
+    # load_broker so, unless this is being run outside of the CLI,
+    # it's available for sampling.
+    from ..broker import global_broker as broker
+    if broker is not None:
+        _configure_metrics_handler(broker)
+
     try:
         address = (HTTP_HOST, HTTP_PORT)
         httpd = HTTPServer(address, _metrics_handler)
@@ -186,3 +436,6 @@ def _run_exposition_server():
         httpd.shutdown()
 
     return 0
+
+
+_run_exposition_server.load_broker = True
@@ -0,0 +1,83 @@
+# This file is a part of Dramatiq.
+#
+# Copyright (C) 2017,2018 CLEARTYPE SRL <bogdan@cleartype.io>
+#
+# Dramatiq is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+#
+# Dramatiq is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+
+from ..logging import get_logger
+from .middleware import Middleware, SkipMessage
+
+#: The default amount of time, in milliseconds, messages are delayed
+#: by when their rate limiter can't estimate when a slot frees up.
+DEFAULT_RATE_LIMIT_DELAY = 1000
+
+
+class RateLimits(Middleware):
+    """Middleware that acquires a slot under an actor's rate limiter
+    before running the actor.  When no slot is available, the message
+    is delayed until the limiter expects one to become available
+    instead of being failed and retried with exponential backoff.
+    Delaying a message this way doesn't count as a retry.
+
+    Examples:
+
+      >>> from dramatiq.middleware import RateLimits
+      >>> from dramatiq.rate_limits import BucketRateLimiter
+      >>> from dramatiq.rate_limits.backends import RedisBackend
+
+      >>> broker.add_middleware(RateLimits())
+      >>> limiter = BucketRateLimiter(RedisBackend(), "api-calls", limit=100, bucket=60_000)
+
+      >>> @dramatiq.actor(rate_limit=limiter)
+      ... def call_api():
+      ...     ...
+
+    Parameters:
+      delay(int): The amount of time, in milliseconds, to delay
+        messages by when their rate limiter can't estimate when a
+        slot will become available, as is the case for concurrent
+        rate limiters.
+    """
+
+    def __init__(self, *, delay=DEFAULT_RATE_LIMIT_DELAY):
+        self.logger = get_logger(__name__, type(self))
+        self.delay = delay
+        self.limiters = {}
+
+    @property
+    def actor_options(self):
+        return {"rate_limit"}
+
+    def before_process_message(self, broker, message):
+        actor = broker.get_actor(message.actor_name)
+        limiter = actor.options.get("rate_limit")
+        if limiter is None:
+            return
+
+        if not limiter._acquire():
+            delay = limiter.time_until_available() or self.delay
+            self.logger.debug("Rate limit exceeded for message %r. Delaying it by %d milliseconds.", message.message_id, delay)
+            broker.enqueue(message, delay=delay)
+            raise SkipMessage()
+
+        self.limiters[threading.get_ident()] = limiter
+
+    def after_process_message(self, broker, message, *, result=None, exception=None):
+        limiter = self.limiters.pop(threading.get_ident(), None)
+        if limiter is not None:
+            limiter._release()
+
+    after_skip_message = after_process_message
@@ -15,10 +15,12 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import heapq
+import itertools
 import threading
 import warnings
 from threading import Thread
-from time import monotonic, sleep
+from time import monotonic
 
 from ..logging import get_logger
 from .middleware import Middleware
@@ -35,6 +37,10 @@ class TimeLimit(Middleware):
     """Middleware that cancels actors that run for too long.
     Currently, this is only available on CPython.
 
+    Deadlines are kept in a heap and the timer thread sleeps until
+    the earliest one is due, so limits are enforced within a few
+    milliseconds and idle workers don't pay for the check.
+
     Note:
       This works by setting an async exception in the worker thread
       that runs the actor.  This means that the exception will only get
@@ -45,31 +51,70 @@ class TimeLimit(Middleware):
       time_limit(int): The maximum number of milliseconds actors may
         run for.
       interval(int): The interval (in milliseconds) with which to
-        check for actors that have exceeded the limit.
+        check for actors that have exceeded the limit.  Deprecated:
+        deadlines are now tracked precisely so this is only used to
+        back off after unexpected errors.
     """
 
     def __init__(self, *, time_limit=600000, interval=1000):
         self.logger = get_logger(__name__, type(self))
         self.time_limit = time_limit
         self.interval = interval / 1000
-        self.deadlines = {}
+        self.condition = threading.Condition()
+        self.counter = itertools.count()
+        self.deadlines = []
+        self.timers = {}
+        self.cancelled = 0
 
     def _handle(self):
+        """Interrupt every thread whose deadline has passed.
+
+        Returns:
+          float: The number of seconds until the next deadline or None
+          if there are no pending deadlines.
+        """
         current_time = monotonic()
-        for thread_id, deadline in self.deadlines.items():
-            if deadline and current_time >= deadline:
-                self.logger.warning("Time limit exceeded. Raising exception in worker thread %r.", thread_id)
-                self.deadlines[thread_id] = None
-                raise_thread_exception(thread_id, TimeLimitExceeded)
+        while self.deadlines:
+            deadline, _, thread_id = self.deadlines[0]
+            if thread_id is None:
+                heapq.heappop(self.deadlines)
+                self.cancelled -= 1
+                continue
 
-    def _timer(self):
-        while True:
-            try:
-                self._handle()
-            except Exception:  # pragma: no cover
-                self.logger.exception("Unhandled error while running the time limit handler.")
+            if deadline > current_time:
+                return deadline - current_time
 
-            sleep(self.interval)
+            heapq.heappop(self.deadlines)
+            del self.timers[thread_id]
+            self.logger.warning("Time limit exceeded. Raising exception in worker thread %r.", thread_id)
+            raise_thread_exception(thread_id, TimeLimitExceeded)
+
+        return None
+
+    def _timer(self):
+        with self.condition:
+            while True:
+                try:
+                    timeout = self._handle()
+                except Exception:  # pragma: no cover
+                    self.logger.exception("Unhandled error while running the time limit handler.")
+                    timeout = self.interval
+
+                self.condition.wait(timeout)
+
+    def _cancel(self, thread_id):
+        timer = self.timers.pop(thread_id, None)
+        if timer is None:
+            return
+
+        # Cancelled timers are dropped lazily, unless they make up
+        # most of the heap, in which case it's cheaper to rebuild it.
+        timer[2] = None
+        self.cancelled += 1
+        if self.cancelled > len(self.deadlines) // 2:
+            self.deadlines = [timer for timer in self.deadlines if timer[2] is not None]
+            heapq.heapify(self.deadlines)
+            self.cancelled = 0
 
     @property
     def actor_options(self):
@@ -87,10 +132,20 @@ class TimeLimit(Middleware):
     def before_process_message(self, broker, message):
         actor = broker.get_actor(message.actor_name)
         limit = message.options.get("time_limit") or actor.options.get("time_limit", self.time_limit)
-        deadline = monotonic() + limit / 1000
-        self.deadlines[threading.get_ident()] = deadline
+        thread_id = threading.get_ident()
+        timer = [monotonic() + limit / 1000, next(self.counter), thread_id]
+        with self.condition:
+            self._cancel(thread_id)
+            self.timers[thread_id] = timer
+            heapq.heappush(self.deadlines, timer)
+
+            # Only wake the timer thread up if it's sleeping past
+            # the new deadline.
+            if self.deadlines[0] is timer:
+                self.condition.notify()
 
     def after_process_message(self, broker, message, *, result=None, exception=None):
-        self.deadlines[threading.get_ident()] = None
+        with self.condition:
+            self._cancel(threading.get_ident())
 
     after_skip_message = after_process_message
@@ -19,10 +19,13 @@ from .backend import RateLimiterBackend
 from .barrier import Barrier
 from .bucket import BucketRateLimiter
 from .concurrent import ConcurrentRateLimiter
+from .leased_concurrent import LeasedConcurrentRateLimiter
 from .rate_limiter import RateLimiter, RateLimitExceeded
+from .sliding_window import SlidingWindowRateLimiter
 from .window import WindowRateLimiter
 
 __all__ = [
     "RateLimiterBackend", "RateLimiter", "RateLimitExceeded", "Barrier",
     "BucketRateLimiter", "ConcurrentRateLimiter", "WindowRateLimiter",
+    "SlidingWindowRateLimiter", "LeasedConcurrentRateLimiter",
 ]
@@ -18,8 +18,17 @@
 
 class RateLimiterBackend:
     """ABC for rate limiter backends.
+
+    Attributes:
+      max_window_entries(int): The largest limit a sliding window can
+        have in this backend, or None if it's unbounded.
+      max_leases(int): The largest limit a set of leases can have in
+        this backend, or None if it's unbounded.
     """
 
+    max_window_entries = None
+    max_leases = None
+
     def add(self, key, value, ttl):  # pragma: no cover
         """Add a key to the backend iff it doesn't exist.
 
@@ -81,6 +90,61 @@ class RateLimiterBackend:
         """
         raise NotImplementedError
 
+    def incr_window(self, key, amount, maximum, window):  # pragma: no cover
+        """Atomically record ``amount`` operations in the sliding
+        window stored at the given key unless that would push the
+        number of operations within the last ``window`` milliseconds
+        above the given maximum.
+
+        Parameters:
+          key(str): The key of the window.
+          amount(int): The number of operations to record.
+          maximum(int): The maximum number of operations per window.
+          window(int): The window size in milliseconds.
+
+        Returns:
+          bool: True if the operations were recorded.
+        """
+        raise NotImplementedError
+
+    def acquire_lease(self, key, holder, maximum, ttl):  # pragma: no cover
+        """Atomically drop any expired leases from the set of leases
+        stored at the given key then add a lease for ``holder`` unless
+        that would push the number of leases above the given maximum.
+
+        Parameters:
+          key(str): The key of the set of leases.
+          holder(str): The unique id of the lease holder.
+          maximum(int): The maximum number of leases.
+          ttl(int): The amount of time in milliseconds until the lease
+            expires unless it is renewed.
+
+        Returns:
+          bool: True if the lease was acquired.
+        """
+        raise NotImplementedError
+
+    def renew_leases(self, key, holders, ttl):  # pragma: no cover
+        """Extend the leases of the given holders.  Leases that have
+        already expired or been released are not renewed.
+
+        Parameters:
+          key(str): The key of the set of leases.
+          holders(list[str]): The ids of the lease holders.
+          ttl(int): The amount of time in milliseconds until the
+            leases expire unless they are renewed again.
+        """
+        raise NotImplementedError
+
+    def release_lease(self, key, holder):  # pragma: no cover
+        """Release a lease.
+
+        Parameters:
+          key(str): The key of the set of leases.
+          holder(str): The unique id of the lease holder.
+        """
+        raise NotImplementedError
+
     def wait(self, key, timeout):  # pragma: no cover
         """Wait until an event is published to the given key or the
         timeout expires.  This is used to implement efficient blocking
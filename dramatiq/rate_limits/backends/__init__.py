@@ -35,5 +35,13 @@ except ImportError:  # pragma: no cover
         "to add support for that backend.", ImportWarning,
     )
 
+try:
+    from .shared_memory import SharedMemoryBackend
+except ImportError:  # pragma: no cover
+    warnings.warn(
+        "SharedMemoryBackend is not available on your current platform.",
+        ImportWarning,
+    )
+
 
-__all__ = ["StubBackend", "MemcachedBackend", "RedisBackend"]
+__all__ = ["StubBackend", "MemcachedBackend", "RedisBackend", "SharedMemoryBackend"]
@@ -15,95 +15,94 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import glob
+import os
+import threading
+import time
+from collections import defaultdict
+from os import path
+from uuid import uuid4
+
 import redis
 
+from ...logging import get_logger
 from ..backend import RateLimiterBackend
 
+#: The pub/sub channel wait notifications are published on.
+NOTIFICATIONS_CHANNEL = "dramatiq:rate-limits:notifications"
+
 
 class RedisBackend(RateLimiterBackend):
     """A rate limiter backend for Redis_.
 
+    Every operation is implemented as a Lua script so acquiring or
+    releasing a slot always costs a single round trip, regardless of
+    contention.
+
+    By default, every party blocked in ``wait`` holds a connection
+    from the pool and timeouts are rounded down to whole seconds.
+    When ``pubsub`` is True, notifications are also published over
+    pub/sub and a single subscriber connection per process wakes up
+    all the local waiters instead, so any number of parties can wait
+    at once and timeouts may be as short as a millisecond.  Every
+    party that waits on and notifies the same keys must use the same
+    mode.
+
     Parameters:
       client(Redis): An optional client.  If this is passed,
         then all other parameters are ignored.
       url(str): An optional connection URL.  If both a URL and
         connection paramters are provided, the URL is used.
+      pubsub(bool): Whether or not to wait for notifications over
+        pub/sub.
       **parameters(dict): Connection parameters are passed directly
         to :class:`redis.Redis`.
 
     .. _redis: https://redis.io
     """
 
-    def __init__(self, *, client=None, url=None, **parameters):
+    def __init__(self, *, client=None, url=None, pubsub=False, **parameters):
         if url is not None:
             parameters["connection_pool"] = redis.ConnectionPool.from_url(url)
 
         # TODO: Replace usages of StrictRedis (redis-py 2.x) with Redis in Dramatiq 2.0.
         self.client = client or redis.StrictRedis(**parameters)
+        self.scripts = {name: self.client.register_script(script) for name, script in _scripts.items()}
+        self.notifications = _Notifications(self.client) if pubsub else None
 
     def add(self, key, value, ttl):
         return bool(self.client.set(key, value, px=ttl, nx=True))
 
     def incr(self, key, amount, maximum, ttl):
-        with self.client.pipeline() as pipe:
-            while True:
-                try:
-                    pipe.watch(key)
-                    value = int(pipe.get(key) or b"0")
-                    value += amount
-                    if value > maximum:
-                        return False
-
-                    pipe.multi()
-                    pipe.set(key, value, px=ttl)
-                    pipe.execute()
-                    return True
-                except redis.WatchError:
-                    continue
+        return bool(self.scripts["incr"](keys=[key], args=[amount, maximum, ttl]))
 
     def decr(self, key, amount, minimum, ttl):
-        with self.client.pipeline() as pipe:
-            while True:
-                try:
-                    pipe.watch(key)
-                    value = int(pipe.get(key) or b"0")
-                    value -= amount
-                    if value < minimum:
-                        return False
-
-                    pipe.multi()
-                    pipe.set(key, value, px=ttl)
-                    pipe.execute()
-                    return True
-                except redis.WatchError:
-                    continue
+        return bool(self.scripts["decr"](keys=[key], args=[amount, minimum, ttl]))
 
     def incr_and_sum(self, key, keys, amount, maximum, ttl):
-        with self.client.pipeline() as pipe:
-            while True:
-                try:
-                    # TODO: Drop non-callable keys in Dramatiq v2.
-                    key_list = keys() if callable(keys) else keys
-                    pipe.watch(key, *key_list)
-                    value = int(pipe.get(key) or b"0")
-                    value += amount
-                    if value > maximum:
-                        return False
-
-                    # Fetch keys again to account for net/server latency.
-                    values = pipe.mget(keys() if callable(keys) else keys)
-                    total = amount + sum(int(n) for n in values if n)
-                    if total > maximum:
-                        return False
-
-                    pipe.multi()
-                    pipe.set(key, value, px=ttl)
-                    pipe.execute()
-                    return True
-                except redis.WatchError:
-                    continue
+        # TODO: Drop non-callable keys in Dramatiq v2.
+        key_list = keys() if callable(keys) else keys
+        return bool(self.scripts["incr_and_sum"](keys=[key, *key_list], args=[amount, maximum, ttl]))
+
+    def incr_window(self, key, amount, maximum, window):
+        timestamp = int(time.time() * 1000)
+        return bool(self.scripts["incr_window"](keys=[key], args=[timestamp, window, maximum, amount, uuid4().hex]))
+
+    def acquire_lease(self, key, holder, maximum, ttl):
+        timestamp = int(time.time() * 1000)
+        return bool(self.scripts["acquire_lease"](keys=[key], args=[timestamp, ttl, maximum, holder]))
+
+    def renew_leases(self, key, holders, ttl):
+        timestamp = int(time.time() * 1000)
+        self.scripts["renew_leases"](keys=[key], args=[timestamp, ttl, *holders])
+
+    def release_lease(self, key, holder):
+        self.client.zrem(key, holder)
 
     def wait(self, key, timeout):
+        if self.notifications is not None:
+            return self.notifications.wait(key, timeout)
+
         assert timeout is None or timeout >= 1000, "wait timeouts must be >= 1000"
         event = self.client.brpoplpush(key, key, (timeout or 0) // 1000)
         return event == b"x"
@@ -112,4 +111,106 @@ class RedisBackend(RateLimiterBackend):
         with self.client.pipeline() as pipe:
             pipe.rpush(key, b"x")
             pipe.pexpire(key, ttl)
+            if self.notifications is not None:
+                pipe.publish(NOTIFICATIONS_CHANNEL, key)
             pipe.execute()
+
+
+class _Notifications:
+    """Fans wait notifications out to every waiter in the current
+    process from a single pub/sub connection.
+    """
+
+    def __init__(self, client):
+        self.logger = get_logger(__name__, type(self))
+        self.client = client
+        self.waiters = defaultdict(set)
+        self.lock = threading.Lock()
+        self.subscribe_lock = threading.Lock()
+        self.pid = None
+
+    def wait(self, key, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout / 1000
+        event = threading.Event()
+        with self.lock:
+            self.waiters[key].add(event)
+
+        try:
+            self._subscribe()
+            while True:
+                # Notifications published before we subscribed, or
+                # while the subscriber was reconnecting, are only
+                # visible through the event list.  Waiters are woken
+                # up after every reconnect so they check it again.
+                if self.client.exists(key):
+                    return True
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0 or not event.wait(remaining):
+                    return False
+
+                event.clear()
+        finally:
+            with self.lock:
+                self.waiters[key].discard(event)
+                if not self.waiters[key]:
+                    del self.waiters[key]
+
+    def _subscribe(self):
+        # The subscription is set up under its own lock so that waiters
+        # and the listener aren't blocked while it's being confirmed.
+        with self.subscribe_lock:
+            # Threads don't survive forks so every process needs its
+            # own subscriber.
+            if self.pid == os.getpid():
+                return
+
+            pubsub = self.client.pubsub()
+            pubsub.subscribe(NOTIFICATIONS_CHANNEL)
+
+            # Wait for the subscription to be confirmed so that any
+            # notification published from here on is received.
+            while pubsub.get_message(timeout=1) is None:
+                pass
+
+            self.pid = os.getpid()
+            thread = threading.Thread(target=self._listen, args=(pubsub,), name="RedisNotifications", daemon=True)
+            thread.start()
+
+    def _listen(self, pubsub):
+        while True:
+            try:
+                for message in pubsub.listen():
+                    # The client resubscribes whenever it reconnects
+                    # and notifications may have been missed in the
+                    # meantime, so every waiter is woken up.
+                    if message["type"] == "subscribe":
+                        self._notify(None)
+
+                    elif message["type"] == "message":
+                        key = message["data"]
+                        if isinstance(key, bytes):
+                            key = key.decode("utf-8")
+
+                        self._notify(key)
+            except Exception:
+                self.logger.exception("Unhandled error while listening for notifications.")
+                time.sleep(1)
+
+    def _notify(self, key):
+        with self.lock:
+            if key is None:
+                events = [event for events in self.waiters.values() for event in events]
+            else:
+                events = self.waiters.get(key, ())
+
+            for event in events:
+                event.set()
+
+
+_scripts = {}
+_scripts_path = path.join(path.abspath(path.dirname(__file__)), "redis")
+for filename in glob.glob(path.join(_scripts_path, "*.lua")):
+    script_name, _ = path.splitext(path.basename(filename))
+    with open(filename, "rb") as f:
+        _scripts[script_name] = f.read()
@@ -0,0 +1,39 @@
+-- This file is a part of Dramatiq.
+--
+-- Copyright (C) 2017,2018 CLEARTYPE SRL <bogdan@cleartype.io>
+--
+-- Dramatiq is free software; you can redistribute it and/or modify it
+-- under the terms of the GNU Lesser General Public License as published by
+-- the Free Software Foundation, either version 3 of the License, or (at
+-- your option) any later version.
+--
+-- Dramatiq is distributed in the hope that it will be useful, but WITHOUT
+-- ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+-- FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+-- License for more details.
+--
+-- You should have received a copy of the GNU Lesser General Public License
+-- along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+-- luacheck: globals ARGV KEYS redis
+-- acquire_lease(keys=[key], args=[timestamp, ttl, maximum, holder])
+--
+-- $key is a sorted set of lease holders scored by when their leases
+-- expire.  Expired leases are reclaimed before counting the rest so
+-- slots held by crashed processes free up as soon as their leases
+-- run out.  Returns 1 if the lease was acquired and 0 otherwise.
+
+local key = KEYS[1]
+local timestamp = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local maximum = tonumber(ARGV[3])
+local holder = ARGV[4]
+
+redis.call("zremrangebyscore", key, "-inf", timestamp)
+if redis.call("zcard", key) >= maximum then
+    return 0
+end
+
+redis.call("zadd", key, timestamp + ttl, holder)
+redis.call("pexpire", key, ttl)
+return 1
@@ -0,0 +1,36 @@
+-- This file is a part of Dramatiq.
+--
+-- Copyright (C) 2017,2018 CLEARTYPE SRL <bogdan@cleartype.io>
+--
+-- Dramatiq is free software; you can redistribute it and/or modify it
+-- under the terms of the GNU Lesser General Public License as published by
+-- the Free Software Foundation, either version 3 of the License, or (at
+-- your option) any later version.
+--
+-- Dramatiq is distributed in the hope that it will be useful, but WITHOUT
+-- ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+-- FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+-- License for more details.
+--
+-- You should have received a copy of the GNU Lesser General Public License
+-- along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+-- luacheck: globals ARGV KEYS redis
+-- incr(keys=[key], args=[amount, maximum, ttl])
+--
+-- Atomically increments $key by $amount unless that would push its
+-- value above $maximum.  Returns 1 on success and 0 otherwise.
+
+local key = KEYS[1]
+local amount = tonumber(ARGV[1])
+local maximum = tonumber(ARGV[2])
+local ttl = ARGV[3]
+
+local value = tonumber(redis.call("get", key) or "0") + amount
+if value > maximum then
+    return 0
+end
+
+redis.call("set", key, value, "px", ttl)
+return 1
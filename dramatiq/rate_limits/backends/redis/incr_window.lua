@@ -0,0 +1,45 @@
+-- This file is a part of Dramatiq.
+--
+-- Copyright (C) 2017,2018 CLEARTYPE SRL <bogdan@cleartype.io>
+--
+-- Dramatiq is free software; you can redistribute it and/or modify it
+-- under the terms of the GNU Lesser General Public License as published by
+-- the Free Software Foundation, either version 3 of the License, or (at
+-- your option) any later version.
+--
+-- Dramatiq is distributed in the hope that it will be useful, but WITHOUT
+-- ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+-- FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+-- License for more details.
+--
+-- You should have received a copy of the GNU Lesser General Public License
+-- along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+-- luacheck: globals ARGV KEYS redis
+-- incr_window(keys=[key], args=[timestamp, window, maximum, amount, member_id])
+--
+-- $key is a sorted set of operations scored by when they happened.
+-- Operations that have fallen out of the window are dropped before
+-- counting the rest so every call costs O(log n) in the number of
+-- operations in the window, regardless of the window's length.
+-- Returns 1 if $amount operations were recorded and 0 otherwise.
+
+local key = KEYS[1]
+local timestamp = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local maximum = tonumber(ARGV[3])
+local amount = tonumber(ARGV[4])
+local member_id = ARGV[5]
+
+redis.call("zremrangebyscore", key, "-inf", timestamp - window)
+if redis.call("zcard", key) + amount > maximum then
+    return 0
+end
+
+for i=1,amount do
+    redis.call("zadd", key, timestamp, member_id .. ":" .. i)
+end
+
+redis.call("pexpire", key, window)
+return 1
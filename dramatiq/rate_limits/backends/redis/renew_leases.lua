@@ -0,0 +1,35 @@
+-- This file is a part of Dramatiq.
+--
+-- Copyright (C) 2017,2018 CLEARTYPE SRL <bogdan@cleartype.io>
+--
+-- Dramatiq is free software; you can redistribute it and/or modify it
+-- under the terms of the GNU Lesser General Public License as published by
+-- the Free Software Foundation, either version 3 of the License, or (at
+-- your option) any later version.
+--
+-- Dramatiq is distributed in the hope that it will be useful, but WITHOUT
+-- ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+-- FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+-- License for more details.
+--
+-- You should have received a copy of the GNU Lesser General Public License
+-- along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+-- luacheck: globals ARGV KEYS redis
+-- renew_leases(keys=[key], args=[timestamp, ttl, holder...])
+--
+-- Extends the leases of the given holders.  Holders whose leases
+-- have already been reclaimed or released are left out.
+
+local key = KEYS[1]
+local timestamp = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+
+redis.call("zremrangebyscore", key, "-inf", timestamp)
+for i=3,#ARGV do
+    redis.call("zadd", key, "XX", timestamp + ttl, ARGV[i])
+end
+
+if redis.call("zcard", key) > 0 then
+    redis.call("pexpire", key, ttl)
+end
@@ -0,0 +1,380 @@
+# This file is a part of Dramatiq.
+#
+# Copyright (C) 2017,2018 CLEARTYPE SRL <bogdan@cleartype.io>
+#
+# Dramatiq is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+#
+# Dramatiq is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from ..backend import RateLimiterBackend
+
+#: The default number of independently-locked stripes.
+DEFAULT_STRIPES = 64
+
+#: The default number of keys each stripe can hold.
+DEFAULT_SLOTS = 256
+
+#: The default maximum size, in bytes, of a single key's value.
+DEFAULT_VALUE_SIZE = 1024
+
+#: The default interval, in milliseconds, at which ``wait`` polls.
+DEFAULT_POLL_INTERVAL = 10
+
+_MAGIC = b"dramatiq-rlimits"
+_HEADER = struct.Struct("<16sIII")
+_HEADER_SIZE = 64
+
+# Every slot starts with the key's digest, the time its value expires
+# at in milliseconds since the epoch and the size of its value.  An
+# all-zero digest marks a slot that was never used.  Slots whose
+# values have expired are reused but keep their digest so lookups
+# can tell them apart from the end of a probe sequence.
+_RECORD = struct.Struct("<16sdI")
+_EMPTY = bytes(16)
+
+_COUNTER = struct.Struct("<q")
+_TIMESTAMP = struct.Struct("<d")
+_LEASE = struct.Struct("<16sd")
+
+# fcntl locks belong to processes rather than to file descriptors, so
+# backends that use the same file within a process must share their
+# locks, otherwise they don't exclude one another and one backend
+# unlocking a stripe unlocks it for the others too.  Files are keyed
+# by pid so forked processes don't inherit their parent's locks.
+_shared_files = {}
+_shared_files_lock = threading.Lock()
+
+
+class SharedMemoryBackend(RateLimiterBackend):
+    """A rate limiter backend that keeps its data in a memory-mapped
+    file shared by every process on the current host, such as all the
+    worker processes started by the ``dramatiq`` command.  Operations
+    don't leave the host so they run at memory speed.
+
+    Keys are spread out over ``stripes`` fixed-size hash tables, each
+    protected by its own lock, so operations on unrelated keys rarely
+    contend with one another.  Locks are held via ``fcntl`` byte-range
+    locks so they are released by the OS if a process dies.
+
+    Examples:
+
+      >>> from dramatiq.rate_limits.backends import SharedMemoryBackend
+      >>> backend = SharedMemoryBackend("/dev/shm/my-app-rate-limits")
+
+    Warning:
+      Every process must use the same path and the same ``stripes``,
+      ``slots`` and ``value_size``.  Processes that use a different
+      layout for an existing file fail to create the backend.
+
+    Warning:
+      Sliding windows and leases store one entry per operation or
+      holder in their key's value.  Each timestamp takes up 8 bytes
+      and each lease 24, so ``value_size`` bounds their limits and
+      rate limiters with larger limits fail to be created.
+
+    Backends created with the same path in the same process share the
+    file and its locks.  Call :meth:`close` once a backend is no
+    longer needed.
+
+    Parameters:
+      path(str): The file to keep the data in.  Defaults to a file
+        under ``/dev/shm`` or, when that's not available, the system's
+        temporary directory.
+      stripes(int): The number of independently-locked hash tables.
+      slots(int): The number of keys each stripe can hold.
+      value_size(int): The maximum size, in bytes, of any key's value.
+      poll_interval(int): The interval, in milliseconds, at which
+        ``wait`` checks for notifications from other processes.
+    """
+
+    def __init__(
+            self, path=None, *,
+            stripes=DEFAULT_STRIPES,
+            slots=DEFAULT_SLOTS,
+            value_size=DEFAULT_VALUE_SIZE,
+            poll_interval=DEFAULT_POLL_INTERVAL,
+    ):
+        self.path = path or os.path.join(_default_directory(), "dramatiq-rate-limits")
+        self.stripes = stripes
+        self.slots = slots
+        self.value_size = value_size
+        self.max_window_entries = value_size // _TIMESTAMP.size
+        self.max_leases = value_size // _LEASE.size
+        self.poll_interval = poll_interval / 1000
+        self.record_size = _RECORD.size + value_size
+        self.stripe_size = slots * self.record_size
+
+        key = (os.getpid(), os.path.realpath(self.path))
+        with _shared_files_lock:
+            shared_file = _shared_files.get(key)
+            if shared_file is None:
+                shared_file = _shared_files[key] = _SharedFile(self.path, stripes, slots, value_size)
+
+            elif shared_file.layout != (stripes, slots, value_size):
+                raise ValueError("%r was created with a different layout." % self.path)
+
+            shared_file.references += 1
+
+        self.shared_file = shared_file
+        self.fd = shared_file.fd
+        self.memory = shared_file.memory
+        self.locks = shared_file.locks
+        self.notifications = shared_file.notifications
+
+    def close(self):
+        """Release this backend's handle on its file.  The file is
+        unmapped and closed once every backend in this process that
+        uses it has been closed.
+        """
+        with _shared_files_lock:
+            shared_file, self.shared_file = self.shared_file, None
+            if shared_file is None:
+                return
+
+            shared_file.references -= 1
+            if shared_file.references == 0:
+                _shared_files.pop((os.getpid(), os.path.realpath(self.path)), None)
+                shared_file.close()
+
+    def add(self, key, value, ttl):
+        with self._locked(key) as (entry,):
+            if self._load(entry) is not None:
+                return False
+
+            return self._store(entry, _COUNTER.pack(value), ttl)
+
+    def incr(self, key, amount, maximum, ttl):
+        with self._locked(key) as (entry,):
+            value = self._load_counter(entry) + amount
+            if value > maximum:
+                return False
+
+            return self._store(entry, _COUNTER.pack(value), ttl)
+
+    def decr(self, key, amount, minimum, ttl):
+        with self._locked(key) as (entry,):
+            value = self._load_counter(entry) - amount
+            if value < minimum:
+                return False
+
+            return self._store(entry, _COUNTER.pack(value), ttl)
+
+    def incr_and_sum(self, key, keys, amount, maximum, ttl):
+        # TODO: Drop non-callable keys in Dramatiq v2.
+        key_list = keys() if callable(keys) else keys
+        with self._locked(key, *key_list) as (entry, *entries):
+            value = self._load_counter(entry) + amount
+            if value > maximum:
+                return False
+
+            total = amount + sum(self._load_counter(e) for e in entries)
+            if total > maximum:
+                return False
+
+            return self._store(entry, _COUNTER.pack(value), ttl)
+
+    def incr_window(self, key, amount, maximum, window):
+        with self._locked(key) as (entry,):
+            timestamp = time.time() * 1000
+            value = self._load(entry) or b""
+            timestamps = [t for t, in _TIMESTAMP.iter_unpack(value) if t > timestamp - window]
+            if len(timestamps) + amount > maximum:
+                return False
+
+            timestamps.extend([timestamp] * amount)
+            return self._store(entry, b"".join(_TIMESTAMP.pack(t) for t in timestamps), window)
+
+    def acquire_lease(self, key, holder, maximum, ttl):
+        with self._locked(key) as (entry,):
+            timestamp = time.time() * 1000
+            leases = self._load_leases(entry, timestamp)
+            if len(leases) >= maximum:
+                return False
+
+            leases[_digest(holder)] = timestamp + ttl
+            return self._store_leases(entry, leases, ttl)
+
+    def renew_leases(self, key, holders, ttl):
+        with self._locked(key) as (entry,):
+            timestamp = time.time() * 1000
+            leases = self._load_leases(entry, timestamp)
+            for holder in holders:
+                digest = _digest(holder)
+                if digest in leases:
+                    leases[digest] = timestamp + ttl
+
+            if leases:
+                self._store_leases(entry, leases, ttl)
+
+    def release_lease(self, key, holder):
+        with self._locked(key) as (entry,):
+            timestamp = time.time() * 1000
+            leases = self._load_leases(entry, timestamp)
+            if leases.pop(_digest(holder), None) is not None:
+                self._store_leases(entry, leases, max(leases.values(), default=timestamp) - timestamp)
+
+    def wait(self, key, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout / 1000
+        while True:
+            with self._locked(key) as (entry,):
+                if self._load(entry) is not None:
+                    return True
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+            # Notifications from this process wake waiters up right
+            # away.  Ones from other processes are picked up by polling.
+            with self.notifications:
+                self.notifications.wait(self.poll_interval)
+
+    def wait_notify(self, key, ttl):
+        with self._locked(key) as (entry,):
+            self._store(entry, _COUNTER.pack(1), ttl)
+
+        with self.notifications:
+            self.notifications.notify_all()
+
+    @contextmanager
+    def _locked(self, *keys):
+        entries = []
+        for key in keys:
+            digest = _digest(key)
+            entries.append((int.from_bytes(digest[:8], "little") % self.stripes, digest))
+
+        # Stripes are always locked in the same order so operations
+        # that span multiple stripes can't deadlock.
+        stripes = sorted({stripe for stripe, _ in entries})
+        for stripe in stripes:
+            self.locks[stripe].acquire()
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, _HEADER_SIZE + stripe * self.stripe_size)
+
+        try:
+            yield entries
+        finally:
+            for stripe in reversed(stripes):
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, _HEADER_SIZE + stripe * self.stripe_size)
+                self.locks[stripe].release()
+
+    def _find(self, entry):
+        """Find the slot holding the given entry's live value and the
+        first slot the entry could be stored in.
+        """
+        stripe, digest = entry
+        base = _HEADER_SIZE + stripe * self.stripe_size
+        start = int.from_bytes(digest[8:], "little")
+        timestamp = time.time() * 1000
+        free = None
+        for i in range(self.slots):
+            offset = base + (start + i) % self.slots * self.record_size
+            slot_digest, expiration, _ = _RECORD.unpack_from(self.memory, offset)
+            if slot_digest == _EMPTY:
+                return None, offset if free is None else free
+
+            if expiration <= timestamp:
+                if free is None:
+                    free = offset
+
+            elif slot_digest == digest:
+                return offset, offset
+
+        return None, free
+
+    def _load(self, entry):
+        offset, _ = self._find(entry)
+        if offset is None:
+            return None
+
+        _, _, size = _RECORD.unpack_from(self.memory, offset)
+        return self.memory[offset + _RECORD.size:offset + _RECORD.size + size]
+
+    def _load_counter(self, entry):
+        value = self._load(entry)
+        if value is None:
+            return 0
+
+        return _COUNTER.unpack(value)[0]
+
+    def _load_leases(self, entry, timestamp):
+        value = self._load(entry) or b""
+        return {holder: expiration for holder, expiration in _LEASE.iter_unpack(value) if expiration > timestamp}
+
+    def _store(self, entry, value, ttl):
+        if len(value) > self.value_size:
+            raise ValueError("Value for key digest %s exceeds value_size." % entry[1].hex())
+
+        _, offset = self._find(entry)
+        if offset is None:
+            raise RuntimeError("Stripe %d is full.  Increase the number of slots or stripes." % entry[0])
+
+        start = offset + _RECORD.size
+        self.memory[start:start + len(value)] = value
+        _RECORD.pack_into(self.memory, offset, entry[1], time.time() * 1000 + ttl, len(value))
+        return True
+
+    def _store_leases(self, entry, leases, ttl):
+        return self._store(entry, b"".join(_LEASE.pack(h, e) for h, e in leases.items()), ttl)
+
+
+class _SharedFile:
+    """A memory-mapped backend file and the locks that protect it
+    within the current process.
+    """
+
+    def __init__(self, path, stripes, slots, value_size):
+        self.layout = (stripes, slots, value_size)
+        self.locks = [threading.Lock() for _ in range(stripes)]
+        self.notifications = threading.Condition()
+        self.references = 0
+
+        size = _HEADER_SIZE + stripes * slots * (_RECORD.size + value_size)
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, 0)
+        try:
+            header = _HEADER.pack(_MAGIC, stripes, slots, value_size)
+            if os.fstat(self.fd).st_size == 0:
+                os.ftruncate(self.fd, size)
+                os.pwrite(self.fd, header, 0)
+
+            matches = os.pread(self.fd, _HEADER.size, 0) == header
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, 0)
+
+        if not matches:
+            os.close(self.fd)
+            raise ValueError("%r was created with a different layout." % path)
+
+        self.memory = mmap.mmap(self.fd, size)
+
+    def close(self):
+        self.memory.close()
+        os.close(self.fd)
+
+
+def _digest(key):
+    return hashlib.sha256(key.encode("utf-8")).digest()[:16]
+
+
+def _default_directory():
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm"
+    return tempfile.gettempdir()
@@ -71,6 +71,43 @@ class StubBackend(RateLimiterBackend):
 
             return self._put(key, value, ttl)
 
+    def incr_window(self, key, amount, maximum, window):
+        with self.mutex:
+            timestamp = time.monotonic() * 1000
+            timestamps = [t for t in self._get(key, default=[]) if t > timestamp - window]
+            if len(timestamps) + amount > maximum:
+                return False
+
+            timestamps.extend([timestamp] * amount)
+            return self._put(key, timestamps, window)
+
+    def acquire_lease(self, key, holder, maximum, ttl):
+        with self.mutex:
+            timestamp = time.monotonic() * 1000
+            leases = {h: t for h, t in self._get(key, default={}).items() if t > timestamp}
+            if len(leases) >= maximum:
+                self._put(key, leases, ttl)
+                return False
+
+            leases[holder] = timestamp + ttl
+            return self._put(key, leases, ttl)
+
+    def renew_leases(self, key, holders, ttl):
+        with self.mutex:
+            timestamp = time.monotonic() * 1000
+            leases = {h: t for h, t in self._get(key, default={}).items() if t > timestamp}
+            for holder in holders:
+                if holder in leases:
+                    leases[holder] = timestamp + ttl
+
+            if leases:
+                self._put(key, leases, ttl)
+
+    def release_lease(self, key, holder):
+        with self.mutex:
+            leases = self._get(key, default={})
+            leases.pop(holder, None)
+
     def wait(self, key, timeout):
         cond = self.conditions[key]
         with cond:
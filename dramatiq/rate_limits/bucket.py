@@ -16,6 +16,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import time
+from threading import Lock
 
 from .rate_limiter import RateLimiter
 
@@ -45,31 +46,103 @@ class BucketRateLimiter(RateLimiter):
       For a rate limiter that doesn't have this problem (but is more
       expensive to maintain), see |WindowRateLimiter|.
 
+    Leasing:
+
+      By default, every operation costs at least one call to the
+      backend.  When ``lease`` is set, the limiter instead reserves
+      blocks of up to ``lease`` tokens from the current bucket in a
+      single call and hands them out from memory.  Once a bucket runs
+      out of tokens, further operations fail without touching the
+      backend until the next bucket starts.
+
+      Leased tokens that haven't been used by the end of their bucket
+      are given back to it as soon as the limiter sees that the bucket
+      has changed.  By then the bucket has ended for every process
+      whose clock agrees with this one's, so only processes whose
+      clocks lag behind can still use them and, with N processes, up
+      to ``N * (lease - 1)`` tokens per bucket may go unused.  Pick a
+      lease that's small relative to ``limit / N``.
+
+      >>> BucketRateLimiter(backend, "some-key", limit=10_000, bucket=1_000, lease=100)
+
     Parameters:
       backend(RateLimiterBackend): The backend to use.
       key(str): The key to rate limit on.
       limit(int): The maximum number of operations per bucket per key.
       bucket(int): The bucket interval in milliseconds.
+      lease(int): The number of tokens to reserve from the backend at
+        a time.  Defaults to None, meaning tokens aren't leased.
 
     .. |WindowRateLimiter| replace:: :class:`WindowRateLimiter<dramatiq.rate_limits.WindowRateLimiter>`
     """
 
-    def __init__(self, backend, key, *, limit=1, bucket=1000):
+    def __init__(self, backend, key, *, limit=1, bucket=1000, lease=None):
         assert limit >= 1, "limit must be positive"
+        assert lease is None or 1 <= lease <= limit, "lease must be between 1 and limit"
 
         super().__init__(backend, key)
         self.limit = limit
         self.bucket = bucket
+        self.lease = lease
+        self.lease_lock = Lock()
+        self.lease_bucket = None
+        self.leased_tokens = 0
+        self.block_size = 0
 
     def _acquire(self):
         timestamp = int(time.time() * 1000)
         current_timestamp = timestamp - (timestamp % self.bucket)
         current_key = "%s@%d" % (self.key, current_timestamp)
-        added = self.backend.add(current_key, 1, ttl=self.bucket)
-        if added:
+        if self.lease is None:
+            added = self.backend.add(current_key, 1, ttl=self.bucket)
+            if added:
+                return True
+
+            return self.backend.incr(current_key, 1, maximum=self.limit, ttl=self.bucket)
+
+        with self.lease_lock:
+            if self.lease_bucket != current_timestamp:
+                if self.leased_tokens:
+                    self._give_back()
+
+                self.lease_bucket = current_timestamp
+                self.leased_tokens = 0
+                self.block_size = self.lease
+                if self.backend.add(current_key, self.lease, ttl=self.bucket):
+                    self.leased_tokens = self.lease
+
+            if not self.leased_tokens:
+                self.leased_tokens = self._reserve(current_key)
+
+            if not self.leased_tokens:
+                return False
+
+            self.leased_tokens -= 1
             return True
 
-        return self.backend.incr(current_key, 1, maximum=self.limit, ttl=self.bucket)
+    def _reserve(self, current_key):
+        """Reserve a block of tokens from the current bucket.  Once a
+        whole block no longer fits in the bucket, fall back to single
+        tokens so the tail end of the bucket can still be used.
+
+        Returns:
+          int: The number of tokens that were reserved.
+        """
+        while self.block_size:
+            if self.backend.incr(current_key, self.block_size, maximum=self.limit, ttl=self.bucket):
+                return self.block_size
+
+            self.block_size = 1 if self.block_size > 1 else 0
+        return 0
+
+    def _give_back(self):
+        """Return the unused tokens of the previous bucket to it.
+        """
+        previous_key = "%s@%d" % (self.key, self.lease_bucket)
+        self.backend.decr(previous_key, self.leased_tokens, minimum=0, ttl=self.bucket)
 
     def _release(self):
         pass
+
+    def time_until_available(self):
+        return self.bucket - int(time.time() * 1000) % self.bucket
@@ -0,0 +1,148 @@
+# This file is a part of Dramatiq.
+#
+# Copyright (C) 2017,2018 CLEARTYPE SRL <bogdan@cleartype.io>
+#
+# Dramatiq is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+#
+# Dramatiq is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import threading
+from uuid import uuid4
+from weakref import WeakSet
+
+from ..logging import get_logger
+from .rate_limiter import RateLimiter
+
+
+class LeasedConcurrentRateLimiter(RateLimiter):
+    """A rate limiter that ensures that only `limit` concurrent
+    operations may happen at the same time.  Unlike
+    |ConcurrentRateLimiter|, every slot is held under a short lease
+    that a background thread keeps renewing for as long as the
+    operation runs.  When a process dies while holding a slot, its
+    lease runs out and the slot is reclaimed by the next acquirer
+    within ``lease`` milliseconds rather than when the whole key
+    expires.
+
+    Examples:
+
+      A distributed mutex that recovers from crashed holders within
+      10 seconds:
+
+      >>> LeasedConcurrentRateLimiter(backend, "some-mutex", limit=1, lease=10_000)
+
+    Warning:
+      Only the stub and Redis backends support this rate limiter.
+
+    Parameters:
+      backend(RateLimiterBackend): The backend to use.
+      key(str): The key to rate limit on.
+      limit(int): The maximum number of concurrent operations per key.
+      lease(int): The time in milliseconds that slots are leased for
+        between renewals.
+      renew_interval(int): The interval in milliseconds at which
+        leases are renewed.  Defaults to a third of ``lease``, but at
+        least 1.
+
+    .. |ConcurrentRateLimiter| replace:: :class:`ConcurrentRateLimiter<dramatiq.rate_limits.ConcurrentRateLimiter>`
+    """
+
+    def __init__(self, backend, key, *, limit=1, lease=10000, renew_interval=None):
+        assert limit >= 1, "limit must be positive"
+        assert lease >= 1, "lease must be positive"
+        if backend.max_leases is not None and limit > backend.max_leases:
+            raise ValueError("limit must be at most %d for this backend." % backend.max_leases)
+
+        super().__init__(backend, key)
+        self.limit = limit
+        self.lease = lease
+        self.renew_interval = renew_interval or max(1, lease // 3)
+        assert self.renew_interval >= 1, "renew_interval must be positive"
+        self.holders = set()
+        self.holders_lock = threading.Lock()
+        self.local = threading.local()
+
+    def _acquire(self):
+        holder = uuid4().hex
+        if not self.backend.acquire_lease(self.key, holder, maximum=self.limit, ttl=self.lease):
+            return False
+
+        with self.holders_lock:
+            self.holders.add(holder)
+
+        self.local.__dict__.setdefault("holders", []).append(holder)
+        _renewer.register(self)
+        return True
+
+    def _release(self):
+        holder = self.local.holders.pop()
+        with self.holders_lock:
+            self.holders.discard(holder)
+
+        self.backend.release_lease(self.key, holder)
+
+    def renew(self):
+        """Renew the leases of all the slots held by this process.
+        """
+        with self.holders_lock:
+            holders = list(self.holders)
+
+        if holders:
+            self.backend.renew_leases(self.key, holders, ttl=self.lease)
+
+
+class _LeaseRenewer:
+    """Renews the leases of every leased rate limiter in the current
+    process from a single background thread.
+    """
+
+    def __init__(self):
+        self.logger = get_logger(__name__, type(self))
+        self.limiters = WeakSet()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pid = None
+
+    def register(self, limiter):
+        with self.lock:
+            # Newly-registered limiters may have shorter leases than
+            # the renewer is currently sleeping for.
+            if limiter not in self.limiters:
+                self.limiters.add(limiter)
+                self.wakeup.set()
+
+            # Threads don't survive forks so the renewer has to be
+            # started once per process.
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                thread = threading.Thread(target=self._run, name="LeaseRenewer", daemon=True)
+                thread.start()
+
+    def _run(self):
+        while True:
+            with self.lock:
+                limiters = list(self.limiters)
+
+            for limiter in limiters:
+                try:
+                    limiter.renew()
+                except Exception:
+                    self.logger.exception("Failed to renew leases for key %r.", limiter.key)
+
+            interval = min((limiter.renew_interval for limiter in limiters), default=1000)
+            del limiters
+            self.wakeup.wait(interval / 1000)
+            self.wakeup.clear()
+
+
+_renewer = _LeaseRenewer()
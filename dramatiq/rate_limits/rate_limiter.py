@@ -52,6 +52,16 @@ class RateLimiter:
     def _release(self):  # pragma: no cover
         raise NotImplementedError
 
+    def time_until_available(self):
+        """Estimate how long it'll be until a slot may become
+        available under this rate limiter.
+
+        Returns:
+          int: The number of milliseconds until a slot may become
+          available or None if that can't be estimated.
+        """
+        return None
+
     @contextmanager
     def acquire(self, *, raise_on_failure=True):
         """Attempt to acquire a slot under this rate limiter.
@@ -0,0 +1,71 @@
+# This file is a part of Dramatiq.
+#
+# Copyright (C) 2017,2018 CLEARTYPE SRL <bogdan@cleartype.io>
+#
+# Dramatiq is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+#
+# Dramatiq is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from .rate_limiter import RateLimiter
+
+
+class SlidingWindowRateLimiter(RateLimiter):
+    """A rate limiter that ensures that only `limit` operations may
+    happen over some sliding window.  Unlike |WindowRateLimiter|,
+    each window is stored as a single log of operations so the cost
+    of acquiring a slot doesn't depend on the window's length and
+    windows may be as short as a millisecond.
+
+    Examples:
+
+      Up to 10 operations every 250 milliseconds:
+
+      >>> SlidingWindowRateLimiter(backend, "some-key", limit=10, window=250)
+
+      Up to 1000 operations every hour:
+
+      >>> SlidingWindowRateLimiter(backend, "some-key", limit=1000, window=3_600_000)
+
+    Warning:
+      The log keeps one entry per operation in the window so memory
+      use grows with ``limit`` rather than with ``window``.  Only the
+      stub and Redis backends support this rate limiter.
+
+    Parameters:
+      backend(RateLimiterBackend): The backend to use.
+      key(str): The key to rate limit on.
+      limit(int): The maximum number of operations per window per key.
+      window(int): The window size in milliseconds.
+
+    .. |WindowRateLimiter| replace:: :class:`WindowRateLimiter<dramatiq.rate_limits.WindowRateLimiter>`
+    """
+
+    def __init__(self, backend, key, *, limit=1, window=1000):
+        assert limit >= 1, "limit must be positive"
+        assert window >= 1, "window must be positive"
+        if backend.max_window_entries is not None and limit > backend.max_window_entries:
+            raise ValueError("limit must be at most %d for this backend." % backend.max_window_entries)
+
+        super().__init__(backend, key)
+        self.limit = limit
+        self.window = window
+
+    def _acquire(self):
+        return self.backend.incr_window(self.key, 1, maximum=self.limit, window=self.window)
+
+    def _release(self):
+        pass
+
+    def time_until_available(self):
+        # The backend doesn't expose when the oldest operation in the
+        # window expires so assume operations are evenly spread out.
+        return max(self.window // self.limit, 1)
@@ -31,12 +31,19 @@ class WindowRateLimiter(RateLimiter):
       because keeping metadata at the millisecond level is far too
       expensive for most use cases.
 
+    Note:
+
+      Acquiring a slot costs one key per second of the window.  For
+      wide or sub-second windows, see |SlidingWindowRateLimiter|.
+
     Parameters:
       backend(RateLimiterBackend): The backend to use.
       key(str): The key to rate limit on.
       limit(int): The maximum number of operations per window per key.
       window(int): The window size in *seconds*.  The wider the
         window, the more expensive it is to maintain.
+
+    .. |SlidingWindowRateLimiter| replace:: :class:`SlidingWindowRateLimiter<dramatiq.rate_limits.SlidingWindowRateLimiter>`
     """
 
     def __init__(self, backend, key, *, limit=1, window=1):
@@ -62,3 +69,6 @@ class WindowRateLimiter(RateLimiter):
 
     def _release(self):
         pass
+
+    def time_until_available(self):
+        return 1000 - int(time.time() * 1000) % 1000
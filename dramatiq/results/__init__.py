@@ -16,7 +16,12 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from .backend import Missing, ResultBackend
+from .blobs import BlobStore, FilesystemBlobStore
+from .cache import ResultCache
 from .errors import ResultError, ResultMissing, ResultTimeout
 from .middleware import Results
 
-__all__ = ["Missing", "ResultBackend", "ResultError", "ResultTimeout", "ResultMissing", "Results"]
+__all__ = [
+    "Missing", "ResultBackend", "ResultError", "ResultTimeout", "ResultMissing", "Results",
+    "BlobStore", "FilesystemBlobStore", "ResultCache",
+]
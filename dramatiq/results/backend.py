@@ -29,6 +29,13 @@ DEFAULT_TIMEOUT = 10000
 #: The minimum amount of time in ms to wait between polls.
 BACKOFF_FACTOR = 100
 
+#: The default size, in bytes, above which results are offloaded to
+#: the blob store, if one is configured.
+DEFAULT_BLOB_THRESHOLD = 1048576
+
+#: The key under which blob references are stored in place of results.
+BLOB_REFERENCE_KEY = "__dramatiq_blob__"
+
 #: Canary value that is returned when a result hasn't been set yet.
 Missing = type("Missing", (object,), {})()
 
@@ -47,13 +54,28 @@ class ResultBackend:
         should be stored.
       encoder(Encoder): The encoder to use when storing and retrieving
         result data.  Defaults to :class:`.JSONEncoder`.
+      blob_store(BlobStore): An optional blob store.  Results whose
+        encoded size is at least ``blob_threshold`` bytes are stored
+        in the blob store and only a reference to them is stored in
+        the backend.  Binary results (bytes and memoryviews) are
+        stored in the blob store as-is.
+      blob_threshold(int): The size, in bytes, above which results
+        are offloaded to the blob store.  Defaults to 1MiB.
+      cache(ResultCache): An optional in-process cache.  When set,
+        repeated reads of completed results are served from memory.
     """
 
-    def __init__(self, *, namespace: str = "dramatiq-results", encoder: Encoder = None):
+    def __init__(
+            self, *, namespace: str = "dramatiq-results", encoder: Encoder = None,
+            blob_store=None, blob_threshold: int = None, cache=None,
+    ):
         from ..message import get_encoder
 
         self.namespace = namespace
         self.encoder = encoder or get_encoder()
+        self.blob_store = blob_store
+        self.blob_threshold = blob_threshold or DEFAULT_BLOB_THRESHOLD
+        self.cache = cache
 
     def get_result(self, message, *, block: bool = False, timeout: int = None, propagate=True) -> Result:
         """Get a result from the backend.
@@ -76,6 +98,10 @@ class ResultBackend:
 
         end_time = time.monotonic() + timeout / 1000
         message_key = self.build_message_key(message)
+        if self.cache is not None:
+            result = self.cache.get(message_key, Missing)
+            if result is not Missing:
+                return self._resolve_blob(message, result)
 
         attempts = 0
         while True:
@@ -93,7 +119,8 @@ class ResultBackend:
                 raise ResultMissing(message)
 
             else:
-                return result
+                self._cache_result(message_key, result)
+                return self._resolve_blob(message, result)
 
     def store_result(self, message, result: Result, ttl: int) -> None:
         """Store a result in the backend.
@@ -105,7 +132,7 @@ class ResultBackend:
             stored in the backend for.
         """
         message_key = self.build_message_key(message)
-        return self._store(message_key, result, ttl)
+        return self._store(message_key, self._offload_blob(result, ttl), ttl)
 
     def store_exception(self, message, exception: Exception, ttl: int) -> None:
         """Store actor exception in the backend.
@@ -119,6 +146,21 @@ class ResultBackend:
         message_key = self.build_message_key(message)
         return self._store_exception(message_key, exception, ttl)
 
+    def store_many(self, entries) -> None:
+        """Store a batch of results and exceptions in the backend.
+        Backends that can write many keys in a single round trip
+        should override :meth:`_store_many`.
+
+        Parameters:
+          entries(list[tuple]): A list of ``(message, result,
+            exception, ttl)`` tuples.  When ``exception`` is not
+            None, it is stored instead of the result.
+        """
+        return self._store_many([
+            (self.build_message_key(message), self._offload_blob(result, ttl), exception, ttl)
+            for message, result, exception, ttl in entries
+        ])
+
     def build_message_key(self, message) -> str:
         """Given a message, return its globally-unique key.
 
@@ -136,6 +178,64 @@ class ResultBackend:
         }
         return hashlib.md5(message_key.encode("utf-8")).hexdigest()
 
+    def _offload_blob(self, result: Result, ttl: int) -> bytes:
+        """Encode a result for storage.  If the result is large
+        enough, it is moved to the blob store and a reference to it
+        is encoded instead.  Results are only ever encoded once.
+        """
+        if isinstance(result, (bytes, bytearray, memoryview)):
+            if self.blob_store is None or memoryview(result).nbytes < self.blob_threshold:
+                return self._encode_result(result)
+
+            key, raw = self.blob_store.put(result, ttl), True
+        else:
+            data = self._encode_result(result)
+            if self.blob_store is None or len(data) < self.blob_threshold:
+                return data
+
+            key, raw = self.blob_store.put(data, ttl), False
+
+        return self._encode_result({BLOB_REFERENCE_KEY: key, "raw": raw})
+
+    def _encode_result(self, result: Result) -> bytes:
+        """Encode a result the way this backend stores it.
+        """
+        return self.encoder.encode(dict(actor_result=result))
+
+    def _decode_result(self, data: bytes) -> Result:
+        """Decode a result encoded by :meth:`_encode_result`.
+        """
+        return self.encoder.decode(data)["actor_result"]
+
+    def _cache_result(self, message_key: str, result: Result, size: int = None) -> None:
+        """Add a completed result to the cache, if there is one.  Blob
+        references are cached instead of the blobs they point to.
+        """
+        if self.cache is None:
+            return
+
+        if size is None and self.cache.max_bytes is not None:
+            size = len(self.encoder.encode(result))
+
+        self.cache.put(message_key, result, size or 0)
+
+    def _resolve_blob(self, message, result: Result) -> Result:
+        """Replace blob references with the data they point to.
+
+        Raises:
+          ResultMissing: When the blob no longer exists.
+        """
+        if self.blob_store is None or not isinstance(result, dict) or BLOB_REFERENCE_KEY not in result:
+            return result
+
+        data = self.blob_store.get(result[BLOB_REFERENCE_KEY])
+        if data is None:
+            raise ResultMissing(message)
+
+        if result.get("raw"):
+            return data
+        return self._decode_result(bytes(data))
+
     def _get(self, message_key: str) -> MResult:  # pragma: no cover
         """Get a result from the backend.  Subclasses may implement
         this method if they want to use the default, polling,
@@ -145,10 +245,10 @@ class ResultBackend:
             "classname": type(self).__name__,
         })
 
-    def _store(self, message_key: str, result: Result, ttl: int) -> None:  # pragma: no cover
-        """Store a result in the backend.  Subclasses may implement
-        this method if they want to use the default implementation of
-        set_result.
+    def _store(self, message_key: str, data: bytes, ttl: int) -> None:  # pragma: no cover
+        """Store a result, encoded by :meth:`_encode_result`, in the
+        backend.  Subclasses may implement this method if they want
+        to use the default implementation of set_result.
         """
         raise NotImplementedError("%(classname)r does not implement _store()" % {
             "classname": type(self).__name__,
@@ -162,3 +262,17 @@ class ResultBackend:
         raise NotImplementedError("%(classname)r does not implement _store_exception()" % {
             "classname": type(self).__name__,
         })
+
+    def _store_many(self, entries) -> None:
+        """Store a batch of encoded results in the backend.  The
+        default implementation stores each entry individually.
+        """
+        for message_key, data, exception, ttl in entries:
+            if exception is None:
+                self._store(message_key, data, ttl)
+                continue
+
+            try:
+                self._store_exception(message_key, exception, ttl)
+            except NotImplementedError:
+                pass
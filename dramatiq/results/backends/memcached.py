@@ -28,6 +28,10 @@ class MemcachedBackend(ResultBackend):
       namespace(str): A string with which to prefix result keys.
       encoder(Encoder): The encoder to use when storing and retrieving
         result data.  Defaults to :class:`.JSONEncoder`.
+      blob_store(BlobStore): An optional store for large results.
+      blob_threshold(int): The size, in bytes, above which results
+        are offloaded to the blob store.
+      cache(ResultCache): An optional cache for completed results.
       pool(ClientPool): An optional pylibmc client pool to use.  If
         this is passed, all other connection params are ignored.
       pool_size(int): The size of the connection pool to use.
@@ -37,8 +41,14 @@ class MemcachedBackend(ResultBackend):
     .. _memcached: https://memcached.org
     """
 
-    def __init__(self, *, namespace="dramatiq-results", encoder=None, pool=None, pool_size=8, **parameters):
-        super().__init__(namespace=namespace, encoder=encoder)
+    def __init__(
+            self, *, namespace="dramatiq-results", encoder=None, blob_store=None, blob_threshold=None, cache=None,
+            pool=None, pool_size=8, **parameters
+    ):
+        super().__init__(
+            namespace=namespace, encoder=encoder, blob_store=blob_store, blob_threshold=blob_threshold,
+            cache=cache,
+        )
         self.pool = pool or ClientPool(Client(**parameters), pool_size)
 
     def _get(self, message_key):
@@ -48,7 +58,13 @@ class MemcachedBackend(ResultBackend):
                 return self.encoder.decode(data)
             return Missing
 
-    def _store(self, message_key, result, ttl):
-        result_data = self.encoder.encode(result)
+    def _encode_result(self, result):
+        # Results are stored as-is rather than wrapped in a dict.
+        return self.encoder.encode(result)
+
+    def _decode_result(self, data):
+        return self.encoder.decode(data)
+
+    def _store(self, message_key, data, ttl):
         with self.pool.reserve(block=True) as client:
-            client.set(message_key, result_data, time=int(ttl / 1000))
+            client.set(message_key, data, time=int(ttl / 1000))
@@ -21,7 +21,7 @@ from pydoc import locate
 import math
 import redis
 
-from ..backend import DEFAULT_TIMEOUT, ResultBackend, ResultMissing, ResultTimeout
+from ..backend import DEFAULT_TIMEOUT, Missing, ResultBackend, ResultMissing, ResultTimeout
 from dramatiq.logging import get_logger
 
 class RedisBackend(ResultBackend):
@@ -32,6 +32,10 @@ class RedisBackend(ResultBackend):
       namespace(str): A string with which to prefix result keys.
       encoder(Encoder): The encoder to use when storing and retrieving
         result data.  Defaults to :class:`.JSONEncoder`.
+      blob_store(BlobStore): An optional store for large results.
+      blob_threshold(int): The size, in bytes, above which results
+        are offloaded to the blob store.
+      cache(ResultCache): An optional cache for completed results.
       client(Redis): An optional client.  If this is passed,
         then all other parameters are ignored.
       url(str): An optional connection URL.  If both a URL and
@@ -42,8 +46,14 @@ class RedisBackend(ResultBackend):
     .. _redis: https://redis.io
     """
 
-    def __init__(self, *, namespace="dramatiq-results", encoder=None, client=None, url=None, **parameters):
-        super().__init__(namespace=namespace, encoder=encoder)
+    def __init__(
+            self, *, namespace="dramatiq-results", encoder=None, blob_store=None, blob_threshold=None, cache=None,
+            client=None, url=None, **parameters
+    ):
+        super().__init__(
+            namespace=namespace, encoder=encoder, blob_store=blob_store, blob_threshold=blob_threshold,
+            cache=cache,
+        )
         self.logger = get_logger(__name__, type(self))
 
         if url:
@@ -76,6 +86,11 @@ class RedisBackend(ResultBackend):
             timeout = DEFAULT_TIMEOUT
 
         message_key = self.build_message_key(message)
+        if self.cache is not None:
+            result = self.cache.get(message_key, Missing)
+            if result is not Missing:
+                return self._resolve_blob(message, result)
+
         if block:
             timeout = int(timeout / 1000)
             if timeout == 0:
@@ -91,21 +106,31 @@ class RedisBackend(ResultBackend):
             if data is None:
                 raise ResultMissing(message)
 
-        data = self.encoder.decode(data)
+        size, data = len(data), self.encoder.decode(data)
         if 'actor_exception' in data:
             if propagate:
                 self._raise_exception(data['actor_exception'])
             else:
                 return self._deserialize_exception(data['actor_exception'])
         if 'actor_result' in data:
-            return data['actor_result']
+            self._cache_result(message_key, data['actor_result'], size)
+            return self._resolve_blob(message, data['actor_result'])
         return data
 
-    def _store(self, message_key, result, ttl):
+    def _store(self, message_key, data, ttl):
+        self._store_many([(message_key, data, None, ttl)])
+
+    def _store_many(self, entries):
+        # Every entry is written as part of the same MULTI block so a
+        # whole batch of results costs a single round trip.
         with self.client.pipeline() as pipe:
-            pipe.delete(message_key)
-            pipe.lpush(message_key, self.encoder.encode(dict(actor_result=result)))
-            pipe.pexpire(message_key, ttl)
+            for message_key, data, exception, ttl in entries:
+                if exception is not None:
+                    data = self.encoder.encode(dict(actor_exception=self._serialize_exception(exception)))
+
+                pipe.delete(message_key)
+                pipe.lpush(message_key, data)
+                pipe.pexpire(message_key, ttl)
             pipe.execute()
 
     _exception_token = 'exc'
@@ -133,11 +158,7 @@ class RedisBackend(ResultBackend):
         raise self._deserialize_exception(serialized)
 
     def _store_exception(self, message_key, exception, ttl):
-        with self.client.pipeline() as pipe:
-            pipe.delete(message_key)
-            pipe.lpush(message_key, self.encoder.encode(dict(actor_exception=self._serialize_exception(exception))))
-            pipe.pexpire(message_key, ttl)
-            pipe.execute()
+        self._store_many([(message_key, None, exception, ttl)])
 
     def get_any_results(self, messages, *, block=False, timeout=None, propagate=True, with_task=False):
         if block:
@@ -149,6 +170,13 @@ class RedisBackend(ResultBackend):
             deadline = time.monotonic()
 
         message_keys = {self.build_message_key(message): message for message in messages}
+        if self.cache is not None:
+            for message_key in list(message_keys):
+                result = self.cache.get(message_key, Missing)
+                if result is not Missing:
+                    message = message_keys.pop(message_key)
+                    result = self._resolve_blob(message, result)
+                    yield (result, message) if with_task else result
 
         while message_keys:
             if block:
@@ -174,7 +202,7 @@ class RedisBackend(ResultBackend):
 
             found_key = found_key.decode()
             message = message_keys.pop(found_key)
-            data = self.encoder.decode(data)
+            size, data = len(data), self.encoder.decode(data)
 
             if 'actor_exception' in data:
                 if propagate:
@@ -184,7 +212,8 @@ class RedisBackend(ResultBackend):
                     self.logger.debug('Returning actor exception')
                     result = self._deserialize_exception(data['actor_exception'])
             elif 'actor_result' in data:
-                result = data['actor_result']
+                self._cache_result(found_key, data['actor_result'], size)
+                result = self._resolve_blob(message, data['actor_result'])
             else:
                 result = data
 
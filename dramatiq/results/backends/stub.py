@@ -28,6 +28,10 @@ class StubBackend(ResultBackend):
       namespace(str): A string with which to prefix result keys.
       encoder(Encoder): The encoder to use when storing and retrieving
         result data.  Defaults to :class:`.JSONEncoder`.
+      blob_store(BlobStore): An optional store for large results.
+      blob_threshold(int): The size, in bytes, above which results
+        are offloaded to the blob store.
+      cache(ResultCache): An optional cache for completed results.
     """
 
     results = {}
@@ -43,10 +47,9 @@ class StubBackend(ResultBackend):
             return data
         return Missing
 
-    def _store(self, message_key, result, ttl):
-        result_data = self.encoder.encode(dict(actor_result=result))
+    def _store(self, message_key, data, ttl):
         expiration = time.monotonic() + int(ttl / 1000)
-        self.results[message_key] = (result_data, expiration)
+        self.results[message_key] = (data, expiration)
 
     def _serialize_exception(self, exc):
         return {'type': type(exc).__name__,
@@ -0,0 +1,174 @@
+# This file is a part of Dramatiq.
+#
+# Copyright (C) 2017,2018 CLEARTYPE SRL <bogdan@cleartype.io>
+#
+# Dramatiq is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+#
+# Dramatiq is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+
+from ..logging import get_logger
+
+#: The minimum amount of time, in milliseconds, between two prunes of
+#: expired blobs.
+DEFAULT_PRUNE_INTERVAL = 60000
+
+#: The prefix of the temporary files blobs are written to before
+#: being moved into place.
+TEMP_FILE_PREFIX = ".tmp-"
+
+#: The amount of time, in seconds, after which temporary files are
+#: assumed to have been left behind by crashed processes and pruned.
+TEMP_FILE_TTL = 3600
+
+
+class BlobStore:
+    """ABC for content-addressed blob stores.  Result backends use
+    blob stores to hold large results outside of the backend itself,
+    keeping only a small reference to each blob.
+
+    Blobs are keyed by the SHA-256 digest of their contents so storing
+    the same data twice only stores it once.
+    """
+
+    def put(self, data, ttl):
+        """Store a blob.
+
+        Parameters:
+          data(bytes): The blob's contents.
+          ttl(int): The minimum amount of time, in milliseconds, the
+            blob must be kept around for.
+
+        Returns:
+          str: The blob's key.
+        """
+        key = hashlib.sha256(data).hexdigest()
+        self._put(key, data, ttl)
+        return key
+
+    def get(self, key):
+        """Get a blob.
+
+        Parameters:
+          key(str): The blob's key.
+
+        Returns:
+          bytes: The blob's contents or None if the blob doesn't exist
+          or has expired.
+        """
+        return self._get(key)
+
+    def _put(self, key, data, ttl):  # pragma: no cover
+        raise NotImplementedError("%(classname)r does not implement _put()" % {
+            "classname": type(self).__name__,
+        })
+
+    def _get(self, key):  # pragma: no cover
+        raise NotImplementedError("%(classname)r does not implement _get()" % {
+            "classname": type(self).__name__,
+        })
+
+
+class FilesystemBlobStore(BlobStore):
+    """A blob store that keeps blobs on the local filesystem.  Every
+    process that reads results must have access to the same path.
+
+    Blob expiration times are tracked via file modification times and
+    expired blobs are pruned lazily whenever new blobs are stored.
+
+    Parameters:
+      path(str): The directory to store blobs in.  Defaults to a
+        directory under the system's temporary directory.
+      use_mmap(bool): When True, blobs are memory-mapped on read and
+        returned as read-only :class:`memoryview` objects instead of
+        being copied into memory.  Binary results are then handed to
+        the caller without any copies.
+      prune_interval(int): The minimum amount of time, in
+        milliseconds, between two prunes of expired blobs.
+    """
+
+    def __init__(self, path=None, *, use_mmap=False, prune_interval=DEFAULT_PRUNE_INTERVAL):
+        self.logger = get_logger(__name__, type(self))
+        self.path = path or os.path.join(tempfile.gettempdir(), "dramatiq-blobs")
+        self.use_mmap = use_mmap
+        self.prune_interval = prune_interval / 1000
+        self.pruned_at = time.time()
+        os.makedirs(self.path, exist_ok=True)
+
+    def prune(self):
+        """Remove all expired blobs.  Blobs that are still being
+        written are left alone.
+        """
+        now = time.time()
+        self.pruned_at = now
+        for dirpath, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                filepath = os.path.join(dirpath, filename)
+                expiration = now
+                if filename.startswith(TEMP_FILE_PREFIX):
+                    expiration -= TEMP_FILE_TTL
+
+                try:
+                    if os.stat(filepath).st_mtime < expiration:
+                        os.remove(filepath)
+                except FileNotFoundError:  # pragma: no cover
+                    continue
+
+    def _path_for(self, key):
+        return os.path.join(self.path, key[:2], key[2:])
+
+    def _put(self, key, data, ttl):
+        expiration = time.time() + ttl / 1000
+        filepath = self._path_for(key)
+        try:
+            # The blob already exists, so all we need to do is make
+            # sure it lives for at least as long as this reference.
+            if os.stat(filepath).st_mtime < expiration:
+                os.utime(filepath, (expiration, expiration))
+
+        except FileNotFoundError:
+            dirname = os.path.dirname(filepath)
+            os.makedirs(dirname, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix=TEMP_FILE_PREFIX, dir=dirname)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+
+            os.utime(temp_path, (expiration, expiration))
+            os.replace(temp_path, filepath)
+
+        if time.time() - self.pruned_at >= self.prune_interval:
+            self.prune()
+
+    def _get(self, key):
+        filepath = self._path_for(key)
+        try:
+            with open(filepath, "rb") as f:
+                if os.fstat(f.fileno()).st_mtime < time.time():
+                    return None
+
+                if not self.use_mmap:
+                    return f.read()
+
+                # Empty files can't be memory-mapped.
+                if os.fstat(f.fileno()).st_size == 0:
+                    return memoryview(b"")
+
+                # The mapping stays valid after the file is closed
+                # and even after the blob is pruned.
+                return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,132 @@
+# This file is a part of Dramatiq.
+#
+# Copyright (C) 2017,2018 CLEARTYPE SRL <bogdan@cleartype.io>
+#
+# Dramatiq is free software; you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or (at
+# your option) any later version.
+#
+# Dramatiq is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+# License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+#: The default maximum number of cached results.
+DEFAULT_MAX_ENTRIES = 1024
+
+#: The default amount of time, in milliseconds, results are cached for.
+DEFAULT_CACHE_TTL = 60000
+
+
+class ResultCache:
+    """An in-process LRU cache for completed results.  Once a result
+    has been stored, it never changes so result backends can serve
+    repeated reads of the same result from memory.
+
+    Examples:
+
+      >>> from dramatiq.results import ResultCache
+      >>> from dramatiq.results.backends import RedisBackend
+      >>> backend = RedisBackend(cache=ResultCache(max_bytes=64 * 1024 * 1024))
+
+    Warning:
+      Cached results are shared between callers, so they must not be
+      mutated.
+
+    Warning:
+      The cache TTL should be lower than the TTL of the results
+      themselves, otherwise results may outlive their expiration.
+
+    Parameters:
+      max_entries(int): The maximum number of results to keep.
+      max_bytes(int): The maximum combined size, in bytes, of the
+        encoded cached results.  Defaults to None, meaning the cache
+        is only bounded by ``max_entries``.
+      ttl(int): The maximum amount of time, in milliseconds, results
+        are cached for.
+
+    Attributes:
+      hits(int): The number of lookups that were served from memory.
+      misses(int): The number of lookups that weren't.
+      size(int): The combined size, in bytes, of the cached results.
+    """
+
+    def __init__(self, *, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=None, ttl=DEFAULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl / 1000
+        self.entries = OrderedDict()
+        self.mutex = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        """Look up a result.
+
+        Parameters:
+          key(str): The result's message key.
+          default(object): The value to return on misses.
+
+        Returns:
+          object: The cached result or ``default``.
+        """
+        with self.mutex:
+            try:
+                result, size, expiration = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if time.monotonic() >= expiration:
+                self._remove(key)
+                self.misses += 1
+                return default
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result, size=0):
+        """Add a result to the cache, evicting the least recently
+        used results if necessary.
+
+        Parameters:
+          key(str): The result's message key.
+          result(object): The result.
+          size(int): The size of the encoded result, in bytes.
+        """
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self.mutex:
+            if key in self.entries:
+                self._remove(key)
+
+            self.entries[key] = (result, size, time.monotonic() + self.ttl)
+            self.size += size
+            while len(self.entries) > self.max_entries or \
+                    self.max_bytes is not None and self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def clear(self):
+        """Drop all cached results.
+        """
+        with self.mutex:
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.size -= size
@@ -14,6 +14,9 @@
 #
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from collections import deque
+from threading import Condition, Lock, Thread
+
 from ..errors import ActorNotFound
 from ..logging import get_logger
 from ..middleware import Middleware
@@ -22,6 +25,14 @@ from ..middleware import Middleware
 #: the backend.
 DEFAULT_RESULT_TTL = 600000
 
+#: The maximum number of results that may be buffered in memory when
+#: write-behind is enabled.
+DEFAULT_WRITE_BEHIND_BUFFER = 1000
+
+#: The interval, in milliseconds, at which buffered results are
+#: flushed to the backend when write-behind is enabled.
+DEFAULT_WRITE_BEHIND_INTERVAL = 100
+
 
 class Results(Middleware):
     """Middleware that automatically stores actor results.
@@ -50,14 +61,38 @@ class Results(Middleware):
       result_ttl(int): The maximum number of milliseconds results are
         allowed to exist in the backend.  Defaults to 10 minutes and
         can be set on a per-actor basis.
+      write_behind(bool): When True, results are buffered in memory
+        and written to the backend in batches by a background thread
+        instead of being stored by the worker thread that produced
+        them.  Defaults to False.
+      write_behind_buffer(int): The maximum number of results that
+        may be buffered at once.  When the buffer is full, the worker
+        thread flushes it itself.
+      write_behind_interval(int): The interval, in milliseconds, at
+        which the buffer is flushed.
+      write_behind_ordered(bool): When True, the buffer is flushed
+        before every message is acked so that results are always
+        visible by the time their message is acknowledged.
     """
 
-    def __init__(self, *, backend=None, store_results=False, result_ttl=None, store_exceptions=True):
+    def __init__(
+            self, *, backend=None, store_results=False, result_ttl=None, store_exceptions=True,
+            write_behind=False, write_behind_buffer=DEFAULT_WRITE_BEHIND_BUFFER,
+            write_behind_interval=DEFAULT_WRITE_BEHIND_INTERVAL, write_behind_ordered=False,
+    ):
         self.logger = get_logger(__name__, type(self))
         self.backend = backend
         self.store_results = store_results
         self.result_ttl = result_ttl or DEFAULT_RESULT_TTL
         self.store_exceptions = store_exceptions
+        self.write_behind_ordered = write_behind_ordered
+        self.writer = None
+        if write_behind:
+            self.writer = _ResultWriter(
+                backend,
+                buffer_size=write_behind_buffer,
+                interval=write_behind_interval,
+            )
 
     @property
     def actor_options(self):
@@ -72,10 +107,113 @@ class Results(Middleware):
         store_results = actor.options.get("store_results", self.store_results)
         result_ttl = actor.options.get("result_ttl", self.result_ttl)
         if store_results:
-            if exception is None:
+            if exception is not None and not self.store_exceptions:
+                return
+
+            if self.writer is not None:
+                self.writer.put((message, result, exception, result_ttl))
+
+            elif exception is None:
                 self.backend.store_result(message, result, result_ttl)
-            elif self.store_exceptions:
+
+            else:
                 try:
                     self.backend.store_exception(message, exception, result_ttl)
                 except NotImplementedError:
-                    pass
\ No newline at end of file
+                    pass
+
+    def before_ack(self, broker, message):
+        if self.writer is not None and self.write_behind_ordered:
+            self.writer.flush()
+
+    before_nack = before_ack
+
+    def after_worker_shutdown(self, broker, worker):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _ResultWriter:
+    """Buffers results in memory and periodically writes them to a
+    result backend using :meth:`ResultBackend.store_many`.
+
+    Parameters:
+      backend(ResultBackend)
+      buffer_size(int): The maximum number of buffered results.
+      interval(int): The flush interval in milliseconds.
+    """
+
+    def __init__(self, backend, *, buffer_size, interval):
+        self.logger = get_logger(__name__, type(self))
+        self.backend = backend
+        self.buffer_size = buffer_size
+        self.interval = interval / 1000
+        self.buffer = deque()
+        self.condition = Condition()
+        self.flush_lock = Lock()
+        self.running = False
+        self.thread = None
+
+    def put(self, entry):
+        with self.condition:
+            if not self.running:
+                self.running = True
+                self.thread = Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+            self.buffer.append(entry)
+            full = len(self.buffer) >= self.buffer_size
+            if len(self.buffer) >= self.buffer_size // 2:
+                self.condition.notify()
+
+        # Apply backpressure to the worker thread rather than letting
+        # the buffer grow without bound.
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered results to the backend.  Flushes are
+        serialized so, by the time this returns, every result that was
+        buffered before it was called has been written.
+        """
+        with self.flush_lock:
+            with self.condition:
+                entries = list(self.buffer)
+                self.buffer.clear()
+
+            if not entries:
+                return
+
+            try:
+                self.backend.store_many(entries)
+            except Exception:
+                self.logger.exception("Failed to store %d results.  They will be retried.", len(entries))
+                with self.condition:
+                    room = max(0, self.buffer_size - len(self.buffer))
+                    if room < len(entries):
+                        self.logger.warning("Result buffer is full.  Dropping %d results.", len(entries) - room)
+
+                    self.buffer.extendleft(reversed(entries[:room]))
+
+    def close(self):
+        """Stop the background thread and flush any buffered results.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self.running:
+                    return
+
+                self.condition.wait(timeout=self.interval)
+
+            self.flush()
@@ -15,15 +15,16 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import math
 import os
 import time
 from collections import defaultdict
 from itertools import chain
 from queue import Empty, PriorityQueue
-from threading import Event, Thread
+from threading import Event, Lock, Thread
 
 from dramatiq.middleware.middleware import RestartWorker
-from .common import current_millis, iter_queue, join_all, q_name
+from .common import WorkQueue, current_millis, iter_queue, join_all, q_name
 from .errors import ActorNotFound, ConnectionError, RateLimitExceeded
 from .logging import get_logger
 from .middleware import Middleware, SkipMessage
@@ -40,6 +41,10 @@ POST_PROCESS_MESSAGE_RETRY_DELAY_SECS = 5
 #: The number of messages to prefetch from the queue for each worker
 QUEUE_PREFETCH = int(os.getenv("dramatiq_queue_prefetch", 0))
 
+#: The number of milliseconds between adjustments of adaptive
+#: prefetch sizes.
+PREFETCH_ADJUST_INTERVAL = int(os.getenv("dramatiq_prefetch_adjust_interval", 1000))
+
 
 class Worker:
     """Workers consume messages off of all declared queues and
@@ -57,9 +62,27 @@ class Worker:
       worker_timeout(int): The number of milliseconds workers should
         wake up after if the queue is idle.
       worker_threads(int): The number of worker threads to spawn.
+      adaptive_prefetch(bool): Whether or not to continuously resize
+        the prefetch of each queue based on how quickly its messages
+        are processed, how long its consumer waits for messages and
+        how many messages are waiting for worker threads.  Delay
+        queues always use a fixed prefetch.
+      min_prefetch(int): The smallest prefetch adaptive prefetch can
+        shrink a queue's prefetch to.  Defaults to the number of
+        worker threads.
+      max_prefetch(int): The largest prefetch adaptive prefetch can
+        grow a queue's prefetch to.  Defaults to 100 times the number
+        of worker threads.
+
+    Raises:
+      ValueError: If min_prefetch is less than 1 or greater than
+        max_prefetch.
     """
 
-    def __init__(self, broker, *, queues=None, worker_timeout=1000, worker_threads=8):
+    def __init__(
+            self, broker, *, queues=None, worker_timeout=1000, worker_threads=8,
+            adaptive_prefetch=False, min_prefetch=None, max_prefetch=None,
+    ):
         self.logger = get_logger(__name__, type(self))
         self.broker = broker
 
@@ -72,9 +95,17 @@ class Worker:
         # Load a large factor more delay messages than there are
         # workers as those messages could have far-future etas.
         self.delay_prefetch = min(worker_threads * 1000, 65535)
+        self.adaptive_prefetch = adaptive_prefetch
+        self.max_prefetch = min(max_prefetch or worker_threads * 100, 65535)
+        # Never shrink below one message per worker thread by default
+        # so queues that start out idle don't starve their threads
+        # once messages start coming in.
+        self.min_prefetch = min_prefetch or min(worker_threads, self.max_prefetch)
+        if not 1 <= self.min_prefetch <= self.max_prefetch:
+            raise ValueError("min_prefetch must be at least 1 and at most max_prefetch.")
 
         self.workers = []
-        self.work_queue = PriorityQueue()
+        self.work_queue = WorkQueue()
         self.worker_timeout = worker_timeout
         self.worker_threads = worker_threads
 
@@ -188,12 +219,24 @@ class Worker:
             self.logger.debug("Dropping consumer for queue %r: not whitelisted.", queue_name)
             return
 
+        # Some brokers declare their delay queues as regular queues
+        # too, hence the check on the queue's name.
+        prefetch_controller = None
+        if self.adaptive_prefetch and not delay and queue_name == canonical_name:
+            prefetch_controller = _PrefetchController(
+                prefetch=self.queue_prefetch,
+                min_prefetch=self.min_prefetch,
+                max_prefetch=self.max_prefetch,
+                worker_threads=self.worker_threads,
+            )
+
         consumer = self.consumers[queue_name] = _ConsumerThread(
             broker=self.broker,
             queue_name=queue_name,
             prefetch=self.delay_prefetch if delay else self.queue_prefetch,
             work_queue=self.work_queue,
             worker_timeout=self.worker_timeout,
+            prefetch_controller=prefetch_controller,
         )
         consumer.start()
 
@@ -222,8 +265,98 @@ class _WorkerMiddleware(Middleware):
         self.worker._add_consumer(queue_name, delay=True)
 
 
+class _PrefetchController:
+    """Sizes a consumer's prefetch so that it buffers enough messages
+    to keep worker threads busy while it waits for more, but not so
+    many that they pile up on the work queue where other workers
+    can't get at them.
+
+    Every ``interval`` milliseconds, the new prefetch is set to twice
+    the number of messages processed during the longest wait for a
+    message, according to the processing rate over the interval.
+    Only waits that end with a message are recorded, so time spent
+    polling an empty queue doesn't make the prefetch grow.  The
+    prefetch grows to that size right away but shrinks by at most
+    half per interval, so consumers that never wait because their
+    prefetch is large enough (eg. push consumers) decay gradually
+    rather than swinging between the minimum and a large prefetch.
+    Whenever more messages are waiting on the work queue than there
+    are worker threads, the prefetch is halved instead.  Intervals
+    during which no messages were processed leave the prefetch as it
+    is.
+
+    Parameters:
+      prefetch(int): The initial prefetch.
+      min_prefetch(int): The smallest prefetch to use.
+      max_prefetch(int): The largest prefetch to use.
+      worker_threads(int): The number of worker threads.
+      interval(int): The number of milliseconds between adjustments.
+    """
+
+    def __init__(self, *, prefetch, min_prefetch, max_prefetch, worker_threads, interval=PREFETCH_ADJUST_INTERVAL):
+        self.min_prefetch = min_prefetch
+        self.max_prefetch = max_prefetch
+        self.prefetch = self._clamp(prefetch)
+        self.worker_threads = worker_threads
+        self.interval = interval / 1000
+        self.lock = Lock()
+        self.processed = 0
+        self.longest_wait = 0
+        self.adjusted_at = time.monotonic()
+
+    def record_wait(self, duration):
+        """Record how many seconds the consumer waited for a message.
+        """
+        self.longest_wait = max(self.longest_wait, duration)
+
+    def record_processed(self):
+        """Record that one of the consumer's messages was processed.
+        This is called from worker threads.
+        """
+        with self.lock:
+            self.processed += 1
+
+    def adjust(self, occupancy):
+        """Compute a new prefetch if the interval has elapsed.
+
+        Parameters:
+          occupancy(int): The number of messages waiting on the work
+            queue.
+
+        Returns:
+          int: The new prefetch or None if it hasn't changed.
+        """
+        elapsed = time.monotonic() - self.adjusted_at
+        if elapsed < self.interval:
+            return None
+
+        with self.lock:
+            processed, self.processed = self.processed, 0
+
+        rate = processed / elapsed
+        if occupancy > self.worker_threads:
+            prefetch = self.prefetch // 2
+        elif processed:
+            prefetch = max(math.ceil(rate * self.longest_wait * 2), self.prefetch // 2)
+        else:
+            prefetch = self.prefetch
+
+        self.longest_wait = 0
+        self.adjusted_at += elapsed
+
+        prefetch = self._clamp(prefetch)
+        if prefetch == self.prefetch:
+            return None
+
+        self.prefetch = prefetch
+        return prefetch
+
+    def _clamp(self, prefetch):
+        return max(self.min_prefetch, min(prefetch, self.max_prefetch))
+
+
 class _ConsumerThread(Thread):
-    def __init__(self, *, broker, queue_name, prefetch, work_queue, worker_timeout):
+    def __init__(self, *, broker, queue_name, prefetch, work_queue, worker_timeout, prefetch_controller=None):
         super().__init__(daemon=True)
 
         self.logger = get_logger(__name__, "ConsumerThread(%s)" % queue_name)
@@ -237,6 +370,9 @@ class _ConsumerThread(Thread):
         self.work_queue = work_queue
         self.worker_timeout = worker_timeout
         self.delay_queue = PriorityQueue()
+        self.prefetch_controller = prefetch_controller
+        if prefetch_controller is not None:
+            self.prefetch = prefetch_controller.prefetch
 
     def run(self):
         self.logger.debug("Running consumer thread...")
@@ -255,14 +391,26 @@ class _ConsumerThread(Thread):
                     timeout=self.worker_timeout,
                 )
 
+                waiting_since = time.monotonic()
                 for message in self.consumer:
                     if message is not None:
+                        if self.prefetch_controller is not None:
+                            self.prefetch_controller.record_wait(time.monotonic() - waiting_since)
+
                         self.handle_message(message)
 
                     elif self.paused:
                         break
 
+                    # Waits are measured from the last time the consumer
+                    # returned, message or not, so polls of an empty
+                    # queue aren't counted.
+                    waiting_since = time.monotonic()
+
                     self.handle_delayed_messages()
+                    if self.prefetch_controller is not None:
+                        self.adjust_prefetch()
+
                     if not self.running:
                         break
 
@@ -296,14 +444,26 @@ class _ConsumerThread(Thread):
                 self.delay_queue.task_done()
                 break
 
+            # Messages are stamped with the time they're moved to
+            # their queue at so that the time they spent delayed
+            # isn't counted as time spent waiting in the broker.
             queue_name = q_name(message.queue_name)
-            new_message = message.copy(queue_name=queue_name)
+            new_message = message.copy(queue_name=queue_name, options={"enqueued_at": current_millis()})
             del new_message.options["eta"]
 
             self.broker.enqueue(new_message)
             self.post_process_message(message)
             self.delay_queue.task_done()
 
+    def adjust_prefetch(self):
+        """Resize the consumer's prefetch if its controller says so.
+        """
+        prefetch = self.prefetch_controller.adjust(self.work_queue.qsize())
+        if prefetch is not None:
+            self.logger.debug("Changing prefetch from %d to %d.", self.prefetch, prefetch)
+            self.prefetch = prefetch
+            self.consumer.set_prefetch(prefetch)
+
     def handle_message(self, message):
         """Handle a message received off of the underlying consumer.
         If the message has an eta, delay it.  Otherwise, put it on the
@@ -318,6 +478,7 @@ class _ConsumerThread(Thread):
             else:
                 actor = self.broker.get_actor(message.actor_name)
                 self.logger.debug("Pushing message %r onto work queue.", message.message_id)
+                message.stamp("queued")
                 self.work_queue.put((actor.priority, message))
         except ActorNotFound:
             self.logger.error(
@@ -346,6 +507,11 @@ class _ConsumerThread(Thread):
                     self.consumer.ack(message)
                     self.broker.emit_after("ack", message)
 
+                if self.prefetch_controller is not None:
+                    self.prefetch_controller.record_processed()
+
+                message.stamp("acked")
+                self.broker.emit_after("post_process_message", message, timings=message.get_timings())
                 return
 
             # This applies to the Redis broker.  The alternative to
@@ -452,6 +618,7 @@ class _WorkerThread(Thread):
 
             try:
                 _, message = self.work_queue.get(timeout=self.timeout)
+                message.stamp("dequeued")
                 self.process_message(message)
             except Empty:
                 continue
@@ -478,7 +645,11 @@ class _WorkerThread(Thread):
             res = None
             if not message.failed:
                 actor = self.broker.get_actor(message.actor_name)
-                res = actor(*message.args, **message.kwargs)
+                message.stamp("started")
+                try:
+                    res = actor(*message.args, **message.kwargs)
+                finally:
+                    message.stamp("finished")
 
             self.broker.emit_after("process_message", message, result=res)
 
@@ -489,7 +660,7 @@ class _WorkerThread(Thread):
             raise
 
         except SkipMessage:
-            self.logger.warning("Message %s was skipped.", message)
+            self.logger.warning("Message %r was skipped.", message.message_id)
             self.broker.emit_after("skip_message", message)
 
         except BaseException as e:
@@ -510,6 +681,7 @@ class _WorkerThread(Thread):
             # processed must have come off of a consumer.  Therefore,
             # there has to be a consumer for that message's queue so
             # this is safe.  Probably.
+            message.stamp("processed")
             self.consumers[message.queue_name].post_process_message(message)
             self.work_queue.task_done()
 
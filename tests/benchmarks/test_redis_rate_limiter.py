@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import redis
+
+from dramatiq.rate_limits import ConcurrentRateLimiter
+from dramatiq.rate_limits.backends import RedisBackend
+
+
+class WatchRedisBackend(RedisBackend):
+    """The optimistic WATCH/MULTI implementation the Lua scripts
+    replaced.  It is kept around so the two can be compared.
+    """
+
+    def incr(self, key, amount, maximum, ttl):
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    value = int(pipe.get(key) or b"0")
+                    value += amount
+                    if value > maximum:
+                        return False
+
+                    pipe.multi()
+                    pipe.set(key, value, px=ttl)
+                    pipe.execute()
+                    return True
+                except redis.WatchError:
+                    continue
+
+    def decr(self, key, amount, minimum, ttl):
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    value = int(pipe.get(key) or b"0")
+                    value -= amount
+                    if value < minimum:
+                        return False
+
+                    pipe.multi()
+                    pipe.set(key, value, px=ttl)
+                    pipe.execute()
+                    return True
+                except redis.WatchError:
+                    continue
+
+
+def acquire_concurrently(backend, *, threads=500, attempts=20):
+    limiter = ConcurrentRateLimiter(backend, "contended-key", limit=10)
+
+    def work():
+        for _ in range(attempts):
+            with limiter.acquire(raise_on_failure=False):
+                pass
+
+    with ThreadPoolExecutor(max_workers=threads) as e:
+        for future in [e.submit(work) for _ in range(threads)]:
+            future.result()
+
+
+@pytest.mark.benchmark(group="redis-rate-limiter-contention")
+@pytest.mark.parametrize("backend_class", [RedisBackend, WatchRedisBackend])
+def test_redis_concurrent_rate_limiter_under_contention(benchmark, redis_rate_limiter_backend, backend_class):
+    # Given a Redis rate limiter backend
+    backend = backend_class(client=redis_rate_limiter_backend.client)
+
+    # I expect 500 threads contending on the same limiter to be consistently fast
+    benchmark.pedantic(acquire_concurrently, args=(backend,), rounds=3)
@@ -0,0 +1,39 @@
+import threading
+from queue import PriorityQueue
+
+import pytest
+
+from dramatiq import MessageProxy
+from dramatiq.common import WorkQueue
+
+
+def put_and_get_concurrently(queue_class, *, threads, items=100):
+    queue = queue_class()
+    message = MessageProxy(None)
+
+    # Half the threads behave like consumer threads and the other half
+    # like worker threads.
+    def produce():
+        for i in range(items):
+            queue.put((i % 3, message))
+
+    def consume():
+        for _ in range(items):
+            queue.get()
+            queue.task_done()
+
+    workers = [threading.Thread(target=produce) for _ in range(threads // 2)]
+    workers.extend(threading.Thread(target=consume) for _ in range(threads // 2))
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+
+
+@pytest.mark.benchmark(group="work-queue-contention")
+@pytest.mark.parametrize("threads", [64, 256, 1024])
+@pytest.mark.parametrize("queue_class", [PriorityQueue, WorkQueue])
+def test_work_queue_under_contention(benchmark, queue_class, threads):
+    # I expect many threads putting items on and getting them off of a work queue to be consistently fast
+    benchmark.pedantic(put_and_get_concurrently, args=(queue_class,), kwargs={"threads": threads}, rounds=3)
@@ -0,0 +1,11 @@
+import os
+import sys
+
+from dramatiq.brokers.stub import StubBroker
+
+# Lets CLI tests tell how many times, and in which processes, the
+# broker module was imported.
+if os.getenv("dramatiq_test_cli_report_imports"):
+    print("Imported tests.cli_broker in PID %d." % os.getpid(), file=sys.stderr, flush=True)
+
+broker = StubBroker()
@@ -158,15 +158,26 @@ def stub_rate_limiter_backend():
 
 
 @pytest.fixture
-def rate_limiter_backends(memcached_rate_limiter_backend, redis_rate_limiter_backend, stub_rate_limiter_backend):
+def shared_memory_rate_limiter_backend(tmpdir):
+    return rl_backends.SharedMemoryBackend(str(tmpdir.join("rate-limits")), stripes=8, slots=64)
+
+
+@pytest.fixture
+def rate_limiter_backends(
+        memcached_rate_limiter_backend,
+        redis_rate_limiter_backend,
+        stub_rate_limiter_backend,
+        shared_memory_rate_limiter_backend,
+):
     return {
         "memcached": memcached_rate_limiter_backend,
         "redis": redis_rate_limiter_backend,
         "stub": stub_rate_limiter_backend,
+        "shared_memory": shared_memory_rate_limiter_backend,
     }
 
 
-@pytest.fixture(params=["memcached", "redis", "stub"])
+@pytest.fixture(params=["memcached", "redis", "stub", "shared_memory"])
 def rate_limiter_backend(request, rate_limiter_backends):
     return rate_limiter_backends[request.param]
 
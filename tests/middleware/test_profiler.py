@@ -0,0 +1,82 @@
+import os
+import signal
+import time
+
+import pytest
+
+import dramatiq
+from dramatiq.middleware.profiler import Profiler, collect_profiles
+
+from ..common import worker
+
+
+def test_profiler_samples_stacks_per_actor(stub_broker, tmpdir):
+    # Given a broker with a profiler that samples often
+    profiler = Profiler(interval=5, dump_interval=None, path=str(tmpdir))
+    stub_broker.add_middleware(profiler)
+
+    # And an actor that spends its time in a helper function
+    def busy_wait():
+        deadline = time.monotonic() + 0.2
+        while time.monotonic() < deadline:
+            pass
+
+    @dramatiq.actor
+    def do_work():
+        busy_wait()
+
+    # When I send that actor a message and process it
+    do_work.send()
+    with worker(stub_broker) as stub_worker:
+        stub_broker.join(do_work.queue_name)
+        stub_worker.join()
+
+        # Then its stacks should be attributed to it
+        stacks = profiler.get_collapsed_stacks()
+        assert stacks
+        assert all(stack.startswith("do_work;") for stack in stacks)
+
+        # And most of the samples should've been taken inside the helper
+        samples = {stack: int(stack.rpartition(" ")[2]) for stack in stacks}
+        busy_samples = sum(count for stack, count in samples.items() if "busy_wait (" in stack)
+        assert busy_samples >= sum(samples.values()) / 2
+
+        # And the worker's own frames should be left out
+        assert not any("process_message (" in stack for stack in stacks)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="SIGUSR1 is not supported on this platform")
+def test_profiler_dumps_profiles_on_sigusr1(stub_broker, tmpdir):
+    # Given the current SIGUSR1 handler
+    previous_handler = signal.getsignal(signal.SIGUSR1)
+
+    # And a broker with a profiler that never dumps on its own
+    profiler = Profiler(interval=5, dump_interval=None, path=str(tmpdir))
+    stub_broker.add_middleware(profiler)
+
+    # And an actor
+    @dramatiq.actor
+    def do_work():
+        time.sleep(0.1)
+
+    # When I process a message
+    do_work.send()
+    try:
+        with worker(stub_broker) as stub_worker:
+            stub_broker.join(do_work.queue_name)
+            stub_worker.join()
+
+            # And send the process SIGUSR1
+            os.kill(os.getpid(), signal.SIGUSR1)
+
+            # Then the profile should be dumped to the process' profile file
+            with open(profiler.filename) as f:
+                assert f.read().splitlines() == profiler.get_collapsed_stacks()
+
+            # And it should be collected for the exposition server
+            assert collect_profiles(str(tmpdir)) == profiler.get_collapsed_stacks()
+
+        # And once the worker has shut down, the previous handler should be restored
+        assert signal.getsignal(signal.SIGUSR1) is previous_handler
+    finally:
+        signal.signal(signal.SIGUSR1, previous_handler)
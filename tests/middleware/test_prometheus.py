@@ -1,8 +1,19 @@
+import os
 import time
 import urllib.request as request
 from threading import Thread
 
-from dramatiq.middleware.prometheus import _run_exposition_server
+import pytest
+
+import dramatiq
+from dramatiq import Worker
+from dramatiq.brokers.stub import StubBroker
+from dramatiq.common import format_cpu_list
+from dramatiq.middleware import Profiler
+from dramatiq.middleware.prometheus import (
+    Prometheus, _configure_metrics_handler, _metrics_handler, _MetricsBuffer, _QueueStatsCollector,
+    _run_exposition_server
+)
 
 
 def test_prometheus_middleware_exposes_metrics():
@@ -17,3 +28,130 @@ def test_prometheus_middleware_exposes_metrics():
     with request.urlopen("http://127.0.0.1:9191") as resp:
         # Then the response should be successful
         assert resp.getcode() == 200
+
+
+def test_prometheus_middleware_buffers_metrics_until_they_are_flushed():
+    # Given a broker with a Prometheus middleware that flushes rarely
+    # and that exports stage durations
+    middleware = Prometheus(flush_interval=60000, stage_durations=True)
+    broker = StubBroker(middleware=[middleware])
+    broker.emit_after("process_boot")
+
+    # And an actor
+    @dramatiq.actor(broker=broker)
+    def do_buffered_work(n):
+        if n % 2:
+            raise RuntimeError("failed")
+
+    # When I send that actor some messages
+    for n in range(10):
+        do_buffered_work.send_with_options(args=(n,), max_retries=0)
+
+    # And process them
+    worker = Worker(broker, worker_timeout=100)
+    worker.start()
+
+    try:
+        broker.join(do_buffered_work.queue_name)
+        worker.join()
+
+        # Then no metrics should have been written yet
+        labels = ("default", "do_buffered_work")
+        total_messages = middleware.total_messages.labels(*labels)
+        assert total_messages._value.get() == 0
+
+        # When I flush the metrics
+        middleware.flush()
+
+        # Then they should've all been written at once
+        assert total_messages._value.get() == 10
+        assert middleware.total_errored_messages.labels(*labels)._value.get() == 5
+        assert middleware.inprogress_messages.labels(*labels)._value.get() == 0
+        assert sum(b.get() for b in middleware.message_durations.labels(*labels)._buckets) == 10
+
+        # And the time spent in each stage should've been recorded
+        actor_durations = middleware.message_stage_durations.labels(*labels, "actor")
+        assert sum(b.get() for b in actor_durations._buckets) == 10
+    finally:
+        worker.stop()
+
+
+def test_prometheus_middleware_does_not_export_stage_durations_by_default(stub_broker):
+    # Given a Prometheus middleware with the default settings
+    middleware = Prometheus()
+    middleware.after_process_boot(stub_broker)
+
+    try:
+        # When a message's stage timings are reported
+        message = dramatiq.Message(queue_name="default", actor_name="do_work", args=(), kwargs={}, options={})
+        middleware.after_post_process_message(stub_broker, message, timings={"actor": 1.0})
+
+        # Then I expect nothing to have been buffered
+        assert middleware.buffer.swap() == ({}, {})
+        assert not hasattr(middleware, "message_stage_durations")
+    finally:
+        middleware.stopped.set()
+
+
+def test_prometheus_metrics_buffer_aggregates_histogram_observations():
+    # Given a metrics buffer
+    buffer = _MetricsBuffer()
+
+    # When I observe many values against the same histogram
+    for amount in (1, 5, 7, 20, 1000):
+        buffer.observe("durations", ("default",), amount, (5, 10, float("inf")))
+
+    # Then I expect it to have kept one count per bucket and their sum
+    _, observations = buffer.swap()
+    assert observations == {("durations", ("default",)): ([2, 1, 2], 1033)}
+
+
+def test_prometheus_exposition_server_serves_profiles_from_the_profilers_path(monkeypatch, tmpdir):
+    # Given a broker with a profiler that dumps profiles to a custom path
+    broker = StubBroker(middleware=[Profiler(path=str(tmpdir))])
+
+    # When I configure the exposition server's handler for that broker
+    monkeypatch.setattr("dramatiq.middleware.prometheus.QUEUE_STATS_INTERVAL", 0)
+    monkeypatch.setattr(_metrics_handler, "profiles_path", None)
+    _configure_metrics_handler(broker)
+
+    # Then I expect it to serve profiles from that path
+    assert _metrics_handler.profiles_path == str(tmpdir)
+
+
+def test_prometheus_queue_stats_collector_samples_the_broker(stub_broker):
+    # Given that I have an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # And I've sent it a message
+    do_work.send()
+
+    # When I sample the broker's queue stats
+    collector = _QueueStatsCollector(stub_broker, 10)
+    collector.start()
+    time.sleep(0.1)
+
+    # Then I expect them to be exposed as gauges
+    samples = {
+        family.name: [sample.value for sample in family.samples]
+        for family in collector.collect()
+    }
+    assert samples["dramatiq_queue_messages"] == [1]
+    assert samples["dramatiq_queue_delayed_messages"] == [0]
+    assert samples["dramatiq_queue_dead_messages"] == [0]
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_getaffinity"), reason="CPU affinity is not supported on this platform")
+def test_prometheus_middleware_reports_cpu_affinity():
+    # Given a broker with a Prometheus middleware
+    middleware = Prometheus()
+    broker = StubBroker(middleware=[middleware])
+
+    # When the process boots
+    broker.emit_after("process_boot")
+
+    # Then the CPUs it may run on should be reported
+    cpus = format_cpu_list(os.sched_getaffinity(0))
+    assert middleware.cpu_affinity.labels(cpus)._value.get() == 1
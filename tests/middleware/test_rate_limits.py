@@ -0,0 +1,100 @@
+import time
+
+import dramatiq
+from dramatiq import Worker
+from dramatiq.middleware import RateLimits
+from dramatiq.rate_limits import BucketRateLimiter, ConcurrentRateLimiter
+from dramatiq.rate_limits.backends import StubBackend
+
+
+def test_rate_limited_messages_are_delayed_without_being_retried(stub_broker):
+    # Given a broker with the rate limits middleware
+    stub_broker.add_middleware(RateLimits(delay=100))
+
+    # And a concurrent rate limiter whose only slot is taken
+    limiter = ConcurrentRateLimiter(StubBackend(), "rate-limits-test", limit=1)
+    limiter._acquire()
+
+    # And an actor that's limited by it
+    runs = []
+
+    @dramatiq.actor(rate_limit=limiter)
+    def do_work():
+        runs.append(1)
+
+    # When I send that actor a message
+    do_work.send()
+
+    # And start a worker
+    worker = Worker(stub_broker, worker_timeout=50)
+    worker.start()
+
+    try:
+        # And wait for the message to get delayed at least once
+        time.sleep(0.3)
+
+        # Then I expect the actor not to have run
+        assert runs == []
+
+        # When I release the slot
+        limiter._release()
+
+        # And join on the queue
+        stub_broker.join(do_work.queue_name)
+        worker.join()
+
+        # Then I expect the actor to have run exactly once
+        assert runs == [1]
+
+        # And the delays not to have counted as retries
+        assert stub_broker.dead_letters == []
+    finally:
+        worker.stop()
+
+
+def test_rate_limited_messages_are_delayed_until_the_next_bucket(stub_broker, stub_worker):
+    # Given a broker with the rate limits middleware
+    stub_broker.add_middleware(RateLimits())
+
+    # And an actor that may run twice per 200ms bucket
+    limiter = BucketRateLimiter(StubBackend(), "rate-limits-test", limit=2, bucket=200)
+    runs = []
+
+    @dramatiq.actor(rate_limit=limiter)
+    def do_work():
+        runs.append(time.monotonic())
+
+    # When I send that actor 6 messages
+    for _ in range(6):
+        do_work.send()
+
+    # And join on the queue
+    stub_broker.join(do_work.queue_name)
+    stub_worker.join()
+
+    # Then I expect all of them to have run
+    assert len(runs) == 6
+
+    # And for them to have been spread out over at least two more buckets
+    assert runs[-1] - runs[0] >= 0.2
+
+
+def test_rate_limits_release_slots_after_processing(stub_broker, stub_worker):
+    # Given a broker with the rate limits middleware
+    stub_broker.add_middleware(RateLimits())
+
+    # And an actor that's limited by a concurrent rate limiter
+    limiter = ConcurrentRateLimiter(StubBackend(), "rate-limits-test", limit=1)
+
+    @dramatiq.actor(rate_limit=limiter, max_retries=0)
+    def do_work():
+        raise RuntimeError("failed")
+
+    # When I send that actor a message that fails
+    do_work.send()
+    stub_broker.join(do_work.queue_name)
+    stub_worker.join()
+
+    # Then I expect its slot to have been released
+    with limiter.acquire(raise_on_failure=False) as acquired:
+        assert acquired
@@ -0,0 +1,54 @@
+import time
+
+import dramatiq
+from dramatiq.middleware import TimeLimit, TimeLimitExceeded
+
+from ..common import skip_on_pypy
+
+
+@skip_on_pypy
+def test_time_limits_are_enforced_precisely(stub_broker, stub_worker):
+    # Given that I have a database
+    durations = []
+
+    # And an actor with a short time limit
+    @dramatiq.actor(max_retries=0, time_limit=100)
+    def do_work():
+        start = time.monotonic()
+        try:
+            for _ in range(300):
+                time.sleep(0.01)
+        except TimeLimitExceeded:
+            durations.append(time.monotonic() - start)
+            raise
+
+    # When I send it a message
+    do_work.send()
+
+    # And join on the queue
+    stub_broker.join(do_work.queue_name)
+    stub_worker.join()
+
+    # Then I expect it to have been interrupted soon after its deadline
+    assert len(durations) == 1
+    assert 0.1 <= durations[0] < 0.3
+
+
+def test_time_limits_are_cancelled_once_messages_are_processed(stub_broker, stub_worker):
+    # Given that I have an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # When I send it many messages
+    for _ in range(100):
+        do_work.send()
+
+    # And join on the queue
+    stub_broker.join(do_work.queue_name)
+    stub_worker.join()
+
+    # Then I expect no time limits to be pending
+    time_limit = next(m for m in stub_broker.middleware if isinstance(m, TimeLimit))
+    assert time_limit.timers == {}
+    assert time_limit.deadlines == []
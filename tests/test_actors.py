@@ -332,6 +332,46 @@ def test_actors_can_delay_messages_independent_of_each_other(stub_broker, stub_w
     assert results == [2, 1]
 
 
+def test_messages_are_only_decoded_once_their_arguments_are_accessed(stub_broker, monkeypatch):
+    # Given that messages of any size are decoded lazily
+    monkeypatch.setattr("dramatiq.message.LAZY_DECODE_THRESHOLD", 1)
+
+    # And that I have a middleware that keeps track of processed messages
+    processed_messages = []
+
+    class ProcessTracker(Middleware):
+        def after_process_message(self, broker, message, *, result=None, exception=None):
+            processed_messages.append(message)
+
+    stub_broker.add_middleware(ProcessTracker())
+
+    # And an actor whose messages have an age limit
+    @dramatiq.actor(max_age=100)
+    def do_work(x):
+        pass
+
+    # When I send it a message
+    do_work.send(1)
+
+    # And wait for its age limit to pass
+    time.sleep(0.1)
+
+    # Then join on its queue
+    with worker(stub_broker, worker_timeout=100) as stub_worker:
+        stub_broker.join(do_work.queue_name)
+        stub_worker.join()
+
+    # I expect the message to have been dropped without its arguments being decoded
+    message, = processed_messages
+    assert message.failed
+    assert not message.is_decoded
+
+    # When I access its arguments
+    # Then I expect them to be decoded
+    assert message.args == (1,)
+    assert message.is_decoded
+
+
 def test_messages_belonging_to_missing_actors_are_rejected(stub_broker, stub_worker):
     # Given that I have a broker without actors
     # If I send it a message
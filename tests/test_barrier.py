@@ -2,8 +2,10 @@ import time
 from concurrent.futures import ThreadPoolExecutor
 
 import pytest
+import redis
 
 from dramatiq.rate_limits import Barrier
+from dramatiq.rate_limits.backends import RedisBackend
 
 
 def test_barrier(rate_limiter_backend):
@@ -58,3 +60,84 @@ def test_barriers_can_timeout(rate_limiter_backend):
         assert not barrier.wait(timeout=1000)
     except NotImplementedError:
         pytest.skip("Waiting is not supported under this backend.")
+
+
+def test_barriers_can_wake_many_parties_over_pubsub(redis_rate_limiter_backend):
+    # Given a Redis backend that waits for notifications over pub/sub
+    backend = RedisBackend(client=redis_rate_limiter_backend.client, pubsub=True)
+
+    # And a barrier of 64 parties
+    barrier = Barrier(backend, "pubsub-barrier", ttl=30000)
+    assert barrier.create(parties=64)
+
+    # And a worker function that waits on the barrier and writes its timestamp
+    times = []
+
+    def worker():
+        assert barrier.wait(timeout=2000)
+        times.append(time.monotonic())
+
+    # When I run those workers
+    with ThreadPoolExecutor(max_workers=64) as e:
+        for future in [e.submit(worker) for _ in range(64)]:
+            future.result()
+
+    # Then their execution times should be really close to one another
+    assert max(times) - min(times) <= 0.1
+
+
+def test_barriers_can_timeout_in_milliseconds_over_pubsub(redis_rate_limiter_backend):
+    # Given a Redis backend that waits for notifications over pub/sub
+    backend = RedisBackend(client=redis_rate_limiter_backend.client, pubsub=True)
+
+    # And a barrier of two parties
+    barrier = Barrier(backend, "pubsub-barrier", ttl=30000)
+    assert barrier.create(parties=2)
+
+    # When I wait on the barrier with a sub-second timeout
+    start = time.monotonic()
+
+    # Then I should get False back
+    assert not barrier.wait(timeout=100)
+
+    # And the wait should've lasted for about as long as the timeout
+    assert 0.1 <= time.monotonic() - start < 0.5
+
+
+def test_barriers_can_wait_over_pubsub_with_clients_that_decode_responses(redis_rate_limiter_backend):
+    # Given a Redis backend whose client decodes responses and that waits for notifications over pub/sub
+    backend = RedisBackend(client=redis.Redis(decode_responses=True), pubsub=True)
+
+    # And a barrier of two parties
+    barrier = Barrier(backend, "pubsub-barrier", ttl=30000)
+    assert barrier.create(parties=2)
+
+    # When one party waits on the barrier while the other reaches it
+    with ThreadPoolExecutor(max_workers=1) as e:
+        future = e.submit(barrier.wait, timeout=2000)
+        time.sleep(0.1)
+        assert barrier.wait(block=False)
+
+        # Then the waiting party should be woken up
+        assert future.result()
+
+
+def test_pubsub_waiters_recheck_their_keys_after_a_resubscribe(redis_rate_limiter_backend):
+    # Given a Redis backend that waits for notifications over pub/sub
+    backend = RedisBackend(client=redis_rate_limiter_backend.client, pubsub=True)
+
+    # And a party waiting on a key
+    with ThreadPoolExecutor(max_workers=1) as e:
+        start = time.monotonic()
+        future = e.submit(backend.wait, "pubsub-key", 5000)
+        time.sleep(0.1)
+
+        # When the key is notified while the subscriber is disconnected
+        backend.client.rpush("pubsub-key", b"x")
+
+        # And the subscriber resubscribes
+        backend.notifications._notify(None)
+
+        # Then the party should be woken up right away
+        assert future.result()
+        assert time.monotonic() - start < 1
@@ -81,3 +81,29 @@ def test_can_instantiate_brokers_without_middleware():
 
     # Then I should get back a broker with no middleware
     assert not broker.middleware
+
+
+def test_message_proxies_forward_message_attributes():
+    # Given a message
+    message = dramatiq.Message(
+        queue_name="default",
+        actor_name="do_work",
+        args=(1,),
+        kwargs={"x": 2},
+        options={"eta": 3},
+    )
+
+    # When I wrap it in a proxy
+    proxy = dramatiq.MessageProxy(message)
+
+    # Then I expect the proxy to expose the message's fields and methods
+    assert (proxy.queue_name, proxy.actor_name) == ("default", "do_work")
+    assert (proxy.args, proxy.kwargs, proxy.options) == ((1,), {"x": 2}, {"eta": 3})
+    assert proxy.message_id == message.message_id
+    assert proxy.asdict() == message.asdict()
+    assert proxy.copy() == message
+    assert proxy.get_result == message.get_result
+
+    # And I expect it not to have an instance dict
+    with pytest.raises(AttributeError):
+        proxy.some_attribute = 1
@@ -1,6 +1,8 @@
 import time
+from unittest.mock import patch
 
 from dramatiq.rate_limits import BucketRateLimiter
+from dramatiq.rate_limits.backends import StubBackend
 
 
 def test_bucket_rate_limiter_limits_per_bucket(rate_limiter_backend):
@@ -23,3 +25,62 @@ def test_bucket_rate_limiter_limits_per_bucket(rate_limiter_backend):
 
     # I expect it to have succeeded four times
     assert calls == 4
+
+
+class CountingStubBackend(StubBackend):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def add(self, *args, **kwargs):
+        self.calls += 1
+        return super().add(*args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        self.calls += 1
+        return super().incr(*args, **kwargs)
+
+
+def test_bucket_rate_limiter_can_lease_tokens():
+    # Given that I have a bucket rate limiter that leases tokens in blocks of 4
+    backend = CountingStubBackend()
+    limiter = BucketRateLimiter(backend, "leasing-test", limit=10, bucket=60000, lease=4)
+
+    # And I wait until the current minute-long bucket has at least a second left
+    millis_left = 60000 - time.time() * 1000 % 60000
+    if millis_left < 1000:
+        time.sleep(millis_left / 1000)
+
+    # When I acquire it multiple times sequentially
+    calls = 0
+    for _ in range(20):
+        with limiter.acquire(raise_on_failure=False) as acquired:
+            if acquired:
+                calls += 1
+
+    # Then I expect the limit to have been respected
+    assert calls == 10
+
+    # And the backend to have been called far fewer times than the limiter
+    assert backend.calls == 6
+
+
+def test_bucket_rate_limiter_gives_back_unused_leased_tokens_when_the_bucket_changes():
+    # Given that I have a bucket rate limiter that leases tokens in blocks of 4
+    backend = StubBackend()
+    limiter = BucketRateLimiter(backend, "leasing-test", limit=10, bucket=1000, lease=4)
+
+    # When I acquire it once in one bucket
+    with patch("time.time", return_value=100.5):
+        assert limiter._acquire()
+
+    # Then I expect a whole block to have been reserved from that bucket
+    assert backend._get("leasing-test@100000", default=0) == 4
+
+    # When I acquire it again once the next bucket has started
+    with patch("time.time", return_value=101.5):
+        assert limiter._acquire()
+
+    # Then I expect the unused tokens to have been given back to the previous bucket
+    assert backend._get("leasing-test@100000", default=0) == 1
+    assert backend._get("leasing-test@101000", default=0) == 4
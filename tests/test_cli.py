@@ -1,6 +1,15 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
 from subprocess import PIPE, STDOUT
 
-from .common import skip_in_ci
+import pytest
+
+from dramatiq import cli
+
+from .common import skip_in_ci, skip_on_windows
 
 fakebroker = object()
 
@@ -49,3 +58,163 @@ def test_cli_fails_to_start_given_an_invalid_nested_broker_instance(start_cli):
 
     # And the output should contain an error
     assert b"'tests.test_cli:BrokerHolder.fakebroker' is not a Broker." in proc.stdout.read()
+
+
+@skip_in_ci
+@skip_on_windows
+def test_cli_can_preload_modules_before_forking_workers(start_cli):
+    # Given a broker module that reports whenever it gets imported
+    env = dict(os.environ, dramatiq_test_cli_report_imports="1")
+
+    # When I start the cli with two worker processes in preload mode
+    proc = start_cli(
+        "tests.cli_broker:broker",
+        extra_args=["--preload", "--processes", "2", "--threads", "1"],
+        stdout=PIPE, stderr=STDOUT, env=env,
+    )
+
+    # And wait for it to boot up
+    time.sleep(3)
+    proc.terminate()
+    output = proc.communicate(timeout=10)[0].decode("utf-8")
+
+    # Then the module should've been imported once
+    assert output.count("Imported tests.cli_broker") == 1
+
+    # And both worker processes should've booted
+    assert output.count("Worker process is ready for action.") == 2
+
+    # And the process should exit cleanly
+    assert proc.returncode == 0
+
+
+@skip_in_ci
+def test_cli_fails_to_preload_given_an_invalid_broker_name(start_cli):
+    # Given that this module doesn't define a broker called "idontexist"
+    # When I start the cli in preload mode and point it at that broker
+    proc = start_cli("tests.test_cli:idontexist", extra_args=["--preload"], stdout=PIPE, stderr=STDOUT)
+    proc.wait(5)
+
+    # Then the process return code should be 2
+    assert proc.returncode == 2
+
+    # And the output should contain an error
+    assert b"Module 'tests.test_cli' does not define a 'idontexist' variable." in proc.stdout.read()
+
+
+@skip_in_ci
+@skip_on_windows
+def test_cli_scales_worker_processes_on_ttin_and_ttou(start_cli):
+    # Given that I've started the cli with one worker process and room for two
+    proc = start_cli(
+        "tests.cli_broker:broker",
+        extra_args=["--processes", "1", "--max-processes", "2", "--threads", "1"],
+        stdout=PIPE, stderr=STDOUT,
+    )
+    time.sleep(3)
+
+    # When I ask it to scale up twice
+    proc.send_signal(signal.SIGTTIN)
+    time.sleep(1)
+    proc.send_signal(signal.SIGTTIN)
+    time.sleep(3)
+
+    # And then to scale down
+    proc.send_signal(signal.SIGTTOU)
+    time.sleep(3)
+
+    # And stop it
+    proc.terminate()
+    output = proc.communicate(timeout=10)[0].decode("utf-8")
+
+    # Then only one worker process should've been added
+    assert output.count("Worker process is ready for action.") == 2
+
+    # And that worker process should've been stopped gracefully
+    assert "Scaling to 1 worker processes..." in output
+    assert "stopped (code 0)." in output
+
+    # And the cli should exit cleanly
+    assert proc.returncode == 0
+
+
+@skip_in_ci
+def test_cli_fails_to_start_given_invalid_process_bounds(start_cli):
+    # When I start the cli with more processes than its maximum
+    proc = start_cli(
+        "tests.cli_broker:broker",
+        extra_args=["--processes", "4", "--max-processes", "2"],
+        stdout=PIPE, stderr=STDOUT,
+    )
+    proc.wait(5)
+
+    # Then the process return code should be 2
+    assert proc.returncode == 2
+
+    # And the output should contain an error
+    assert b"--processes must be between --min-processes and --max-processes." in proc.stdout.read()
+
+
+@skip_in_ci
+def test_cli_fails_to_start_given_invalid_prefetch_bounds(start_cli):
+    # When I start the cli with a minimum prefetch larger than its maximum
+    proc = start_cli(
+        "tests.cli_broker:broker",
+        extra_args=["--adaptive-prefetch", "--min-prefetch", "10", "--max-prefetch", "5"],
+        stdout=PIPE, stderr=STDOUT,
+    )
+    proc.wait(5)
+
+    # Then the process return code should be 2
+    assert proc.returncode == 2
+
+    # And the output should contain an error
+    assert b"--min-prefetch must be at least 1 and at most --max-prefetch." in proc.stdout.read()
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="CPU affinity is not supported on this platform")
+def test_cpu_affinity_round_robin_pins_worker_processes_to_single_cpus(monkeypatch):
+    # Given that the main process may run on four CPUs
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {0, 1, 4, 5})
+
+    # When I compute the affinity of six worker processes
+    placements = [cli.get_cpu_affinity("round-robin", worker_id) for worker_id in range(6)]
+
+    # Then they should be spread across those CPUs in turn
+    assert placements == [{0}, {1}, {4}, {5}, {0}, {1}]
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="CPU affinity is not supported on this platform")
+def test_cpu_affinity_numa_pins_worker_processes_to_nodes(monkeypatch, tmpdir):
+    # Given a host with two NUMA nodes
+    for node, cpulist in [(0, "0-3,8-11"), (1, "4-7,12-15")]:
+        tmpdir.mkdir("node%d" % node).join("cpulist").write(cpulist + "\n")
+
+    monkeypatch.setattr(cli, "NUMA_NODES_PATH", str(tmpdir))
+
+    # And that the main process may run on some of each node's CPUs
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {0, 1, 4, 5})
+
+    # When I compute the affinity of three worker processes
+    placements = [cli.get_cpu_affinity("numa", worker_id) for worker_id in range(3)]
+
+    # Then they should alternate between the nodes' allowed CPUs
+    assert placements == [{0, 1}, {4, 5}, {0, 1}]
+
+
+def test_watch_logs_keeps_blank_lines_within_batches(tmpdir):
+    # Given a pipe that a child process has sent a batch of log output with a blank line and a bare newline to
+    read_pipe, write_pipe = multiprocessing.Pipe(duplex=False)
+    write_pipe.send_bytes(b"Traceback:\n\n  line\n")
+    write_pipe.send_bytes(b"\n")
+    write_pipe.close()
+
+    # When I watch the logs until the pipe is drained
+    log_filename = str(tmpdir.join("dramatiq.log"))
+    stop = threading.Event()
+    stop.set()
+    cli.watch_logs(log_filename, [read_pipe], stop)
+
+    # Then the blank line should have been kept and the bare newline dropped
+    with open(log_filename) as f:
+        assert f.read() == "Traceback:\n\n  line\n"
@@ -1,6 +1,6 @@
 import pytest
 
-from dramatiq.common import dq_name, q_name, xq_name
+from dramatiq.common import WorkQueue, dq_name, format_cpu_list, iter_queue, parse_cpu_list, q_name, xq_name
 
 
 @pytest.mark.parametrize("given,expected", [
@@ -28,3 +28,37 @@ def test_dq_name_returns_canonical_delay_names(given, expected):
 ])
 def test_xq_name_returns_delay_names(given, expected):
     assert xq_name(given) == expected
+
+
+@pytest.mark.parametrize("given,expected", [
+    ("0", {0}),
+    ("0-3", {0, 1, 2, 3}),
+    ("0-1,4,6-7\n", {0, 1, 4, 6, 7}),
+    ("", set()),
+])
+def test_parse_cpu_list_parses_cpu_lists(given, expected):
+    assert parse_cpu_list(given) == expected
+
+
+@pytest.mark.parametrize("given,expected", [
+    ({0}, "0"),
+    ({0, 1, 2, 3}, "0-3"),
+    ({7, 0, 1, 4, 6}, "0-1,4,6-7"),
+    (set(), ""),
+])
+def test_format_cpu_list_collapses_ranges(given, expected):
+    assert format_cpu_list(given) == expected
+
+
+def test_work_queues_order_items_by_priority_then_by_insertion():
+    # Given a work queue
+    queue = WorkQueue()
+
+    # When I put items with different priorities on it
+    for item in [(10, "a"), (0, "b"), (10, "c"), (5, "d"), (0, "e")]:
+        queue.put(item)
+
+    # Then I expect them to come out lowest priority first and in FIFO order within each priority
+    assert queue.qsize() == 5
+    assert list(iter_queue(queue)) == [(0, "b"), (0, "e"), (5, "d"), (10, "a"), (10, "c")]
+    assert queue.empty()
@@ -0,0 +1,92 @@
+import multiprocessing
+import pickle
+import time
+from multiprocessing.reduction import ForkingPickler
+
+from dramatiq.compat import StreamablePipe
+
+
+def read_all(read_pipe):
+    chunks = []
+    try:
+        while read_pipe.poll(0.1):
+            chunks.append(read_pipe.recv_bytes())
+    except EOFError:
+        pass
+    return chunks
+
+
+def test_buffered_streamable_pipes_coalesce_writes():
+    # Given a buffered pipe
+    read_pipe, write_pipe = multiprocessing.Pipe()
+    pipe = StreamablePipe(write_pipe, buffer_size=65536, flush_interval=60000)
+
+    # When I write to it a bunch of times
+    for i in range(100):
+        pipe.write("line %d\n" % i)
+
+    # Then nothing should be sent until I close it
+    assert not read_pipe.poll(0.1)
+    pipe.close()
+
+    # And then everything should be sent at once
+    assert read_all(read_pipe) == ["".join("line %d\n" % i for i in range(100)).encode("utf-8")]
+
+
+def test_buffered_streamable_pipes_flush_on_size_and_time():
+    # Given a buffered pipe with a small buffer
+    read_pipe, write_pipe = multiprocessing.Pipe()
+    pipe = StreamablePipe(write_pipe, buffer_size=10, flush_interval=100)
+
+    try:
+        # When I fill its buffer
+        pipe.write("0123456789")
+
+        # Then it should be sent right away
+        assert read_pipe.poll(0.05)
+        assert read_pipe.recv_bytes() == b"0123456789"
+
+        # When I write less than the buffer's size
+        pipe.write("abc")
+
+        # Then it should be sent once the flush interval passes
+        start = time.monotonic()
+        assert read_pipe.recv_bytes() == b"abc"
+        assert time.monotonic() - start >= 0.05
+    finally:
+        pipe.close()
+
+
+def test_buffered_streamable_pipes_drop_writes_instead_of_blocking():
+    # Given a buffered pipe whose buffer is tiny
+    read_pipe, write_pipe = multiprocessing.Pipe()
+    pipe = StreamablePipe(write_pipe, buffer_size=65536, flush_interval=60000, max_buffer_size=10)
+
+    # When I write more than its buffer can hold
+    for _ in range(5):
+        pipe.write("abcd")
+
+    # Then the excess writes should be dropped and counted
+    assert pipe.dropped == 3
+
+    # And the drops should be reported when the buffer is sent
+    pipe.close()
+    assert read_all(read_pipe) == [b"abcdabcdDropped 3 log messages because the log pipe was full.\n"]
+
+
+def test_buffered_streamable_pipes_can_be_pickled():
+    # Given a buffered pipe that has been written to
+    read_pipe, write_pipe = multiprocessing.Pipe()
+    pipe = StreamablePipe(write_pipe, buffer_size=65536)
+    pipe.write("abc")
+
+    # When I pickle and unpickle it the way multiprocessing does,
+    # giving the clone its own copy of the connection
+    clone = pickle.loads(ForkingPickler.dumps(pipe))
+
+    # Then its settings should be preserved but not its buffer
+    assert clone.buffer_size == 65536
+    assert clone.buffer == []
+
+    for connection in (pipe, clone, read_pipe):
+        connection.close()
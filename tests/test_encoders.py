@@ -1,6 +1,10 @@
+import json
+
 import pytest
 
 import dramatiq
+from dramatiq import Message
+from dramatiq.message import LazyMessage
 
 
 @pytest.fixture
@@ -39,3 +43,152 @@ def test_pickle_encoder(pickle_encoder, stub_broker, stub_worker):
 
     # Then I expect the message to have been processed
     assert db == [1]
+
+
+def test_json_encoder_can_decode_messages_partially():
+    # Given a JSON encoder
+    encoder = dramatiq.JSONEncoder()
+
+    # When I partially decode some data
+    data, remainder = encoder.decode_partially(b'{"a": 1, "b": [2], "c": {"d": 3}}', ["a", "b"])
+
+    # Then I expect decoding to stop after the keys I asked for
+    assert data == {"a": 1, "b": [2]}
+    assert remainder is not None
+
+    # And I expect the remainder to decode to the rest of the keys
+    assert encoder.decode_remainder(remainder) == {"c": {"d": 3}}
+
+
+def test_json_encoder_decodes_whole_objects_when_keys_are_missing():
+    # Given a JSON encoder
+    encoder = dramatiq.JSONEncoder()
+
+    # When I partially decode some data that's missing some of the keys I asked for
+    data, remainder = encoder.decode_partially(b' { "a" : 1 , "c" : 3 } ', ["a", "b"])
+
+    # Then I expect all of it to be decoded
+    assert data == {"a": 1, "c": 3}
+    assert remainder is None
+
+
+@pytest.mark.parametrize("data", [
+    b'{"a": 1,',
+    b'{"a": 1} {}',
+    b'{"a" 1}',
+    b'{"a": 1, "b": 2, "c": "3}',
+    b'{"a": 1, "b": 2, "c": "3\\"}',
+    b'{"a": 1, "b": 2, "c": 3',
+])
+def test_json_encoder_raises_errors_when_partially_decoding_invalid_data(data):
+    # Given a JSON encoder
+    encoder = dramatiq.JSONEncoder()
+
+    # If I partially decode some invalid data
+    # I expect a ValueError to be raised
+    with pytest.raises(ValueError):
+        encoder.decode_partially(data, ["a", "b"])
+
+
+def test_messages_are_not_decoded_lazily_by_default():
+    # Given a message
+    message = Message(queue_name="default", actor_name="do_work", args=("x" * 8192,), kwargs={}, options={})
+
+    # When I decode it lazily without having set a threshold
+    decoded_message = Message.decode_lazily(message.encode())
+
+    # Then I expect it to have been decoded in full
+    assert not isinstance(decoded_message, LazyMessage)
+    assert decoded_message == message
+
+
+def test_small_messages_are_not_decoded_lazily(monkeypatch):
+    # Given that messages of at least 4096 bytes are decoded lazily
+    monkeypatch.setattr("dramatiq.message.LAZY_DECODE_THRESHOLD", 4096)
+
+    # And a small message
+    message = Message(queue_name="default", actor_name="do_work", args=(1, 2), kwargs={}, options={})
+
+    # When I decode it lazily
+    decoded_message = Message.decode_lazily(message.encode())
+
+    # Then I expect it to have been decoded in full
+    assert not isinstance(decoded_message, LazyMessage)
+    assert decoded_message == message
+
+
+def test_lazily_decoded_messages_are_equal_to_the_messages_they_encode(monkeypatch):
+    # Given that messages of any size are decoded lazily
+    monkeypatch.setattr("dramatiq.message.LAZY_DECODE_THRESHOLD", 1)
+
+    # And a message
+    message = Message(
+        queue_name="default",
+        actor_name="do_work",
+        args=(1, 2),
+        kwargs={"x": 3},
+        options={},
+    )
+
+    # When I decode it lazily
+    lazy_message = Message.decode_lazily(message.encode())
+
+    # Then I expect its arguments not to have been decoded
+    assert isinstance(lazy_message, LazyMessage)
+    assert not lazy_message.is_decoded
+
+    # And I expect it to be equal to the original message
+    assert lazy_message == message
+    assert lazy_message.kwargs == {"x": 3}
+
+
+def test_lazily_decoded_messages_keep_fields_encoded_before_the_routing_fields(monkeypatch):
+    # Given that messages of any size are decoded lazily
+    monkeypatch.setattr("dramatiq.message.LAZY_DECODE_THRESHOLD", 1)
+
+    # And a message whose arguments were encoded ahead of its options
+    data = json.dumps({
+        "args": [1, 2],
+        "queue_name": "default",
+        "actor_name": "do_work",
+        "message_id": "some-id",
+        "message_timestamp": 1,
+        "options": {},
+        "kwargs": {"p": "y" * 5000},
+    }).encode("utf-8")
+
+    # When I decode it lazily
+    lazy_message = Message.decode_lazily(data)
+
+    # Then I expect every one of its fields to be kept
+    assert isinstance(lazy_message, LazyMessage)
+    assert lazy_message.args == (1, 2)
+    assert lazy_message.kwargs == {"p": "y" * 5000}
+    assert lazy_message.message_id == "some-id"
+
+
+def test_lazily_decoded_messages_keep_changes_made_to_their_options(monkeypatch):
+    # Given a lazily-decoded message
+    monkeypatch.setattr("dramatiq.message.LAZY_DECODE_THRESHOLD", 1)
+    message = Message(queue_name="default", actor_name="do_work", args=(), kwargs={}, options={})
+    lazy_message = Message.decode_lazily(message.encode())
+
+    # When I change its options before decoding the rest of it
+    lazy_message.options["retries"] = 1
+
+    # Then I expect the change to be kept
+    assert lazy_message.copy().options == {"retries": 1}
+
+
+def test_malformed_messages_are_rejected_when_decoded_lazily(monkeypatch):
+    # Given that messages of any size are decoded lazily
+    monkeypatch.setattr("dramatiq.message.LAZY_DECODE_THRESHOLD", 1)
+
+    # And a message whose arguments have been truncated
+    message = Message(queue_name="default", actor_name="do_work", args=("x" * 100,), kwargs={}, options={})
+    data = message.encode()[:-20]
+
+    # When I decode it lazily
+    # Then I expect a ValueError to be raised right away
+    with pytest.raises(ValueError):
+        Message.decode_lazily(data)
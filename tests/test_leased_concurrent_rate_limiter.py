@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dramatiq.rate_limits import LeasedConcurrentRateLimiter
+
+
+@pytest.fixture(params=["redis", "stub", "shared_memory"])
+def lease_rate_limiter_backend(request):
+    return request.getfixturevalue("%s_rate_limiter_backend" % request.param)
+
+
+def test_leased_concurrent_rate_limiter_limits_concurrency(lease_rate_limiter_backend):
+    # Given that I have a leased rate limiter and a call database
+    limiter = LeasedConcurrentRateLimiter(lease_rate_limiter_backend, "leased-test", limit=4)
+    calls = []
+
+    # And a function that adds calls to the database after acquiring the rate limit
+    def work():
+        with limiter.acquire(raise_on_failure=False) as acquired:
+            if acquired:
+                calls.append(1)
+                time.sleep(0.3)
+
+    # If I execute multiple workers concurrently
+    with ThreadPoolExecutor(max_workers=32) as e:
+        for future in [e.submit(work) for _ in range(32)]:
+            future.result()
+
+    # I expect at most 4 calls to have succeeded
+    assert 3 <= sum(calls) <= 4
+
+    # And all of the slots to have been released
+    with limiter.acquire(raise_on_failure=False) as acquired:
+        assert acquired
+
+
+def test_leased_concurrent_rate_limiter_renews_leases_while_held(lease_rate_limiter_backend):
+    # Given that I have a leased mutex with a short lease
+    mutex = LeasedConcurrentRateLimiter(lease_rate_limiter_backend, "leased-test", limit=1, lease=150)
+
+    # When I hold it for longer than its lease
+    with mutex.acquire():
+        time.sleep(0.5)
+
+        # Then I expect nobody else to be able to acquire it
+        with mutex.acquire(raise_on_failure=False) as acquired:
+            assert not acquired
+
+
+def test_leased_concurrent_rate_limiter_reclaims_slots_of_dead_holders(lease_rate_limiter_backend):
+    # Given that I have a leased mutex with a short lease
+    mutex = LeasedConcurrentRateLimiter(lease_rate_limiter_backend, "leased-test", limit=1, lease=150)
+
+    # And another process acquired it then died without releasing it
+    dead_mutex = LeasedConcurrentRateLimiter(lease_rate_limiter_backend, "leased-test", limit=1, lease=150)
+    assert dead_mutex._acquire()
+    dead_mutex.holders.clear()
+
+    # When I try to acquire the mutex right away
+    with mutex.acquire(raise_on_failure=False) as acquired:
+        # Then I expect it to fail
+        assert not acquired
+
+    # When I try to acquire it again after the lease runs out
+    time.sleep(0.2)
+    with mutex.acquire(raise_on_failure=False) as acquired:
+        # Then I expect it to succeed
+        assert acquired
+
+
+def test_leased_concurrent_rate_limiter_renews_short_leases_at_least_every_millisecond(stub_rate_limiter_backend):
+    # Given that I have a leased mutex whose lease is shorter than 3ms
+    mutex = LeasedConcurrentRateLimiter(stub_rate_limiter_backend, "leased-test", limit=1, lease=2)
+
+    # Then I expect its leases to be renewed every millisecond rather than continuously
+    assert mutex.renew_interval == 1
+
+
+def test_leased_concurrent_rate_limiter_rejects_invalid_renew_intervals(stub_rate_limiter_backend):
+    # When I create a leased mutex with a negative renew interval
+    # Then I expect an AssertionError to be raised
+    with pytest.raises(AssertionError):
+        LeasedConcurrentRateLimiter(stub_rate_limiter_backend, "leased-test", renew_interval=-1)
@@ -355,3 +355,86 @@ def test_redis_broker_maintains_backwards_compat_with_old_acks(redis_broker):
     # And the valid message should stay in that set
     compat_unacked = redis_broker.client.zrangebyscore("dramatiq:default.acks", 0, "+inf")
     assert set(compat_unacked) == {valid_message_id}
+
+
+def test_redis_broker_can_report_queue_stats(redis_broker):
+    # Given that I have an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # When I send that actor some messages, some of which are delayed
+    do_work.send()
+    do_work.send()
+    do_work.send_with_options(delay=60000)
+
+    # And get its queue's stats
+    stats = redis_broker.get_queue_stats(do_work.queue_name)
+
+    # Then I expect the messages to be counted by queue
+    assert stats.messages == 2
+    assert stats.delayed_messages == 1
+    assert stats.dead_messages == 0
+
+    # And the age of the oldest message to be reported
+    assert 0 <= stats.oldest_message_age < 1000
+
+
+def test_redis_broker_reports_empty_queue_stats(redis_broker):
+    # Given that I have an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # When I get its queue's stats without sending it any messages
+    stats = redis_broker.get_queue_stats(do_work.queue_name)
+
+    # Then I expect the queue to be empty
+    assert stats == (0, 0, 0, None)
+
+
+def test_redis_consumers_can_change_their_prefetch(redis_broker):
+    # Given that I have an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # And some messages on its queue
+    for _ in range(5):
+        do_work.send()
+
+    # And a consumer that prefetches one message at a time
+    consumer = redis_broker.consume(do_work.queue_name, prefetch=1)
+
+    # When I raise its prefetch
+    consumer.set_prefetch(3)
+
+    # And consume a message
+    assert next(consumer) is not None
+
+    # Then I expect the rest of the new prefetch to have been fetched with it
+    assert len(consumer.message_cache) == 2
+    consumer.close()
+
+
+def test_redis_consumers_record_when_messages_were_fetched(redis_broker):
+    # Given that I have an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # And some messages on its queue
+    for _ in range(2):
+        do_work.send()
+
+    # And a consumer that prefetches both of them
+    consumer = redis_broker.consume(do_work.queue_name, prefetch=2)
+
+    # When I consume them a while apart
+    first = next(consumer)
+    time.sleep(0.1)
+    second = next(consumer)
+
+    # Then I expect both to have been stamped with the time they were fetched at
+    assert first.timestamps["fetched"] == second.timestamps["fetched"]
+    consumer.close()
@@ -1,9 +1,11 @@
 import time
+from unittest.mock import patch
 
 import pytest
 
 import dramatiq
-from dramatiq.results import ResultMissing, Results, ResultTimeout
+from dramatiq.results import FilesystemBlobStore, ResultCache, ResultMissing, Results, ResultTimeout
+from dramatiq.results.backends import StubBackend
 
 
 def test_actors_can_store_results(stub_broker, stub_worker, result_backend):
@@ -136,3 +138,230 @@ def test_messages_can_fail_and_propagate(stub_broker, stub_worker, result_backen
     # Then I should get that result back
     with pytest.raises(TestActorException, match='msg'):
         message.get_result(block=True)
+
+
+def test_actors_can_store_results_write_behind(stub_broker, stub_worker, stub_result_backend):
+    # Given a result backend
+    # And a broker with the results middleware configured to write results behind
+    stub_broker.add_middleware(Results(backend=stub_result_backend, write_behind=True))
+
+    # And an actor that stores results
+    @dramatiq.actor(store_results=True)
+    def do_work(x):
+        return x * 2
+
+    # When I send that actor many messages
+    messages = [do_work.send(i) for i in range(100)]
+
+    # Then all of their results should eventually be stored
+    assert [m.get_result(block=True) for m in messages] == [i * 2 for i in range(100)]
+
+
+def test_write_behind_results_are_flushed_before_ack_when_ordered(stub_broker, stub_worker, stub_result_backend):
+    # Given a result backend
+    # And a broker with the results middleware configured to write
+    # results behind with a very long flush interval, but ordered
+    stub_broker.add_middleware(Results(
+        backend=stub_result_backend,
+        write_behind=True,
+        write_behind_interval=3600000,
+        write_behind_ordered=True,
+    ))
+
+    # And an actor that stores results
+    @dramatiq.actor(store_results=True)
+    def do_work():
+        return 42
+
+    # When I send that actor a message
+    message = do_work.send()
+
+    # And wait for it to be processed
+    stub_broker.join(do_work.queue_name)
+    stub_worker.join()
+
+    # Then its result should be available without blocking
+    assert message.get_result() == 42
+
+
+def test_write_behind_results_are_flushed_on_worker_shutdown(stub_broker, stub_result_backend):
+    # Given a result backend
+    # And a broker with the results middleware configured to write
+    # results behind with a very long flush interval
+    stub_broker.add_middleware(Results(
+        backend=stub_result_backend,
+        write_behind=True,
+        write_behind_interval=3600000,
+    ))
+
+    # And an actor that stores results
+    @dramatiq.actor(store_results=True)
+    def do_work():
+        return 42
+
+    # And a worker
+    worker = dramatiq.Worker(stub_broker, worker_timeout=100)
+    worker.start()
+
+    # When I send that actor a message
+    message = do_work.send()
+
+    # And stop the worker after the message is processed
+    stub_broker.join(do_work.queue_name)
+    worker.join()
+    worker.stop()
+
+    # Then its result should have been stored
+    assert message.get_result() == 42
+
+
+def test_large_results_are_offloaded_to_the_blob_store(stub_broker, stub_worker, tmpdir):
+    # Given a result backend with a blob store
+    blob_store = FilesystemBlobStore(str(tmpdir))
+    result_backend = StubBackend(blob_store=blob_store, blob_threshold=1024)
+
+    # And a broker with the results middleware
+    stub_broker.add_middleware(Results(backend=result_backend))
+
+    # And an actor that returns large results
+    @dramatiq.actor(store_results=True)
+    def do_work():
+        return ["x" * 100] * 100
+
+    # When I send that actor a message
+    message = do_work.send()
+
+    # And wait for a result
+    result = message.get_result(block=True)
+
+    # Then the result should be what the actor returned
+    assert result == ["x" * 100] * 100
+
+    # And only a reference to it should be stored in the backend
+    data, _ = result_backend.results[result_backend.build_message_key(message)]
+    assert len(data) < 1024
+
+
+def test_binary_results_can_be_read_from_the_blob_store_without_copies(stub_broker, stub_worker, tmpdir):
+    # Given a result backend with a memory-mapped blob store
+    blob_store = FilesystemBlobStore(str(tmpdir), use_mmap=True)
+    result_backend = StubBackend(blob_store=blob_store, blob_threshold=1024)
+
+    # And a broker with the results middleware
+    stub_broker.add_middleware(Results(backend=result_backend))
+
+    # And an actor that returns large binary results
+    @dramatiq.actor(store_results=True)
+    def do_work():
+        return b"x" * 4096
+
+    # When I send that actor a message
+    message = do_work.send()
+
+    # And wait for a result
+    result = message.get_result(block=True)
+
+    # Then I should get back a memoryview over the result
+    assert isinstance(result, memoryview)
+    assert result == b"x" * 4096
+
+
+def test_blob_store_deduplicates_and_expires_blobs(tmpdir):
+    # Given a blob store
+    blob_store = FilesystemBlobStore(str(tmpdir))
+
+    # When I store the same data twice
+    first_key = blob_store.put(b"data", 60000)
+    second_key = blob_store.put(b"data", 60000)
+
+    # Then I should get the same key back
+    assert first_key == second_key
+    assert blob_store.get(first_key) == b"data"
+
+    # When I store a blob that expires immediately
+    key = blob_store.put(b"expired", 0)
+
+    # Then it should be missing
+    assert blob_store.get(key) is None
+
+    # And it should be removed when the store is pruned
+    blob_store.prune()
+    assert not tmpdir.join(key[:2], key[2:]).exists()
+
+
+def test_blob_store_prunes_leave_blobs_being_written_alone(tmpdir):
+    # Given a blob store
+    blob_store = FilesystemBlobStore(str(tmpdir))
+
+    # And a temporary file another process is writing a blob to
+    temp_file = tmpdir.mkdir("ab").join(".tmp-blob")
+    temp_file.write(b"data")
+
+    # When the store is pruned
+    blob_store.prune()
+
+    # Then the temporary file should still exist
+    assert temp_file.exists()
+
+
+def test_results_are_only_encoded_once(stub_broker, tmpdir):
+    # Given a result backend with a blob store
+    result_backend = StubBackend(blob_store=FilesystemBlobStore(str(tmpdir)), blob_threshold=1024)
+
+    # And a message
+    message = dramatiq.Message(queue_name="default", actor_name="do_work", args=(), kwargs={}, options={})
+
+    # When I store a small result
+    with patch.object(result_backend.encoder, "encode", wraps=result_backend.encoder.encode) as encode:
+        result_backend.store_result(message, 42, 60000)
+
+    # Then it should only have been encoded once
+    assert encode.call_count == 1
+    assert result_backend.get_result(message) == 42
+
+
+def test_completed_results_are_served_from_the_cache(stub_broker, stub_worker):
+    # Given a result backend with a cache
+    result_backend = StubBackend(cache=ResultCache())
+
+    # And a broker with the results middleware
+    stub_broker.add_middleware(Results(backend=result_backend))
+
+    # And an actor that stores results
+    @dramatiq.actor(store_results=True)
+    def do_work():
+        return 42
+
+    # When I send that actor a message
+    message = do_work.send()
+
+    # And get its result many times
+    results = [message.get_result(backend=result_backend, block=True) for _ in range(10)]
+
+    # Then every read should return the result
+    assert results == [42] * 10
+
+    # And all but the first read should have been served from the cache
+    assert result_backend.cache.hits == 9
+    assert result_backend.cache.misses == 1
+
+
+def test_result_cache_evicts_least_recently_used_results():
+    # Given a cache bounded by size
+    cache = ResultCache(max_entries=10, max_bytes=10)
+
+    # When I add results to it
+    cache.put("a", 1, 4)
+    cache.put("b", 2, 4)
+
+    # And access the first result
+    assert cache.get("a") == 1
+
+    # And add another result that goes over the size limit
+    cache.put("c", 3, 4)
+
+    # Then the least recently used result should be evicted
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.size == 8
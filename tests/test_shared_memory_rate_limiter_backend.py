@@ -0,0 +1,119 @@
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dramatiq.rate_limits import LeasedConcurrentRateLimiter, SlidingWindowRateLimiter
+from dramatiq.rate_limits.backends import SharedMemoryBackend
+
+
+def incr_many(path, attempts):
+    backend = SharedMemoryBackend(path, stripes=8, slots=64)
+    return sum(backend.incr("shared-key", 1, maximum=200, ttl=60000) for _ in range(attempts))
+
+
+def test_shared_memory_backend_is_shared_between_processes(tmpdir):
+    # Given a shared memory backend
+    path = str(tmpdir.join("rate-limits"))
+    SharedMemoryBackend(path, stripes=8, slots=64)
+
+    # When 4 separate processes increment the same key 100 times each
+    with multiprocessing.Pool(4) as pool:
+        counts = pool.starmap(incr_many, [(path, 100)] * 4)
+
+    # Then I expect exactly the maximum number of increments to have succeeded
+    assert sum(counts) == 200
+
+
+def test_shared_memory_backend_rejects_mismatched_layouts(tmpdir):
+    # Given a shared memory backend
+    path = str(tmpdir.join("rate-limits"))
+    SharedMemoryBackend(path, stripes=8, slots=64)
+
+    # When I try to open the same file with a different layout
+    # Then a ValueError should be raised
+    with pytest.raises(ValueError):
+        SharedMemoryBackend(path, stripes=16, slots=64)
+
+
+def test_shared_memory_backend_reuses_expired_slots(tmpdir):
+    # Given a shared memory backend with a single slot
+    backend = SharedMemoryBackend(str(tmpdir.join("rate-limits")), stripes=1, slots=1)
+
+    # When I add a key that expires right away
+    assert backend.add("a", 1, ttl=0)
+
+    # Then I expect another key to be able to take over its slot
+    assert backend.add("b", 1, ttl=60000)
+
+    # And the table to be full afterwards
+    with pytest.raises(RuntimeError):
+        backend.add("c", 1, ttl=60000)
+
+
+def test_shared_memory_backends_on_the_same_path_exclude_one_another(tmpdir):
+    # Given two shared memory backends on the same path in this process
+    path = str(tmpdir.join("rate-limits"))
+    backends = [SharedMemoryBackend(path, stripes=1, slots=8) for _ in range(2)]
+
+    # When each of them increments the same key 300 times from 4 threads
+    def incr(backend):
+        return sum(backend.incr("shared-key", 1, maximum=10000, ttl=60000) for _ in range(300))
+
+    with ThreadPoolExecutor(8) as executor:
+        assert sum(executor.map(incr, backends * 4)) == 2400
+
+    # Then I expect no increments to have been lost
+    assert not backends[0].incr("shared-key", 1, maximum=2400, ttl=60000)
+    assert backends[1].incr("shared-key", 1, maximum=2401, ttl=60000)
+
+
+def test_shared_memory_backend_wait_with_a_zero_timeout_returns_immediately(tmpdir):
+    # Given a shared memory backend
+    backend = SharedMemoryBackend(str(tmpdir.join("rate-limits")))
+
+    # When I wait on a key that's never notified with a timeout of 0
+    start = time.monotonic()
+
+    # Then I expect the wait to fail right away
+    assert not backend.wait("some-key", 0)
+    assert time.monotonic() - start < 1
+
+
+def test_shared_memory_backend_rejects_limits_it_cannot_store(tmpdir):
+    # Given a shared memory backend whose values fit 8 timestamps or 2 leases
+    backend = SharedMemoryBackend(str(tmpdir.join("rate-limits")), value_size=64)
+
+    # When I create rate limiters with limits larger than that
+    # Then a ValueError should be raised
+    with pytest.raises(ValueError):
+        SlidingWindowRateLimiter(backend, "window", limit=9)
+
+    with pytest.raises(ValueError):
+        LeasedConcurrentRateLimiter(backend, "leases", limit=3)
+
+    # And limits that fit should be accepted
+    SlidingWindowRateLimiter(backend, "window", limit=8)
+    LeasedConcurrentRateLimiter(backend, "leases", limit=2)
+
+
+def test_shared_memory_backend_can_be_closed(tmpdir):
+    # Given two shared memory backends on the same path
+    path = str(tmpdir.join("rate-limits"))
+    first, second = SharedMemoryBackend(path), SharedMemoryBackend(path)
+
+    # When I close the first one
+    first.close()
+
+    # Then I expect the second one to keep working
+    assert second.add("a", 1, ttl=60000)
+
+    # When I close the second one
+    second.close()
+
+    # Then I expect its memory to be unmapped
+    assert second.memory.closed
+
+    # And a new backend on that path to see the stored data
+    assert not SharedMemoryBackend(path).add("a", 1, ttl=60000)
@@ -0,0 +1,56 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dramatiq.rate_limits import SlidingWindowRateLimiter
+
+
+@pytest.fixture(params=["redis", "stub", "shared_memory"])
+def window_rate_limiter_backend(request):
+    return request.getfixturevalue("%s_rate_limiter_backend" % request.param)
+
+
+def test_sliding_window_rate_limiter_limits_per_window(window_rate_limiter_backend):
+    # Given that I have a sliding window rate limiter
+    limiter = SlidingWindowRateLimiter(window_rate_limiter_backend, "sliding-window-test", limit=2, window=500)
+    calls = []
+
+    # And a function that tries to acquire it repeatedly for 2 seconds
+    def work():
+        for _ in range(20):
+            with limiter.acquire(raise_on_failure=False) as acquired:
+                if acquired:
+                    calls.append(1)
+
+            time.sleep(0.1)
+
+    # If I run that function multiple times concurrently
+    with ThreadPoolExecutor(max_workers=8) as e:
+        futures = []
+        for _ in range(8):
+            futures.append(e.submit(work))
+
+        for future in futures:
+            future.result()
+
+    # I expect at most 2 calls to have been made per half second
+    assert 6 <= sum(calls) <= 10
+
+
+def test_sliding_window_rate_limiter_frees_up_slots_as_the_window_slides(window_rate_limiter_backend):
+    # Given that I have a sliding window rate limiter
+    limiter = SlidingWindowRateLimiter(window_rate_limiter_backend, "sliding-window-test", limit=1, window=100)
+
+    # When I acquire it
+    with limiter.acquire(raise_on_failure=False) as acquired:
+        assert acquired
+
+    # Then acquiring it again within the window should fail
+    with limiter.acquire(raise_on_failure=False) as acquired:
+        assert not acquired
+
+    # And acquiring it after the window has passed should succeed
+    time.sleep(0.15)
+    with limiter.acquire(raise_on_failure=False) as acquired:
+        assert acquired
@@ -1,10 +1,10 @@
 import time
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 import pytest
 
 import dramatiq
-from dramatiq import QueueJoinTimeout, QueueNotFound
+from dramatiq import Message, QueueJoinTimeout, QueueNotFound
 
 
 def test_stub_broker_raises_queue_error_when_consuming_undeclared_queues(stub_broker):
@@ -82,3 +82,133 @@ def test_stub_broker_join_reraises_actor_exceptions_in_the_joining_current_threa
     # Then that exception should be raised in my thread
     with pytest.raises(CustomError):
         stub_broker.join(do_work.queue_name, fail_fast=True)
+
+
+def test_stub_broker_can_report_queue_stats(stub_broker):
+    # Given that I have an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # When I send that actor some messages, some of which are delayed
+    do_work.send()
+    do_work.send()
+    do_work.send_with_options(delay=60000)
+
+    # And get its queue's stats
+    stats = stub_broker.get_queue_stats(do_work.queue_name)
+
+    # Then I expect the messages to be counted by queue
+    assert stats.messages == 2
+    assert stats.delayed_messages == 1
+    assert stats.dead_messages == 0
+
+    # And the age of the oldest message to be reported
+    assert 0 <= stats.oldest_message_age < 1000
+
+
+def test_stub_broker_can_pass_messages_through_without_encoding_them(stub_worker):
+    # Given a stub broker that doesn't encode messages
+    broker = stub_worker.broker
+    broker.encode_messages = False
+
+    # And an actor that collects its arguments
+    calls = []
+
+    @dramatiq.actor
+    def do_work(xs, *, key):
+        xs.append(1)
+        calls.append((xs, key))
+
+    # When I send that actor a message
+    xs = []
+    message = do_work.send(xs, key="value")
+
+    # Then the message itself should be on the queue
+    assert broker.queues[do_work.queue_name].queue[0] == message
+
+    # When I join on the queue
+    broker.join(do_work.queue_name)
+    stub_worker.join()
+
+    # Then the actor should've received the same arguments
+    assert calls == [([1], "value")]
+    assert calls[0][0] is xs
+
+
+def test_stub_broker_validates_messages_that_it_does_not_encode(stub_broker):
+    # Given a stub broker that doesn't encode messages
+    stub_broker.encode_messages = False
+
+    # And an actor
+    @dramatiq.actor
+    def do_work(x):
+        pass
+
+    # If I send that actor a message that can't be encoded
+    # I expect a TypeError to be raised
+    with pytest.raises(TypeError):
+        do_work.send(object())
+
+    # When validation is turned off
+    stub_broker.validate_messages = False
+
+    # Then I expect the message to be enqueued
+    do_work.send(object())
+    assert stub_broker.queues[do_work.queue_name].qsize() == 1
+
+
+def test_stub_broker_only_validates_messages_that_it_does_not_encode_once(stub_broker, stub_worker):
+    # Given a stub broker that doesn't encode messages
+    stub_broker.encode_messages = False
+
+    # And an actor that fails the first time it's called
+    attempts = []
+
+    @dramatiq.actor(min_backoff=10, max_backoff=10)
+    def do_work():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("failed")
+
+    # And a way to count the messages that get encoded
+    encoded = []
+    encode = Message.encode
+
+    def counting_encode(self):
+        encoded.append(self.message_id)
+        return encode(self)
+
+    with patch.object(Message, "encode", counting_encode):
+        # When I send that actor a message and it gets retried
+        do_work.send()
+        stub_broker.join(do_work.queue_name)
+        stub_worker.join()
+
+    # Then I expect it to have been run twice
+    assert len(attempts) == 2
+
+    # And to have only been encoded when it was first sent
+    assert len(encoded) == 1
+
+
+def test_stub_broker_does_not_share_message_options_with_senders(stub_broker):
+    # Given a stub broker that doesn't encode messages
+    stub_broker.encode_messages = False
+
+    # And an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # When I send that actor a message
+    message = do_work.send()
+
+    # And change the options of the consumed message
+    consumer = stub_broker.consume(do_work.queue_name)
+    proxy = next(consumer)
+    proxy.options["retries"] = 1
+
+    # Then the message I sent should be unaffected
+    assert proxy.message_id == message.message_id
+    assert "retries" not in message.options
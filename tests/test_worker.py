@@ -1,3 +1,12 @@
+import time
+from threading import Thread
+
+import pytest
+
+import dramatiq
+from dramatiq import Middleware
+from dramatiq.worker import _PrefetchController
+
 from .common import worker
 
 
@@ -11,3 +20,176 @@ def test_workers_dont_register_queues_that_arent_whitelisted(stub_broker):
         # Then a consumer should not get spun up for that queue
         assert "c" not in stub_worker.consumers
         assert "c.DQ" not in stub_worker.consumers
+
+
+def test_workers_report_message_stage_timings(stub_broker):
+    # Given a middleware that records the timings of every message
+    reported_timings = []
+
+    class TimingsMiddleware(Middleware):
+        def after_post_process_message(self, broker, message, *, timings):
+            reported_timings.append(timings)
+
+    stub_broker.add_middleware(TimingsMiddleware())
+
+    # And an actor that takes a while
+    @dramatiq.actor
+    def do_work():
+        time.sleep(0.1)
+
+    # When I send that actor a message and process it
+    do_work.send()
+    with worker(stub_broker) as stub_worker:
+        stub_broker.join(do_work.queue_name)
+        stub_worker.join()
+
+    # Then I expect the timings of every stage to have been reported
+    assert len(reported_timings) == 1
+    assert set(reported_timings[0]) == {
+        "broker", "prefetch", "work_queue", "before_process",
+        "actor", "after_process", "ack",
+    }
+
+    # And the actor stage should account for the time spent in the actor
+    assert 100 <= reported_timings[0]["actor"] < 1000
+
+
+def test_workers_dont_count_message_delays_as_time_spent_in_the_broker(stub_broker):
+    # Given a middleware that records the timings of every message
+    reported_timings = []
+
+    class TimingsMiddleware(Middleware):
+        def after_post_process_message(self, broker, message, *, timings):
+            reported_timings.append((message.queue_name, timings))
+
+    stub_broker.add_middleware(TimingsMiddleware())
+
+    # And an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # When I send that actor a message with a delay and process it
+    do_work.send_with_options(delay=500)
+    with worker(stub_broker, worker_timeout=100) as stub_worker:
+        stub_broker.join(do_work.queue_name)
+        stub_worker.join()
+
+    # Then I expect the broker stage not to include the delay
+    timings, = [timings for queue_name, timings in reported_timings if queue_name == do_work.queue_name]
+    assert timings["broker"] < 500
+
+
+def test_prefetch_controller_grows_prefetch_when_waiting_on_a_full_prefetch():
+    # Given a prefetch controller
+    controller = _PrefetchController(prefetch=4, min_prefetch=1, max_prefetch=100, worker_threads=8, interval=0)
+
+    # When the consumer processes 100 messages per second but has to wait 100ms for new ones
+    controller.adjusted_at -= 1
+    for _ in range(100):
+        controller.record_processed()
+    controller.record_wait(0.1)
+
+    # Then I expect the prefetch to grow to cover two such waits
+    assert controller.adjust(occupancy=0) == 20
+
+
+def test_prefetch_controller_counts_messages_processed_by_many_threads():
+    # Given a prefetch controller
+    controller = _PrefetchController(prefetch=4, min_prefetch=1, max_prefetch=100, worker_threads=8, interval=0)
+
+    # When many threads record processed messages at the same time
+    def record():
+        for _ in range(10000):
+            controller.record_processed()
+
+    threads = [Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Then I expect none of them to have been lost
+    assert controller.processed == 80000
+
+
+def test_prefetch_controller_shrinks_prefetch_when_messages_pile_up():
+    # Given a prefetch controller
+    controller = _PrefetchController(prefetch=64, min_prefetch=1, max_prefetch=100, worker_threads=8, interval=0)
+
+    # When more messages are waiting on the work queue than there are worker threads
+    # Then I expect the prefetch to be halved
+    assert controller.adjust(occupancy=9) == 32
+
+
+def test_prefetch_controller_keeps_prefetch_within_bounds():
+    # Given a prefetch controller with bounds
+    controller = _PrefetchController(prefetch=1000, min_prefetch=2, max_prefetch=10, worker_threads=8, interval=0)
+
+    # Then I expect its initial prefetch to be clamped
+    assert controller.prefetch == 10
+
+    # When the consumer processes messages without ever waiting for them
+    # Then I expect the prefetch to be halved every interval until it reaches its minimum
+    prefetches = []
+    for _ in range(4):
+        controller.record_processed()
+        prefetches.append(controller.adjust(occupancy=0))
+
+    assert prefetches == [5, 2, None, None]
+    assert controller.prefetch == 2
+
+
+def test_prefetch_controller_keeps_prefetch_while_the_queue_is_idle():
+    # Given a prefetch controller
+    controller = _PrefetchController(prefetch=16, min_prefetch=1, max_prefetch=100, worker_threads=8, interval=0)
+
+    # When no messages get processed over an interval
+    controller.record_wait(1)
+
+    # Then I expect the prefetch not to change
+    assert controller.adjust(occupancy=0) is None
+    assert controller.prefetch == 16
+
+
+def test_workers_default_their_minimum_prefetch_to_their_thread_count(stub_broker):
+    # Given a worker with adaptive prefetch and no minimum prefetch
+    stub_worker = dramatiq.Worker(stub_broker, worker_threads=4, adaptive_prefetch=True)
+
+    # Then I expect its minimum prefetch to be its number of threads
+    assert stub_worker.min_prefetch == 4
+
+
+def test_workers_reject_invalid_prefetch_bounds(stub_broker):
+    # When I create a worker whose minimum prefetch is larger than its maximum
+    # Then a ValueError should be raised
+    with pytest.raises(ValueError):
+        dramatiq.Worker(stub_broker, adaptive_prefetch=True, min_prefetch=10, max_prefetch=5)
+
+
+def test_workers_can_adapt_their_prefetch(stub_broker):
+    # Given an actor
+    @dramatiq.actor
+    def do_work():
+        pass
+
+    # And a worker with adaptive prefetch
+    stub_worker = dramatiq.Worker(stub_broker, worker_timeout=100, adaptive_prefetch=True, min_prefetch=2, max_prefetch=20)
+    stub_worker.start()
+    try:
+        # When I send that actor some messages
+        for _ in range(100):
+            do_work.send()
+
+        # Then I expect them all to be processed
+        stub_broker.join(do_work.queue_name)
+        stub_worker.join()
+
+        # And the queue's prefetch to be within bounds
+        consumer = stub_worker.consumers[do_work.queue_name]
+        assert 2 <= consumer.prefetch <= 20
+
+        # And delay queues not to have adaptive prefetch
+        assert stub_worker.consumers[dramatiq.common.dq_name(do_work.queue_name)].prefetch_controller is None
+    finally:
+        stub_worker.stop()